@@ -0,0 +1,314 @@
+import heapq
+import random
+from typing import Iterable
+
+_coin = random.Random(0)
+
+
+class CustomTuple:
+    """Класс CustomTuple
+
+    Attributes:
+        totalSalary (int): Количество цельных зарплат
+        count (int): Их общее количество
+    """
+    def __init__(self, full_salary=0, counter=0) -> None:
+        """Конструктор класса CustomTuple
+
+        :param full_salary: Количество цельных зарплат
+        :param counter: Их общее количество
+
+        >>> CustomTuple().totalSalary
+        0
+        >>> CustomTuple().count
+        0
+        """
+        self.totalSalary = full_salary
+        self.count = counter
+
+    def add(self, salary) -> 'CustomTuple':
+        """Учёт одной зарплаты
+
+        :param salary: Зарплата
+
+        :return: self
+
+        >>> CustomTuple().add(100).add(50).totalSalary
+        150
+        """
+        self.totalSalary += salary
+        self.count += 1
+        return self
+
+    def merge(self, other: 'CustomTuple') -> 'CustomTuple':
+        """Слияние с частичной статистикой другого куска файла
+
+        Зарплаты после конвертации - целые числа (в том числе во float),
+        поэтому сумма не зависит от порядка слияния, пока меньше 2 ** 53.
+
+        :param other: Другой CustomTuple
+
+        :return: self
+
+        >>> CustomTuple(100, 1).merge(CustomTuple(50, 2)).count
+        3
+        """
+        self.totalSalary += other.totalSalary
+        self.count += other.count
+        return self
+
+
+QUANTILES = (0.1, 0.5, 0.9)
+QUANTILES_HEADLINES = ('10-й перцентиль', 'Медиана', '90-й перцентиль')
+
+
+class QuantileSketch:
+    """Потоковый скетч квантилей KLL с ограниченной памятью
+
+    Значения лежат на уровнях-компакторах: элемент уровня h весит 2 ** h.
+    Переполненный уровень сортируется, и каждый второй его элемент переходит
+    на уровень выше. Ёмкости уровней убывают геометрически от верхнего,
+    поэтому скетч хранит O(k) значений при любом количестве зарплат.
+
+    Ошибка ранга при k=200 обычно не больше 1%: квантиль 0.5 лежит между
+    истинными квантилями 0.49 и 0.51. Скетчи кусков файла сливаются через merge
+    без потери этой гарантии.
+
+    Attributes:
+        k (int): Ёмкость верхнего уровня - точность скетча
+        count (int): Количество учтённых зарплат
+        compactors (list): Уровни значений
+    """
+    capacity_ratio = 2 / 3
+
+    def __init__(self, k: int = 200) -> None:
+        """Конструктор класса QuantileSketch
+
+        :param k: Ёмкость верхнего уровня
+
+        >>> QuantileSketch().count
+        0
+        """
+        self.k, self.count, self.compactors = k, 0, [[]]
+
+    def add(self, salary) -> 'QuantileSketch':
+        """Учёт одной зарплаты
+
+        :param salary: Зарплата
+
+        :return: self
+
+        >>> QuantileSketch().add(100).add(50).quantile(0.5)
+        50
+        """
+        self.compactors[0].append(salary)
+        self.count += 1
+        if len(self.compactors[0]) >= self.k:
+            self.__compress()
+        return self
+
+    def update(self, salaries: Iterable) -> 'QuantileSketch':
+        """Учёт многих зарплат сразу (например столбца NumPy)
+
+        :param salaries: Итератор зарплат
+
+        :return: self
+
+        >>> QuantileSketch().update(range(1, 101)).quantile(0.5)
+        50
+        """
+        level = self.compactors[0]
+        size = len(level)
+        level.extend(salaries)
+        self.count += len(level) - size
+        self.__compress()
+        return self
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """Слияние со скетчем другого куска файла
+
+        :param other: Другой QuantileSketch
+
+        :return: self
+
+        >>> QuantileSketch().update(range(500)).merge(QuantileSketch().update(range(500, 1000))).count
+        1000
+        """
+        for level, items in enumerate(other.compactors):
+            if level == len(self.compactors):
+                self.compactors.append(list())
+            self.compactors[level].extend(items)
+        self.count += other.count
+        self.__compress()
+        return self
+
+    def quantile(self, fraction: float):
+        """Приближённый квантиль
+
+        :param fraction: Доля от 0 до 1, например 0.5 - медиана
+
+        :return: значение или None для пустого скетча
+
+        >>> abs(QuantileSketch().update(range(100001)).quantile(0.9) - 90000) < 1000
+        True
+        """
+        return self.quantiles((fraction,))[0]
+
+    def quantiles(self, fractions: tuple = QUANTILES) -> list:
+        """Несколько квантилей за одну сортировку
+
+        :param fractions: Доли от 0 до 1
+
+        :return: лист значений
+        """
+        weighted = sorted((salary, 1 << level) for level, items in enumerate(self.compactors) for salary in items)
+        total = sum(weight for _, weight in weighted)
+        results, position, cumulative = list(), 0, 0
+        for fraction in sorted(range(len(fractions)), key=lambda index: fractions[index]):
+            while position < len(weighted) and cumulative + weighted[position][1] < fractions[fraction] * total:
+                cumulative += weighted[position][1]
+                position += 1
+            results.append((fraction, weighted[min(position, len(weighted) - 1)][0] if weighted else None))
+        return [value for _, value in sorted(results)]
+
+    def __capacity(self, level: int) -> int:
+        """Ёмкость уровня: k у верхнего, дальше вниз с множителем 2/3
+
+        :param level: Номер уровня
+
+        :return: количество значений
+        """
+        return max(2, int(self.k * self.capacity_ratio ** (len(self.compactors) - level - 1)) + 1)
+
+    def __compress(self) -> None:
+        """Сжатие переполненных уровней, пока скетч не уложится в суммарную ёмкость
+
+        :return: nothing
+        """
+        while sum(map(len, self.compactors)) > sum(map(self.__capacity, range(len(self.compactors)))):
+            for level, items in enumerate(self.compactors):
+                if len(items) >= self.__capacity(level):
+                    break
+            if level + 1 == len(self.compactors):
+                self.compactors.append(list())
+            items.sort()
+            kept = [items.pop()] if len(items) % 2 else list()
+            self.compactors[level + 1].extend(items[_coin.getrandbits(1)::2])
+            self.compactors[level] = kept
+
+
+class SpaceSaving:
+    """Частые ключи (heavy hitters) алгоритмом Space-Saving в фиксированной памяти
+
+    Хранится не больше capacity ключей. Новый ключ при заполнении вытесняет
+    ключ с наименьшим счётчиком и наследует его счётчик как ошибку. Любой ключ
+    с долей больше 1 / capacity гарантированно остаётся, а его наблюдаемое
+    количество занижено не больше чем на число строк / capacity.
+
+    Attributes:
+        capacity (int): Максимум отслеживаемых ключей
+        total (int): Количество учтённых строк
+        evicted: Ключ, вытесненный последним вызовом add, или None
+    """
+    def __init__(self, capacity: int = 1000) -> None:
+        """Конструктор класса SpaceSaving
+
+        :param capacity: Максимум отслеживаемых ключей
+        """
+        self.capacity, self.total, self.evicted = capacity, 0, None
+        self.__counts, self.__errors, self.__statistic = dict(), dict(), dict()
+        self.__buckets, self.__min_count = dict(), 0
+
+    def add(self, key, salary) -> 'SpaceSaving':
+        """Учёт одной зарплаты ключа
+
+        :param key: Ключ, например регион
+        :param salary: Зарплата
+
+        :return: self
+
+        >>> hitters = SpaceSaving(2).add('a', 10).add('b', 20).add('a', 30).add('c', 40)
+        >>> {key: (value.totalSalary, value.count) for key, value in hitters.statistic().items()}
+        {'a': (40, 2), 'c': (40, 1)}
+        """
+        self.total += 1
+        self.evicted = None
+        count = self.__counts.get(key)
+        if count is None:
+            if len(self.__counts) < self.capacity:
+                count, self.__errors[key] = 0, 0
+            else:
+                count = self.__min_count
+                self.evicted = next(iter(self.__buckets[count]))
+                self.__remove(self.evicted, count)
+                del self.__counts[self.evicted], self.__errors[self.evicted], self.__statistic[self.evicted]
+                self.__errors[key] = count
+            self.__statistic[key] = CustomTuple(salary, 1)
+        else:
+            self.__remove(key, count)
+            self.__statistic[key].add(salary)
+        self.__counts[key] = count + 1
+        self.__buckets.setdefault(count + 1, dict())[key] = None
+        if count + 1 < self.__min_count or self.__min_count not in self.__buckets:
+            self.__min_count = count + 1
+        return self
+
+    def __remove(self, key, count: int) -> None:
+        """Удаление ключа из корзины его счётчика
+
+        :param key: Ключ
+        :param count: Текущий счётчик ключа
+
+        :return: nothing
+        """
+        bucket = self.__buckets[count]
+        del bucket[key]
+        if len(bucket) == 0:
+            del self.__buckets[count]
+
+    def error(self, key) -> int:
+        """Максимальное занижение наблюдаемого количества ключа
+
+        :param key: Ключ
+
+        :return: количество строк
+        """
+        return self.__errors[key]
+
+    def statistic(self) -> dict:
+        """Наблюдаемые суммы и количества отслеживаемых ключей по убыванию количества
+
+        :return: словарь {ключ: CustomTuple}
+        """
+        return {key: self.__statistic[key]
+                for key in sorted(self.__statistic, key=lambda key: self.__counts[key], reverse=True)}
+
+
+def top_counts(statistic: dict, top: int) -> dict:
+    """Первые top ключей по убыванию количества: обрезка слитых сводок SpaceSaving
+
+    :param statistic: Словарь {ключ: CustomTuple}
+    :param top: Количество ключей
+
+    :return: словарь из top ключей по убыванию количества
+
+    >>> list(top_counts({'a': CustomTuple(10, 1), 'b': CustomTuple(10, 3), 'c': CustomTuple(10, 2)}, 2))
+    ['b', 'c']
+    """
+    return {key: statistic[key] for key in heapq.nlargest(top, statistic, key=lambda key: statistic[key].count)}
+
+
+def merge_statistic(target: dict, partial: dict) -> dict:
+    """Слияние словаря частичной статистики в общий с сохранением порядка ключей
+
+    :param target: Общий словарь {ключ: CustomTuple или QuantileSketch}
+    :param partial: Частичный словарь того же вида
+
+    :return: target
+    """
+    for key, accumulator in partial.items():
+        if key not in target:
+            target[key] = accumulator
+        else:
+            target[key].merge(accumulator)
+    return target
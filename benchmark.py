@@ -0,0 +1,266 @@
+import csv
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from instrumentation import peak_rss_mb
+
+HEADLINES = ['name', 'salary_from', 'salary_to', 'salary_currency', 'area_name', 'published_at']
+PROFESSIONS = ['Программист', 'Разработчик', 'Аналитик', 'Менеджер', 'Инженер', 'Тестировщик',
+               'Дизайнер', 'Бухгалтер', 'Оператор', 'Администратор', 'Специалист', 'Руководитель']
+SPECIALIZATIONS = ['', ' Python', ' Java', ' C#', ' 1С', ' по продажам', ' проекта', ' данных',
+                   ' поддержки', ' баз данных', ' frontend', ' backend']
+CITIES = ['Москва', 'Санкт-Петербург', 'Новосибирск', 'Екатеринбург', 'Казань', 'Нижний Новгород',
+          'Краснодар', 'Самара', 'Ростов-на-Дону', 'Уфа', 'Воронеж', 'Пермь', 'Челябинск', 'Омск',
+          'Красноярск', 'Тюмень', 'Волгоград', 'Саратов', 'Минск', 'Алматы', 'Киев', 'Ташкент',
+          'Баку', 'Тбилиси', 'Бишкек', 'Калининград', 'Томск', 'Ярославль', 'Иркутск', 'Владивосток']
+CITY_WEIGHTS = [1 / (rank + 1) ** 1.1 for rank in range(len(CITIES))]
+CURRENCIES = {'RUR': 0.9, 'USD': 0.04, 'EUR': 0.02, 'KZT': 0.015, 'UAH': 0.01, 'BYR': 0.005,
+              'UZS': 0.004, 'AZN': 0.003, 'GEL': 0.002, 'KGS': 0.001}
+FIRST_DATE, DATES_RANGE = datetime(2007, 1, 1), 16 * 365 * 24 * 3600
+ROW_STAGES = ('stream_count', 'columns_parse', 'columns_cached', 'count_columns', 'count_parallel')
+STAGES = ROW_STAGES + ('equalize_statistic', 'collect_dictionaries', 'generate_excel', 'generate_image')
+
+
+def generate_vacancies(file_name: str, rows: int, seed: int = 0, malformed_rate: float = 0.02) -> str:
+    """Детерминированный синтетический файл в схеме vacancies_big.csv
+
+    Города распределены по закону Ципфа, большинство зарплат в рублях, даты
+    равномерно покрывают 2007-2022 годы. Доля malformed_rate строк испорчена:
+    пустое поле или не хватает столбца. Одинаковые аргументы дают одинаковый файл.
+
+    :param file_name: Название файла
+    :param rows: Количество строк без шапки
+    :param seed: Зерно генератора
+    :param malformed_rate: Доля испорченных строк
+
+    :return: file_name
+    """
+    from main import Vacancy
+    generator = random.Random(seed)
+    currencies, currency_weights = list(CURRENCIES), list(CURRENCIES.values())
+    names = [profession + specialization for profession in PROFESSIONS for specialization in SPECIALIZATIONS]
+    batch_size = 10000
+    with open(file_name, 'w', encoding='utf-8-sig', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(HEADLINES)
+        for batch_start in range(0, rows, batch_size):
+            count = min(batch_size, rows - batch_start)
+            cities = generator.choices(CITIES, CITY_WEIGHTS, k=count)
+            row_currencies = generator.choices(currencies, currency_weights, k=count)
+            lines = list()
+            for city, currency in zip(cities, row_currencies):
+                salary = generator.lognormvariate(11, 0.5) / Vacancy.currency_ratio[currency]
+                salary_from = int(salary) // 1000 * 1000 or 1000
+                published_at = FIRST_DATE + timedelta(seconds=generator.randrange(DATES_RANGE))
+                line = [generator.choice(names), str(salary_from),
+                        str(int(salary_from * generator.uniform(1, 1.6)) // 1000 * 1000 or 1000),
+                        currency, city, published_at.strftime('%Y-%m-%dT%H:%M:%S+0300')]
+                if generator.random() < malformed_rate:
+                    if generator.random() < 0.5:
+                        line[generator.randrange(len(line))] = ''
+                    else:
+                        del line[generator.randrange(len(line))]
+                lines.append(line)
+            writer.writerows(lines)
+    return file_name
+
+
+def dataset_file(directory: str, rows: int, seed: int, malformed_rate: float) -> str:
+    """Путь к синтетическому файлу с генерацией, если его ещё нет
+
+    :param directory: Папка с файлами
+    :param rows: Количество строк
+    :param seed: Зерно генератора
+    :param malformed_rate: Доля испорченных строк
+
+    :return: путь к файлу
+    """
+    os.makedirs(directory, exist_ok=True)
+    file_name = os.path.join(directory, f'vacancies_{rows}_{seed}_{malformed_rate}.csv')
+    if not os.path.exists(file_name):
+        generate_vacancies(f'{file_name}.tmp', rows, seed, malformed_rate)
+        os.replace(f'{file_name}.tmp', file_name)
+    return file_name
+
+
+def measure(stage: str, rows: int, function, trace_memory: bool) -> dict:
+    """Замер одной стадии: время, пропускная способность и пиковая память
+
+    Строк в секунду считается только для стадий ROW_STAGES, которые проходят по строкам файла.
+
+    :param stage: Название стадии
+    :param rows: Количество строк файла
+    :param function: Функция стадии без аргументов
+    :param trace_memory: Считать пик выделенной Python памяти через tracemalloc (замедляет стадию)
+
+    :return: словарь результата
+    """
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    function()
+    seconds = time.perf_counter() - started
+    result = {'rows': rows, 'stage': stage, 'seconds': round(seconds, 6),
+              'rows_per_second': round(rows / seconds, 1) if seconds > 0 and stage in ROW_STAGES else None}
+    if trace_memory:
+        result['peak_traced_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 2)
+        tracemalloc.stop()
+    result['max_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def run_stages(file_name: str, rows: int, profession: str = 'Программист', trace_memory: bool = False) -> list:
+    """Прогон путей main.py над одним файлом (выполняется в отдельном процессе)
+
+    Замеряются потоковый подсчёт (VACANCIES_NO_CACHE), разбор в столбцы с записью
+    кэша и чтение из кэша, векторный подсчёт по столбцам и многопроцессный подсчёт
+    (VACANCIES_WORKERS), затем стадии отчёта над статистикой по столбцам.
+
+    :param file_name: Название файла
+    :param rows: Количество строк файла
+    :param profession: Наименование профессии
+    :param trace_memory: Использовать tracemalloc
+
+    :return: лист результатов стадий
+    """
+    from cache import cache_directory
+    from main import DataSet, InputConnect, Report
+
+    def input_connect(workers: int = 1) -> InputConnect:
+        inserted = InputConnect()
+        inserted.file_name, inserted.profession, inserted.cities_count = file_name, profession, 0
+        inserted.workers = workers
+        return inserted
+
+    shutil.rmtree(cache_directory(file_name), ignore_errors=True)
+    dataset, inserted_data = DataSet(file_name, list()), input_connect()
+    results = [measure('stream_count', rows, lambda: input_connect().count_vacancies(
+                   DataSet(file_name, list()).iter_vacancies()), trace_memory),
+               measure('columns_parse', rows, lambda: dataset.put_columns(use_cache=True), trace_memory),
+               measure('columns_cached', rows, lambda: dataset.put_columns(use_cache=True), trace_memory),
+               measure('count_columns', rows,
+                       lambda: inserted_data.count_columns(dataset.vacancies_columns), trace_memory),
+               measure('count_parallel', rows,
+                       lambda: input_connect(os.cpu_count() or 1).count_parallel(file_name), trace_memory),
+               measure('equalize_statistic', rows, inserted_data.equalize_statistic, trace_memory),
+               measure('collect_dictionaries', rows, inserted_data.collect_dictionaries, trace_memory)]
+    dictionaries = inserted_data.list_of_all_dictionaries
+    with tempfile.TemporaryDirectory() as directory:
+        results.append(measure('generate_excel', rows, lambda: Report().generate_excel(
+            *dictionaries, file_name=os.path.join(directory, 'report.xlsx')), trace_memory))
+        results.append(measure('generate_image', rows, lambda: Report.generate_image(
+            *dictionaries, file_name=os.path.join(directory, 'graph.png')), trace_memory))
+    return results
+
+
+def git_commit() -> str:
+    """Текущий коммит репозитория, если он доступен
+
+    :return: хэш коммита или None
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(sizes: list, directory: str, seed: int = 0, malformed_rate: float = 0.02,
+                  trace_memory: bool = False) -> dict:
+    """Прогон всех стадий на каждом размере данных
+
+    Каждый размер считается в новом процессе, чтобы пиковый RSS не
+    накапливался от размера к размеру.
+
+    :param sizes: Лист количеств строк
+    :param directory: Папка синтетических файлов
+    :param seed: Зерно генератора
+    :param malformed_rate: Доля испорченных строк
+    :param trace_memory: Использовать tracemalloc
+
+    :return: словарь с окружением и результатами
+    """
+    results = list()
+    for rows in sizes:
+        file_name = dataset_file(directory, rows, seed, malformed_rate)
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            results.extend(executor.submit(run_stages, file_name, rows, trace_memory=trace_memory).result())
+    return {'created': datetime.now().isoformat(timespec='seconds'), 'commit': git_commit(),
+            'python': platform.python_version(), 'platform': platform.platform(),
+            'seed': seed, 'malformed_rate': malformed_rate, 'trace_memory': trace_memory, 'results': results}
+
+
+def compare_results(previous: dict, current: dict, tolerance: float = 0.2) -> list:
+    """Поиск просадок пропускной способности относительно прошлого прогона
+
+    Прогоны с tracemalloc и без него не сравниваются: трассировка сама замедляет стадии.
+
+    >>> compare_results({'results': [{'rows': 10, 'stage': 'a', 'rows_per_second': 100}]},
+    ...                 {'results': [{'rows': 10, 'stage': 'a', 'rows_per_second': 70}]})
+    [(10, 'a', 100, 70)]
+
+    :param previous: Прошлые результаты run_benchmark
+    :param current: Текущие результаты
+    :param tolerance: Допустимая доля падения rows_per_second
+
+    :return: лист кортежей (строки, стадия, было, стало)
+    """
+    if previous.get('trace_memory') != current.get('trace_memory'):
+        raise ValueError('Прогоны с tracemalloc и без него несравнимы')
+    before = {(result['rows'], result['stage']): result['rows_per_second'] for result in previous['results']}
+    regressions = list()
+    for result in current['results']:
+        old_speed, new_speed = before.get((result['rows'], result['stage'])), result['rows_per_second']
+        if old_speed and new_speed and new_speed < old_speed * (1 - tolerance):
+            regressions.append((result['rows'], result['stage'], old_speed, new_speed))
+    return regressions
+
+
+def print_results(report: dict) -> None:
+    """Печать таблицы результатов
+
+    :param report: Результат run_benchmark
+
+    :return: nothing
+    """
+    for result in report['results']:
+        speed = '' if result['rows_per_second'] is None else f"{result['rows_per_second']:.0f} строк/с"
+        rss = '' if result['max_rss_mb'] is None else f"{result['max_rss_mb']:.1f} МБ"
+        print(f"{result['rows']:>10}  {result['stage']:<22}{result['seconds']:>10.3f} с{speed:>22}{rss:>14}")
+
+
+if __name__ == '__main__':
+    arguments_parser = ArgumentParser(description='Замер скорости и памяти стадий обработки вакансий')
+    arguments_parser.add_argument('--sizes', type=lambda value: int(float(value)), nargs='+', default=[1_000_000],
+                                  help='количества строк, например 1e6 5e6 1e7 5e7')
+    arguments_parser.add_argument('--data-dir', default='benchmark_data', help='папка синтетических файлов')
+    arguments_parser.add_argument('--seed', type=int, default=0, help='зерно генератора')
+    arguments_parser.add_argument('--malformed-rate', type=float, default=0.02, help='доля испорченных строк')
+    arguments_parser.add_argument('--trace-memory', action='store_true', help='пик памяти через tracemalloc')
+    arguments_parser.add_argument('--output', default='benchmark_results.json', help='файл результатов JSON')
+    arguments_parser.add_argument('--compare', help='прошлый файл результатов для поиска просадок')
+    arguments_parser.add_argument('--tolerance', type=float, default=0.2, help='допустимое падение скорости')
+    arguments = arguments_parser.parse_args()
+    benchmark_report = run_benchmark(arguments.sizes, arguments.data_dir, arguments.seed,
+                                     arguments.malformed_rate, arguments.trace_memory)
+    print_results(benchmark_report)
+    with open(arguments.output, 'w', encoding='utf-8') as output_file:
+        json.dump(benchmark_report, output_file, ensure_ascii=False, indent=2)
+    if arguments.compare:
+        with open(arguments.compare, encoding='utf-8') as previous_file:
+            found_regressions = compare_results(json.load(previous_file), benchmark_report, arguments.tolerance)
+        for regression in found_regressions:
+            print('Просадка: {} строк, {}: {} -> {} строк/с'.format(*regression))
+        if found_regressions:
+            sys.exit(1)
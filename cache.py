@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+from typing import Callable
+from unittest import TestCase
+
+from columnar import VacancyColumns
+
+CACHE_VERSION = 3
+
+
+def cache_directory(file_name: str) -> str:
+    """Папка кэша разобранных данных рядом с исходным файлом
+
+    :param file_name: Название файла
+
+    :return: путь вида vacancies_big.csv.cache
+    """
+    return f'{file_name}.cache'
+
+
+def file_fingerprint(file_name: str) -> dict:
+    """Отпечаток исходного файла: путь, размер, время изменения и хэш шапки
+
+    :param file_name: Название файла
+
+    :return: словарь-ключ кэша
+    """
+    stat = os.stat(file_name)
+    with open(file_name, 'rb') as file:
+        header_hash = hashlib.sha1(file.readline()).hexdigest()
+    return {'version': CACHE_VERSION, 'path': os.path.abspath(file_name), 'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns, 'header_sha1': header_hash}
+
+
+def load_columns(file_name: str, fingerprint: dict = None) -> VacancyColumns:
+    """Загрузка столбцов из кэша, если он соответствует текущему файлу
+
+    :param file_name: Название файла
+    :param fingerprint: Отпечаток файла (file_fingerprint); по умолчанию снимается заново
+
+    :return: VacancyColumns с отображёнными в память столбцами или None, если кэш устарел
+    """
+    directory = cache_directory(file_name)
+    try:
+        with open(os.path.join(directory, 'fingerprint.json'), encoding='utf-8') as file:
+            saved_fingerprint = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if saved_fingerprint != (fingerprint or file_fingerprint(file_name)):
+        return None
+    return VacancyColumns.load(directory)
+
+
+def save_columns(file_name: str, columns: VacancyColumns, fingerprint: dict = None) -> bool:
+    """Сохранение столбцов в кэш с отпечатком файла
+
+    Запись идёт во временную папку, которая затем подменяет старый кэш,
+    поэтому прерванный запуск не оставляет наполовину записанный кэш.
+    Ошибка записи (папка только для чтения, нет места) не прерывает запуск:
+    временная папка удаляется, в stderr выводится предупреждение.
+
+    :param file_name: Название файла
+    :param columns: Разобранные столбцы
+    :param fingerprint: Отпечаток файла, снятый до разбора; по умолчанию снимается сейчас
+
+    :return: True, если кэш записан
+    """
+    directory = cache_directory(file_name)
+    temporary_directory = f'{directory}.tmp{os.getpid()}'
+    try:
+        columns.save(temporary_directory)
+        with open(os.path.join(temporary_directory, 'fingerprint.json'), 'w', encoding='utf-8') as file:
+            json.dump(fingerprint or file_fingerprint(file_name), file)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(temporary_directory, directory)
+    except OSError as error:
+        shutil.rmtree(temporary_directory, ignore_errors=True)
+        print(f'Кэш не сохранён: {error}', file=sys.stderr)
+        return False
+    return True
+
+
+def cached_columns(file_name: str, parse: Callable[[], VacancyColumns], use_cache: bool = True,
+                   key: dict = None) -> VacancyColumns:
+    """Столбцы файла из кэша или из разбора с последующим сохранением в кэш
+
+    Отпечаток снимается до разбора: если файл дописывается во время разбора,
+    кэш получает прежний отпечаток и при следующем запуске считается устаревшим.
+
+    :param file_name: Название файла
+    :param parse: Функция полного разбора файла
+    :param use_cache: False - разобрать файл заново, не читая и не записывая кэш
+    :param key: Настройки разбора, которые входят в отпечаток (например дополнительные валюты)
+
+    :return: VacancyColumns
+    """
+    if not use_cache:
+        return parse()
+    fingerprint = dict(file_fingerprint(file_name), **(key or dict()))
+    columns = load_columns(file_name, fingerprint)
+    if columns is None:
+        columns = parse()
+        save_columns(file_name, columns, fingerprint)
+    return columns
+
+
+class CacheTests(TestCase):
+    def setUp(self):
+        import tempfile
+        self.directory = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.directory.name, 'vacancies.csv')
+        with open(self.file_name, 'w', encoding='utf-8') as file:
+            file.write('name,salary_from,salary_to,salary_currency,area_name,published_at\n')
+        self.parsed = 0
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def parse(self, append: str = '') -> VacancyColumns:
+        import datetime
+        from columnar import ColumnsBuilder
+        self.parsed += 1
+        builder = ColumnsBuilder()
+        builder.append('Программист', 1000.0 * self.parsed, 'Москва', 'RUR', datetime.datetime(2022, 1, 1))
+        if append:
+            with open(self.file_name, 'a', encoding='utf-8') as file:
+                file.write(append)
+        return builder.build()
+
+    def test_hit_and_invalidation(self):
+        self.assertEqual(cached_columns(self.file_name, self.parse).salary.tolist(), [1000.0])
+        self.assertEqual(cached_columns(self.file_name, self.parse).salary.tolist(), [1000.0])
+        self.assertEqual(self.parsed, 1)
+        with open(self.file_name, 'a', encoding='utf-8') as file:
+            file.write('Программист,100,200,RUR,Москва,2022-06-14T11:44:58+0300\n')
+        self.assertEqual(cached_columns(self.file_name, self.parse).salary.tolist(), [2000.0])
+        self.assertEqual(self.parsed, 2)
+
+    def test_file_appended_while_parsing(self):
+        row = 'Программист,100,200,RUR,Москва,2022-06-14T11:44:58+0300\n'
+        cached_columns(self.file_name, lambda: self.parse(row))
+        self.assertEqual(cached_columns(self.file_name, self.parse).salary.tolist(), [2000.0])
+        self.assertEqual(self.parsed, 2)
+
+    def test_unwritable_cache_directory(self):
+        open(cache_directory(self.file_name), 'w').close()
+        columns = cached_columns(self.file_name, self.parse)
+        self.assertEqual(columns.salary.tolist(), [1000.0])
+        self.assertEqual(sorted(os.listdir(self.directory.name)), ['vacancies.csv', 'vacancies.csv.cache'])
@@ -0,0 +1,167 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from matplotlib import rc_context
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+CHART_STYLE = {'font.size': 8}
+CHART_FORMATS = ('png', 'svg')
+
+
+class ChartTemplate:
+    """Шаблон листа графиков отчёта на неинтерактивном бэкенде Agg
+
+    Общие для всех профессий данные (зарплаты и количество по годам, города)
+    рисуются один раз; при рендере профессии меняются только высоты её столбцов
+    и подписи легенд. Фигура не регистрируется в pyplot и закрывается в close().
+
+    Attributes:
+        figure (Figure): Фигура с четырьмя графиками
+    """
+    width = 0.4
+
+    def __init__(self, dynamics_slr: dict, dynamics_count_vac: dict,
+                 dynamics_slr_cities: dict, dynamics_count_vac_cities: dict) -> None:
+        """Построение общей части графиков
+
+        :param dynamics_slr: Словарь с годами и зарплатами
+        :param dynamics_count_vac: Словарь с годами и количеством
+        :param dynamics_slr_cities: Словарь заплаты по городам
+        :param dynamics_count_vac_cities: Словарь с количеством вакансий по городам
+        """
+        self.__years = list(dynamics_slr.keys())
+        with rc_context(CHART_STYLE):
+            self.figure = Figure(figsize=(10, 6))
+            FigureCanvasAgg(self.figure)
+            years, width = np.arange(len(self.__years)), self.width
+            self.__ax = self.figure.add_subplot(221)
+            self.__ax.bar(years - width / 2, dynamics_slr.values(), width, label='средняя з/п')
+            self.__salary_bars = self.__ax.bar(years + width / 2, np.zeros(len(years)), width)
+            self.__ax.set_title('Уровень зарплат по годам')
+            self.__ax.set_xticks(years, self.__years, rotation='vertical')
+            self.__ax.set_xticklabels(self.__years)
+
+            self.__bx = self.figure.add_subplot(222)
+            self.__bx.bar(years - width / 2, dynamics_count_vac.values(), width, label='Количество вакансий')
+            self.__count_bars = self.__bx.bar(years + width / 2, np.zeros(len(years)), width)
+            self.__bx.set_title('Количество вакансий по годам')
+            self.__bx.set_xticks(years, self.__years, rotation='vertical')
+            self.__bx.set_xticklabels(self.__years)
+            self.__bx.grid(axis='y')
+
+            dynamics_slr_cities_rev = dict(reversed(list(dynamics_slr_cities.items())[:10]))
+            cities_slr = np.arange(len(dynamics_slr_cities_rev.keys()))
+            cx = self.figure.add_subplot(223)
+            cx.barh(cities_slr - width / 2, dynamics_slr_cities_rev.values(), width + 0.2)
+            cx.set_title('Уровень зарплат по годам')
+            cx.set_yticks(cities_slr)
+            cx.set_yticklabels(dynamics_slr_cities_rev.keys())
+            cx.grid(axis='x')
+
+            dx = self.figure.add_subplot(224)
+            dynamics_count_vac_cit_rev = dict(reversed(list(dynamics_count_vac_cities.items())))
+            dx.pie(dynamics_count_vac_cit_rev.values(), labels=dynamics_count_vac_cit_rev.keys())
+            dx.set_title('Доля вакансий по городам')
+            dx.axis('equal')
+
+    def render(self, input_name: str, dynamics_slr_name: dict, dynamics_count_vac_name: dict,
+               file_name, file_format: str = None) -> None:
+        """Обновление столбцов профессии и сохранение фигуры
+
+        :param input_name: Название профессии
+        :param dynamics_slr_name: Словарь с наименованием и зарплатой
+        :param dynamics_count_vac_name: Словарь с наименованием и количеством вакансий
+        :param file_name: Путь или файловый объект для сохранения
+        :param file_format: Формат (png, svg); по умолчанию - по расширению файла
+
+        :return: nothing
+        """
+        with rc_context(CHART_STYLE):
+            for axes, bars, values, label in ((self.__ax, self.__salary_bars, dynamics_slr_name,
+                                               f'з/п {input_name}'),
+                                              (self.__bx, self.__count_bars, dynamics_count_vac_name,
+                                               f'Количество вакансий\n{input_name}')):
+                for bar, year in zip(bars, self.__years):
+                    bar.set_height(values.get(year, 0))
+                bars.set_label(label)
+                axes.relim()
+                axes.autoscale_view()
+                axes.legend()
+            self.figure.tight_layout()
+            self.figure.savefig(file_name, format=file_format)
+
+    def close(self) -> None:
+        """Освобождение фигуры
+
+        :return: nothing
+        """
+        self.figure.clear()
+
+    def __enter__(self) -> 'ChartTemplate':
+        return self
+
+    def __exit__(self, *exception) -> None:
+        self.close()
+
+
+_worker_template = None
+
+
+def _init_worker(common_dictionaries: tuple) -> None:
+    """Инициализатор процесса пула: один шаблон на процесс
+
+    :param common_dictionaries: Общие словари статистики для ChartTemplate
+
+    :return: nothing
+    """
+    global _worker_template
+    _worker_template = ChartTemplate(*common_dictionaries)
+
+
+def _render_task(task: tuple) -> list:
+    """Рендер графиков одной профессии в процессе пула
+
+    :param task: кортеж (профессия, зарплаты, количество, путь без расширения, форматы)
+
+    :return: лист сохранённых файлов
+    """
+    input_name, dynamics_slr_name, dynamics_count_vac_name, base_path, formats = task
+    paths = list()
+    for file_format in formats:
+        paths.append(f'{base_path}.{file_format}')
+        _worker_template.render(input_name, dynamics_slr_name, dynamics_count_vac_name, paths[-1], file_format)
+    return paths
+
+
+def render_many(dynamics_slr: dict, dynamics_count_vac: dict, dynamics_slr_cities: dict,
+                dynamics_count_vac_cities: dict, professions: list, formats: tuple = ('png',),
+                workers: int = None) -> list:
+    """Параллельный рендер графиков многих профессий в отдельные файлы
+
+    :param dynamics_slr: Словарь с годами и зарплатами
+    :param dynamics_count_vac: Словарь с годами и количеством
+    :param dynamics_slr_cities: Словарь заплаты по городам
+    :param dynamics_count_vac_cities: Словарь с количеством вакансий по городам
+    :param professions: Лист кортежей (профессия, зарплаты по годам, количество по годам, путь без расширения)
+    :param formats: Форматы файлов из CHART_FORMATS
+    :param workers: Количество процессов, по умолчанию os.cpu_count()
+
+    :return: лист сохранённых файлов
+    """
+    unknown_formats = set(formats) - set(CHART_FORMATS)
+    if unknown_formats:
+        raise ValueError(f'Неизвестные форматы графиков: {", ".join(sorted(unknown_formats))}')
+    tasks = [(*profession, tuple(formats)) for profession in professions]
+    common_dictionaries = (dynamics_slr, dynamics_count_vac, dynamics_slr_cities, dynamics_count_vac_cities)
+    workers = min(workers or os.cpu_count() or 1, max(len(tasks), 1))
+    if workers == 1:
+        _init_worker(common_dictionaries)
+        try:
+            return [path for task in tasks for path in _render_task(task)]
+        finally:
+            _worker_template.close()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(common_dictionaries,)) as executor:
+        return [path for paths in executor.map(_render_task, tasks) for path in paths]
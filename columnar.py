@@ -0,0 +1,300 @@
+import datetime
+import json
+import os
+from array import array
+from collections import namedtuple
+from typing import Iterable, Iterator, TYPE_CHECKING
+
+import numpy as np
+
+from accumulators import QuantileSketch
+from group_by import group_by
+from matcher import AhoCorasick
+
+if TYPE_CHECKING:
+    from exchange_rates import ExchangeRates
+
+EXPORT_TIMEZONE = datetime.timezone(datetime.timedelta(hours=3))
+ROWS_BATCH = 65536
+VacancyRow = namedtuple('VacancyRow', ('name', 'salary', 'area_name', 'salary_currency', 'published_at'))
+
+
+class ColumnsBuilder:
+    """Построитель колоночного хранилища: копит типизированные массивы по одной вакансии
+
+    Attributes:
+        salary (array): Зарплаты в рублях
+        salary_sum (array): Сумма вилки зарплаты (от + до) в валюте вакансии
+        month (array): Порядковый номер месяца публикации (год * 12 + месяц - 1)
+        published (array): Момент публикации, секунды Unix
+        area (array): Коды регионов
+        currency (array): Коды валют
+        name (array): Коды названий вакансий
+    """
+    def __init__(self) -> None:
+        """Конструктор класса ColumnsBuilder
+        """
+        self.salary, self.salary_sum, self.month = array('d'), array('d'), array('i')
+        self.published = array('q')
+        self.area, self.currency, self.name = array('i'), array('h'), array('i')
+        self.__areas, self.__currencies, self.__names = dict(), dict(), dict()
+
+    def __len__(self) -> int:
+        """Количество накопленных строк
+
+        :return: int
+        """
+        return len(self.salary)
+
+    def append(self, name: str, salary: float, area_name: str, currency: str, published_at,
+               salary_sum: float = 0) -> None:
+        """Добавление одной вакансии в конец столбцов
+
+        :param name: Название вакансии
+        :param salary: Зарплата в рублях
+        :param area_name: Регион
+        :param currency: Валюта зарплаты
+        :param published_at: Дата публикации (datetime)
+        :param salary_sum: Сумма вилки зарплаты в валюте вакансии
+
+        :return: nothing
+        """
+        self.salary.append(salary)
+        self.salary_sum.append(salary_sum)
+        self.month.append(published_at.year * 12 + published_at.month - 1)
+        self.published.append(int(published_at.timestamp()))
+        self.area.append(self.__areas.setdefault(area_name, len(self.__areas)))
+        self.currency.append(self.__currencies.setdefault(currency, len(self.__currencies)))
+        self.name.append(self.__names.setdefault(name, len(self.__names)))
+
+    def build(self) -> 'VacancyColumns':
+        """Сборка неизменяемого хранилища из накопленных массивов
+
+        :return: VacancyColumns
+        """
+        return VacancyColumns(np.frombuffer(self.salary, dtype=np.float64),
+                              np.frombuffer(self.salary_sum, dtype=np.float64),
+                              np.frombuffer(self.month, dtype=np.int32),
+                              np.frombuffer(self.published, dtype=np.int64),
+                              np.frombuffer(self.area, dtype=np.int32),
+                              np.frombuffer(self.currency, dtype=np.int16),
+                              np.frombuffer(self.name, dtype=np.int32),
+                              list(self.__areas), list(self.__currencies), list(self.__names))
+
+
+class VacancyColumns:
+    """Колоночное хранилище вакансий на массивах NumPy
+
+    Категориальные столбцы хранят коды, сами строки лежат в словарях
+    категорий в порядке первого появления в файле.
+
+    Attributes:
+        salary (np.ndarray): Зарплаты в рублях, float64
+        salary_sum (np.ndarray): Сумма вилки зарплаты в валюте вакансии, float64
+        month (np.ndarray): Порядковый номер месяца публикации, int32
+        published (np.ndarray): Момент публикации, секунды Unix, int64
+        area (np.ndarray): Коды регионов, int32
+        currency (np.ndarray): Коды валют, int16
+        name (np.ndarray): Коды названий вакансий, int32
+        areas (list): Словарь регионов
+        currencies (list): Словарь валют
+        names (list): Словарь названий вакансий
+    """
+    COLUMNS = ('salary', 'salary_sum', 'month', 'published', 'area', 'currency', 'name')
+
+    def __init__(self, salary: np.ndarray, salary_sum: np.ndarray, month: np.ndarray, published: np.ndarray,
+                 area: np.ndarray, currency: np.ndarray, name: np.ndarray,
+                 areas: list, currencies: list, names: list) -> None:
+        """Конструктор класса VacancyColumns
+
+        :param salary: Зарплаты в рублях
+        :param salary_sum: Суммы вилок зарплат в валютах вакансий
+        :param month: Порядковые номера месяцев публикации
+        :param published: Моменты публикации, секунды Unix
+        :param area: Коды регионов
+        :param currency: Коды валют
+        :param name: Коды названий вакансий
+        :param areas: Словарь регионов
+        :param currencies: Словарь валют
+        :param names: Словарь названий вакансий
+        """
+        self.salary, self.salary_sum, self.month, self.published = salary, salary_sum, month, published
+        self.area, self.currency, self.name = area, currency, name
+        self.areas, self.currencies, self.names = areas, currencies, names
+
+    def __len__(self) -> int:
+        """Количество накопленных строк
+
+        :return: int
+        """
+        return len(self.salary)
+
+    @classmethod
+    def from_vacancies(cls, vacancies: Iterable) -> 'VacancyColumns':
+        """Создание хранилища из итератора вакансий (например DataSet.iter_vacancies)
+
+        :param vacancies: Итератор объектов Vacancy
+
+        :return: VacancyColumns
+        """
+        builder = ColumnsBuilder()
+        for vacancy in vacancies:
+            builder.append(vacancy.name, vacancy.salary, vacancy.area_name,
+                           vacancy.salary_currency, vacancy.published_at, vacancy.salary_sum)
+        return builder.build()
+
+    def save(self, directory: str) -> None:
+        """Сохранение столбцов в папку: по файлу .npy на столбец и словари в categories.json
+
+        :param directory: Папка хранилища
+
+        :return: nothing
+        """
+        os.makedirs(directory, exist_ok=True)
+        for column in self.COLUMNS:
+            np.save(os.path.join(directory, f'{column}.npy'), getattr(self, column))
+        with open(os.path.join(directory, 'categories.json'), 'w', encoding='utf-8') as file:
+            json.dump({'areas': self.areas, 'currencies': self.currencies, 'names': self.names},
+                      file, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: str = 'r') -> 'VacancyColumns':
+        """Загрузка столбцов, сохранённых методом save, с отображением файлов в память
+
+        :param directory: Папка хранилища
+        :param mmap_mode: Режим np.load; None - прочитать в память целиком
+
+        :return: VacancyColumns
+        """
+        with open(os.path.join(directory, 'categories.json'), encoding='utf-8') as file:
+            categories = json.load(file)
+        return cls(*(np.load(os.path.join(directory, f'{column}.npy'), mmap_mode=mmap_mode)
+                     for column in cls.COLUMNS),
+                   categories['areas'], categories['currencies'], categories['names'])
+
+    def convert_salaries(self, rates: 'ExchangeRates') -> 'VacancyColumns':
+        """Пересчёт зарплат в рубли по курсу месяца публикации
+
+        Курс каждой строки берётся одной выборкой из массива (валюта x месяц),
+        округление то же, что в Vacancy: (от + до) * курс // 2.
+
+        :param rates: Таблица курсов (exchange_rates.ExchangeRates)
+
+        :return: новое хранилище с теми же столбцами, кроме salary
+        """
+        salary = np.floor_divide(self.salary_sum * rates.ratio(self.currency, self.month, self.currencies), 2)
+        return VacancyColumns(salary, self.salary_sum, self.month, self.published, self.area, self.currency, self.name,
+                              self.areas, self.currencies, self.names)
+
+    def iter_rows(self) -> Iterator[VacancyRow]:
+        """Строки хранилища в исходном порядке с полями Vacancy для листа всех вакансий XLSX
+
+        Столбцы читаются пачками по ROWS_BATCH, время публикации - в EXPORT_TIMEZONE.
+
+        :return: итератор VacancyRow
+        """
+        for start in range(0, len(self), ROWS_BATCH):
+            stop = start + ROWS_BATCH
+            yield from (VacancyRow(self.names[name], salary, self.areas[area], self.currencies[currency],
+                                   datetime.datetime.fromtimestamp(published, EXPORT_TIMEZONE))
+                        for name, salary, area, currency, published in zip(
+                            self.name[start:stop].tolist(), self.salary[start:stop].tolist(),
+                            self.area[start:stop].tolist(), self.currency[start:stop].tolist(),
+                            self.published[start:stop].tolist()))
+
+    @property
+    def year(self) -> np.ndarray:
+        """Год публикации каждой вакансии
+        """
+        return self.month // 12
+
+    def profession_mask(self, profession: str) -> np.ndarray:
+        """Маска вакансий, в названии которых встречается профессия
+
+        Проверка подстроки выполняется один раз на уникальное название,
+        а не на каждую строку.
+
+        :param profession: Наименование профессии
+
+        :return: булев массив длины len(self)
+        """
+        matches = np.fromiter((profession in name for name in self.names), dtype=bool, count=len(self.names))
+        return matches[self.name]
+
+    def year_stats(self, mask: np.ndarray = None) -> dict:
+        """Сумма и количество зарплат по годам (частный случай group_by.group_by)
+
+        Годы идут в порядке первого появления, как в InputConnect.count_vacancies.
+
+        :param mask: Необязательная маска строк; годы без строк получают (0, 0)
+
+        :return: словарь {год: (сумма, количество)}
+        """
+        return {year: (total, count) for year, (total, count, _) in group_by(self, ('year',), mask=mask).items()}
+
+    def city_stats(self) -> dict:
+        """Сумма и количество зарплат по регионам в порядке первого появления
+
+        :return: словарь {регион: (сумма, количество)}
+        """
+        return {city: (total, count) for city, (total, count, _) in group_by(self, ('city',)).items()}
+
+    def profession_stats(self, profession: str) -> dict:
+        """Сумма и количество зарплат по годам для профессии
+
+        :param profession: Наименование профессии
+
+        :return: словарь {год: (сумма, количество)}, содержит все годы файла
+        """
+        return self.year_stats(self.profession_mask(profession))
+
+    def professions_stats(self, professions: list) -> dict:
+        """Сумма и количество зарплат по годам сразу для списка профессий
+
+        Все профессии ищутся в каждом уникальном названии одним проходом
+        автомата Ахо-Корасик.
+
+        :param professions: Лист профессий
+
+        :return: словарь {профессия: {год: (сумма, количество)}}
+        """
+        automaton = AhoCorasick(professions)
+        matches = np.zeros((len(professions), len(self.names)), dtype=bool)
+        for code, name in enumerate(self.names):
+            for index in automaton.find(name):
+                matches[index, code] = True
+        return {profession: self.year_stats(matches[index][self.name])
+                for index, profession in enumerate(professions)}
+
+    def quantile_stats(self, mask: np.ndarray = None) -> tuple:
+        """Скетчи квантилей зарплат по годам и регионам (accumulators.QuantileSketch)
+
+        Ключи идут в том же порядке, что в year_stats и city_stats.
+
+        :param mask: Необязательная маска строк для скетчей по годам (профессия)
+
+        :return: кортеж ({год: скетч}, {регион: скетч})
+        """
+        years = self.year
+        year_sketches = self.__sketches(years if mask is None else years[mask],
+                                        self.salary if mask is None else self.salary[mask])
+        if mask is not None:
+            year_sketches = {year: year_sketches.get(year, QuantileSketch()) for year in self.year_stats()}
+        city_sketches = self.__sketches(self.area, self.salary)
+        return year_sketches, {self.areas[code]: sketch for code, sketch in city_sketches.items()}
+
+    @staticmethod
+    def __sketches(codes: np.ndarray, salaries: np.ndarray) -> dict:
+        """Скетч на каждый код: строки группы собираются одной устойчивой сортировкой
+
+        :param codes: Коды групп
+        :param salaries: Зарплаты
+
+        :return: словарь {код: QuantileSketch} в порядке первого появления кода
+        """
+        order = np.argsort(codes, kind='stable')
+        sorted_codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]) if len(codes) else list()
+        ends = list(starts[1:]) + [len(codes)]
+        groups = sorted((order[start], int(sorted_codes[start]), order[start:end]) for start, end in zip(starts, ends))
+        return {code: QuantileSketch().update(salaries[rows].tolist()) for _, code, rows in groups}
@@ -1,27 +1,30 @@
-from csv import reader, writer
+import os
+from argparse import ArgumentParser
+from collections import OrderedDict
+from csv import writer
+
+from readers import open_text
+from tokenizer import RowTokenizer
 
 
 def parse_csv_file(file="C:/Users/Michael/PycharmProjects/Emelianov/vacancies_big.csv") -> tuple:
     """Функция фильтрации файла от некорректных строк и создания словаря с вакансиями по годам
 
-    :param file: директория .csv файла
+    :param file: директория .csv файла, можно сжатого (.csv.gz, .csv.zst, .csv.bz2, .csv.xz)
     :return: кортеж словаря с вакансиями по годам и headline листа
     """
     years_dictionary = dict()
-    with open(file, 'r', encoding='utf-8-sig') as current_file:
-        csv_reader = reader(current_file)
-        headline = next(csv_reader)
+    with open_text(file) as current_file:
+        tokenizer = RowTokenizer(current_file)
+        headline = tokenizer.headlines
         headline[0] = 'name'
-
-        for item in list(csv_reader):
-            if len(item) == len(headline) and '' not in item:
-                current_year = item[headline.index('published_at;;;')][:4]
-                if current_year not in years_dictionary.keys():
-                    years_dictionary[current_year] = [item]
-                else:
-                    years_list = years_dictionary[current_year]
-                    years_list.append(item)
-                    years_dictionary[current_year] = years_list
+        year_index = headline.index('published_at;;;')
+        for item in tokenizer:
+            current_year = item[year_index][:4]
+            if current_year not in years_dictionary:
+                years_dictionary[current_year] = [item]
+            else:
+                years_dictionary[current_year].append(item)
     return years_dictionary, headline
 
 
@@ -40,5 +43,84 @@ def create_csv_files(headlines: list, years_vacancies: list) -> None:
                 csv_writer.writerow(current_row)
 
 
-csv_dictionary, headline = parse_csv_file()
-create_csv_files(headline, csv_dictionary)
+def split_csv_by_years(file: str, output_directory: str = 'CSV',
+                       max_open_files: int = 32, buffer_size: int = 1024 * 1024) -> dict:
+    """Потоковое разбиение файла на CSV/{год}.csv без накопления строк в памяти
+
+    Каждая корректная строка сразу пишется в файл своего года. Открытых файлов
+    не больше max_open_files: самый давно использованный закрывается и при
+    следующей строке его года дописывается в режиме 'a'.
+
+    :param file: директория .csv файла, можно сжатого (.csv.gz, .csv.zst, .csv.bz2, .csv.xz)
+    :param output_directory: папка для файлов по годам
+    :param max_open_files: максимальное количество одновременно открытых файлов
+    :param buffer_size: размер буфера записи каждого файла
+    :return: словарь количества записанных строк по годам
+    """
+    os.makedirs(output_directory, exist_ok=True)
+    open_writers, rows_count = OrderedDict(), dict()
+    with open_text(file) as current_file:
+        tokenizer = RowTokenizer(current_file)
+        headline = tokenizer.headlines
+        if len(headline) == 0:
+            return rows_count
+        headline[0] = 'name'
+        year_index = next(i for i, column in enumerate(headline) if column.startswith('published_at'))
+        try:
+            for item in tokenizer:
+                current_year = item[year_index][:4]
+                if current_year in open_writers:
+                    open_writers.move_to_end(current_year)
+                else:
+                    if len(open_writers) >= max_open_files:
+                        open_writers.popitem(last=False)[1][0].close()
+                    following_file = open(os.path.join(output_directory, f'{current_year}.csv'),
+                                          'a' if current_year in rows_count else 'w',
+                                          encoding='utf-8-sig', newline='', buffering=buffer_size)
+                    open_writers[current_year] = (following_file, writer(following_file))
+                    if current_year not in rows_count:
+                        open_writers[current_year][1].writerow(headline)
+                        rows_count[current_year] = 0
+                open_writers[current_year][1].writerow(item)
+                rows_count[current_year] += 1
+        finally:
+            for following_file, _ in open_writers.values():
+                following_file.close()
+    return rows_count
+
+
+def split_columnar_by_years(file: str, output_directory: str, file_format: str = None) -> dict:
+    """Разбиение файла на колоночный набор по годам (см. partitions.write_partitions)
+
+    Пишутся только шесть столбцов, которые использует main.py, уже разобранные
+    и со словарным кодированием строк; DataSet читает набор с отбором годов и столбцов.
+
+    :param file: директория .csv файла, можно сжатого (.csv.gz, .csv.zst, .csv.bz2, .csv.xz)
+    :param output_directory: папка набора
+    :param file_format: 'parquet' или 'npy'; по умолчанию parquet, если установлен pyarrow
+    :return: словарь количества строк по годам
+    """
+    from main import DataSet
+    from partitions import write_partitions
+    return write_partitions(DataSet(file, list()).iter_vacancies(), output_directory, file_format)
+
+
+if __name__ == '__main__':
+    arguments_parser = ArgumentParser(description='Разбиение выгрузки вакансий на файлы по годам')
+    arguments_parser.add_argument('file', help='директория .csv файла')
+    arguments_parser.add_argument('--output', default='CSV', help='папка для файлов по годам')
+    arguments_parser.add_argument('--max-open-files', type=int, default=32,
+                                  help='максимальное количество одновременно открытых файлов')
+    arguments_parser.add_argument('--format', choices=('csv', 'columnar', 'parquet', 'npy'), default='csv',
+                                  help='csv - файлы CSV/{год}.csv; columnar - набор по годам для main.py '
+                                       '(parquet при установленном pyarrow, иначе npy)')
+    arguments = arguments_parser.parse_args()
+    if arguments.format == 'csv':
+        split_csv_by_years(arguments.file, arguments.output, arguments.max_open_files)
+    else:
+        try:
+            split_columnar_by_years(arguments.file, arguments.output,
+                                    None if arguments.format == 'columnar' else arguments.format)
+        except FileExistsError as error:
+            print(error)
+            exit()
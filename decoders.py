@@ -0,0 +1,83 @@
+import datetime
+import sys
+from unittest import TestCase
+
+PUBLISHED_AT_FORMAT = '%Y-%m-%dT%H:%M:%S%z'
+
+
+def parse_published_at(value: str) -> datetime.datetime:
+    """Разбор даты публикации вида 2022-06-14T11:44:58+0300
+
+    Строки ровно этого формата разбираются быстрым datetime.fromisoformat,
+    всё остальное уходит в datetime.strptime с прежним форматом.
+
+    :param value: Строка с датой публикации
+
+    :return: datetime с часовым поясом
+
+    >>> parse_published_at('2022-06-14T11:44:58+0300').year
+    2022
+    """
+    if len(value) == 24 and value[10] == 'T' and value[19] in '+-':
+        try:
+            return datetime.datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return datetime.datetime.strptime(value, PUBLISHED_AT_FORMAT)
+
+
+def parse_salary(value: str) -> int:
+    """Разбор зарплаты без лишнего split/join/float для обычных целых чисел
+
+    Дробные значения и числа с пробелами внутри разбираются как раньше.
+
+    :param value: Строка с зарплатой
+
+    :return: целая часть зарплаты
+
+    >>> parse_salary('100000')
+    100000
+    >>> parse_salary('50 000.5')
+    50000
+    """
+    try:
+        return int(value)
+    except ValueError:
+        return int(float(''.join(value.split())))
+
+
+def intern_string(value: str) -> str:
+    """Интернирование повторяющихся строк (регионы, валюты)
+
+    Одинаковые значения из разных строк файла ссылаются на один объект.
+
+    :param value: Строка
+
+    :return: интернированная строка
+    """
+    return sys.intern(value)
+
+
+class DecodersTests(TestCase):
+    published_values = ['2022-06-14T11:44:58+0300', '2007-12-03T17:40:09+0000',
+                        '2019-01-31T23:59:59-0530', '2022-06-14T11:44:58+03:00',
+                        '2022-06-14T11:44:58Z']
+    salary_values = ['100000', '0', ' 70000 ', '50 000', '70000.5', '1e5', '1_000', '-300']
+
+    def test_published_at_matches_strptime(self):
+        for value in self.published_values:
+            expected = datetime.datetime.strptime(value, PUBLISHED_AT_FORMAT)
+            actual = parse_published_at(value)
+            self.assertEqual(actual, expected)
+            self.assertEqual(actual.utcoffset(), expected.utcoffset())
+
+    def test_published_at_rejects_like_strptime(self):
+        for value in ['2022-06-14T11:44:58.123Z', '2022-13-14T11:44:58+0300', '']:
+            self.assertRaises(ValueError, parse_published_at, value)
+
+    def test_salary_matches_float_round_trip(self):
+        for value in self.salary_values:
+            self.assertEqual(parse_salary(value), int(float(''.join(value.split()))))
+
+    def test_intern_string(self):
+        self.assertIs(intern_string(''.join(['Моск', 'ва'])), intern_string('Москва'))
@@ -0,0 +1,228 @@
+import hashlib
+import math
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+FINGERPRINT_COLUMNS = ('name', 'salary_from', 'salary_to', 'salary_currency', 'area_name', 'published_at')
+BLOOM_CAPACITY = 10_000_000
+BLOOM_ERROR_RATE = 0.01
+MEMORY_FINGERPRINTS = 2_000_000
+BATCH_SIZE = 4096
+
+
+def fingerprints(lines: list, indexes: list) -> np.ndarray:
+    """Отпечатки строк: blake2b (8 байт) от идентифицирующих полей
+
+    :param lines: Лист строк csv
+    :param indexes: Номера идентифицирующих столбцов
+
+    :return: массив int64 длины len(lines)
+    """
+    digests = b''.join(hashlib.blake2b('\x1f'.join([line[index] for index in indexes]).encode('utf-8'),
+                                       digest_size=8).digest() for line in lines)
+    return np.frombuffer(digests, dtype=np.int64)
+
+
+class BloomFilter:
+    """Фильтр Блума фиксированного размера над 64-битными отпечатками
+
+    Позиции битов - двойное хеширование половин отпечатка, размер -
+    степень двойки, поэтому вся пачка проверяется векторно.
+
+    Attributes:
+        size (int): Количество битов
+        hashes (int): Количество позиций на отпечаток
+    """
+    def __init__(self, capacity: int = BLOOM_CAPACITY, error_rate: float = BLOOM_ERROR_RATE) -> None:
+        """Конструктор класса BloomFilter
+
+        :param capacity: Ожидаемое количество отпечатков
+        :param error_rate: Доля ложных срабатываний при capacity отпечатках
+        """
+        bits = -capacity * math.log(error_rate) / math.log(2) ** 2
+        self.size = 1 << max(math.ceil(math.log2(bits)), 6)
+        self.hashes = max(round(bits / capacity * math.log(2)), 1)
+        self.__bits = np.zeros(self.size // 8, dtype=np.uint8)
+
+    def __positions(self, values: np.ndarray) -> np.ndarray:
+        """Номера битов отпечатков: (h1 + i * h2) mod size
+
+        :param values: Отпечатки int64
+
+        :return: массив формы (len(values), hashes)
+        """
+        values = values.view(np.uint64)
+        low, high = values & np.uint64(0xFFFFFFFF), (values >> np.uint64(32)) | np.uint64(1)
+        steps = np.arange(self.hashes, dtype=np.uint64)
+        return (low[:, None] + steps * high[:, None]) & np.uint64(self.size - 1)
+
+    def contains(self, values: np.ndarray) -> np.ndarray:
+        """Могли ли отпечатки уже встречаться (ложные срабатывания возможны, пропуски - нет)
+
+        :param values: Отпечатки int64
+
+        :return: булев массив
+        """
+        positions = self.__positions(values)
+        return ((self.__bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1).all(1)
+
+    def add(self, values: np.ndarray) -> None:
+        """Добавление отпечатков
+
+        :param values: Отпечатки int64
+
+        :return: nothing
+        """
+        positions = self.__positions(values).ravel()
+        np.bitwise_or.at(self.__bits, positions >> np.uint64(3),
+                         np.left_shift(1, (positions & np.uint64(7)).astype(np.uint8)).astype(np.uint8))
+
+
+class FingerprintSet:
+    """Точное множество отпечатков: в памяти, а сверх лимита - в таблице sqlite во временной папке
+
+    Attributes:
+        memory_limit (int): Сколько отпечатков держать в памяти до сброса на диск
+        spilled (int): Сколько отпечатков сброшено на диск
+    """
+    def __init__(self, memory_limit: int = MEMORY_FINGERPRINTS, directory: str = None) -> None:
+        """Конструктор класса FingerprintSet
+
+        :param memory_limit: Сколько отпечатков держать в памяти
+        :param directory: Папка для временной базы; по умолчанию системная
+        """
+        self.memory_limit, self.spilled = memory_limit, 0
+        self.__recent, self.__directory, self.__connection = set(), directory, None
+
+    def add_many(self, values: np.ndarray) -> None:
+        """Добавление отпечатков, которых заведомо ещё не было
+
+        :param values: Отпечатки int64
+
+        :return: nothing
+        """
+        self.__recent.update(values.tolist())
+        if len(self.__recent) >= self.memory_limit:
+            self.__spill()
+
+    def check_and_add(self, value: int) -> bool:
+        """Был ли отпечаток раньше; новый отпечаток добавляется
+
+        :param value: Отпечаток
+
+        :return: True для повтора
+        """
+        if value in self.__recent:
+            return True
+        if self.__connection is not None and \
+                self.__connection.execute('SELECT 1 FROM fingerprints WHERE value = ?', (value,)).fetchone():
+            return True
+        self.__recent.add(value)
+        if len(self.__recent) >= self.memory_limit:
+            self.__spill()
+        return False
+
+    def __spill(self) -> None:
+        """Сброс отпечатков из памяти в sqlite
+
+        :return: nothing
+        """
+        if self.__connection is None:
+            self.__directory = tempfile.mkdtemp(prefix='vacancies_dedup_', dir=self.__directory)
+            self.__connection = sqlite3.connect(os.path.join(self.__directory, 'fingerprints.sqlite'))
+            self.__connection.execute('PRAGMA journal_mode = OFF')
+            self.__connection.execute('PRAGMA synchronous = OFF')
+            self.__connection.execute('CREATE TABLE fingerprints (value INTEGER PRIMARY KEY) WITHOUT ROWID')
+        with self.__connection:
+            self.__connection.executemany('INSERT OR IGNORE INTO fingerprints VALUES (?)',
+                                          ((value,) for value in self.__recent))
+        self.spilled += len(self.__recent)
+        self.__recent.clear()
+
+    def close(self) -> None:
+        """Закрытие и удаление временной базы
+
+        :return: nothing
+        """
+        if self.__connection is not None:
+            self.__connection.close()
+            self.__connection = None
+            shutil.rmtree(self.__directory, ignore_errors=True)
+
+
+class Deduplicator:
+    """Поиск повторов строк: фильтр Блума отсеивает новые отпечатки, точное множество подтверждает повторы
+
+    Attributes:
+        bloom (BloomFilter): Предварительный фильтр фиксированного размера
+        exact (FingerprintSet): Точное множество отпечатков
+        duplicates (int): Найдено повторов
+        confirmed (int): Сколько отпечатков проверено по точному множеству
+    """
+    def __init__(self, capacity: int = BLOOM_CAPACITY, memory_limit: int = MEMORY_FINGERPRINTS,
+                 directory: str = None) -> None:
+        """Конструктор класса Deduplicator
+
+        :param capacity: Ожидаемое количество строк для фильтра Блума
+        :param memory_limit: Сколько отпечатков держать в памяти
+        :param directory: Папка для временной базы отпечатков
+        """
+        self.bloom, self.exact = BloomFilter(capacity), FingerprintSet(memory_limit, directory)
+        self.duplicates, self.confirmed = 0, 0
+
+    def duplicated(self, values: np.ndarray) -> np.ndarray:
+        """Какие отпечатки пачки уже встречались раньше, в том числе в этой же пачке
+
+        Отпечатки, которых точно не было (нет в фильтре и первые в пачке),
+        добавляются в точное множество без поиска.
+
+        :param values: Отпечатки int64 в порядке строк
+
+        :return: булев массив: True - повтор
+        """
+        maybe = self.bloom.contains(values)
+        _, first_index, inverse = np.unique(values, return_index=True, return_inverse=True)
+        maybe |= first_index[inverse] != np.arange(len(values))
+        self.bloom.add(values)
+        self.exact.add_many(values[~maybe])
+        duplicated = np.zeros(len(values), dtype=bool)
+        for index in np.flatnonzero(maybe):
+            duplicated[index] = self.exact.check_and_add(int(values[index]))
+        self.confirmed += int(maybe.sum())
+        self.duplicates += int(duplicated.sum())
+        return duplicated
+
+    def close(self) -> None:
+        """Освобождение временной базы
+
+        :return: nothing
+        """
+        self.exact.close()
+
+    def __enter__(self) -> 'Deduplicator':
+        return self
+
+    def __exit__(self, *exception) -> None:
+        self.close()
+
+
+class DedupTests(TestCase):
+    def test_duplicates_match_set_with_spill(self):
+        generator = np.random.default_rng(0)
+        unique = generator.integers(-2 ** 63, 2 ** 63 - 1, 5000, dtype=np.int64)
+        values = generator.permutation(np.concatenate((unique, generator.choice(unique, 2000))))
+        seen, expected = set(), list()
+        for value in values.tolist():
+            expected.append(value in seen)
+            seen.add(value)
+        with Deduplicator(capacity=10000, memory_limit=500) as deduplicator:
+            actual = np.concatenate([deduplicator.duplicated(values[start:start + 700])
+                                     for start in range(0, len(values), 700)])
+            self.assertGreater(deduplicator.exact.spilled, 0)
+        self.assertEqual(actual.tolist(), expected)
+        self.assertEqual(deduplicator.duplicates, sum(expected))
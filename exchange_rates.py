@@ -0,0 +1,204 @@
+import csv
+import json
+import os
+from functools import lru_cache
+from unittest import TestCase
+
+import numpy as np
+
+RATES_VERSION = 1
+
+
+def month_index(date: str) -> int:
+    """Порядковый номер месяца из даты вида 2019-05 или 2019-05-31
+
+    >>> month_index('2019-05-31')
+    24232
+
+    :param date: Дата
+
+    :return: год * 12 + месяц - 1, как столбец VacancyColumns.month
+    """
+    return int(date[:4]) * 12 + int(date[5:7]) - 1
+
+
+class ExchangeRates:
+    """Помесячная таблица курсов валют в виде плотного массива (валюта x месяц)
+
+    Пропущенные месяцы заполняются ближайшим предыдущим курсом (в начале -
+    ближайшим следующим), месяцы вне таблицы получают крайний курс, а валюты,
+    которых нет в таблице, - статический курс default.
+
+    Attributes:
+        currencies (list): Валюты строк массива
+        first_month (int): Порядковый номер первого месяца таблицы
+        rates (np.ndarray): Курсы, float64 формы (валюты, месяцы)
+    """
+    def __init__(self, currencies: list, first_month: int, rates: np.ndarray) -> None:
+        """Конструктор класса ExchangeRates
+
+        :param currencies: Валюты строк массива
+        :param first_month: Порядковый номер первого месяца
+        :param rates: Массив курсов (валюты, месяцы)
+        """
+        self.currencies, self.first_month, self.rates = currencies, first_month, rates
+
+    @classmethod
+    def from_records(cls, records: list, default: dict = None) -> 'ExchangeRates':
+        """Построение таблицы из записей (месяц, валюта, курс)
+
+        >>> rates = ExchangeRates.from_records([('2020-01', 'USD', 60), ('2020-03', 'USD', 70)], {'RUR': 1})
+        >>> rates.currencies, rates.rates.tolist()
+        (['USD', 'RUR'], [[60.0, 60.0, 70.0], [1.0, 1.0, 1.0]])
+
+        :param records: Итератор кортежей (дата, валюта, курс)
+        :param default: Статические курсы для валют без истории (Vacancy.currency_ratio)
+
+        :return: ExchangeRates
+        """
+        records = [(month_index(date), currency, float(rate)) for date, currency, rate in records]
+        if len(records) == 0:
+            raise ValueError('Пустая таблица курсов валют')
+        first_month = min(month for month, _, _ in records)
+        months_count = max(month for month, _, _ in records) - first_month + 1
+        currencies = list(dict.fromkeys(currency for _, currency, _ in records))
+        currencies += [currency for currency in (default or dict()) if currency not in currencies]
+        codes = {currency: code for code, currency in enumerate(currencies)}
+        rates = np.full((len(currencies), months_count), np.nan)
+        for month, currency, rate in records:
+            rates[codes[currency], month - first_month] = rate
+        for code, currency in enumerate(currencies):
+            row = rates[code]
+            known = np.flatnonzero(~np.isnan(row))
+            if len(known) == 0:
+                row[:] = default[currency]
+                continue
+            row[:] = row[known[np.maximum(np.searchsorted(known, np.arange(months_count), side='right') - 1, 0)]]
+        return cls(currencies, first_month, rates)
+
+    @classmethod
+    def read(cls, file_name: str, default: dict = None) -> 'ExchangeRates':
+        """Чтение таблицы курсов из CSV (date,currency,rate) или JSON ({"2020-01": {"USD": 61.9}})
+
+        :param file_name: Название файла таблицы
+        :param default: Статические курсы для валют без истории
+
+        :return: ExchangeRates
+        """
+        with open(file_name, encoding='utf-8-sig') as file:
+            if file_name.lower().endswith('.json'):
+                records = [(date, currency, rate) for date, month_rates in json.load(file).items()
+                           for currency, rate in month_rates.items()]
+            else:
+                records = [(line['date'], line['currency'], line['rate']) for line in csv.DictReader(file)]
+        return cls.from_records(records, default)
+
+    @classmethod
+    def load(cls, file_name: str, default: dict = None) -> 'ExchangeRates':
+        """Таблица курсов с запоминанием между запусками
+
+        Разобранный массив хранится рядом с таблицей в файле .rates.npz и
+        пересобирается, если таблица, её размер или статические курсы изменились.
+        Внутри процесса результат кэшируется по пути и времени изменения.
+
+        :param file_name: Название файла таблицы
+        :param default: Статические курсы для валют без истории
+
+        :return: ExchangeRates
+        """
+        stat = os.stat(file_name)
+        return _load_rates(os.path.abspath(file_name), stat.st_size, stat.st_mtime_ns,
+                           tuple(sorted((default or dict()).items())))
+
+    def currency_ratio(self, default: dict) -> dict:
+        """Статические курсы для разбора строк: default и последний курс валют, которых в нём нет
+
+        >>> ExchangeRates.from_records([('2020-01', 'CNY', 9), ('2020-02', 'CNY', 10)], {'RUR': 1}).currency_ratio(
+        ...     {'RUR': 1})
+        {'RUR': 1, 'CNY': 10.0}
+
+        :param default: Статические курсы (Vacancy.currency_ratio)
+
+        :return: словарь {валюта: курс}
+        """
+        ratio = dict(default)
+        for code, currency in enumerate(self.currencies):
+            ratio.setdefault(currency, float(self.rates[code, -1]))
+        return ratio
+
+    def code_rates(self, currencies: list) -> np.ndarray:
+        """Строки массива курсов в порядке кодов валют колоночного хранилища
+
+        :param currencies: Словарь валют (VacancyColumns.currencies)
+
+        :return: массив (len(currencies), месяцы)
+        """
+        missing = [currency for currency in currencies if currency not in self.currencies]
+        if missing:
+            raise KeyError(f'Нет курса валют: {", ".join(missing)}')
+        return self.rates[[self.currencies.index(currency) for currency in currencies]]
+
+    def ratio(self, currency: np.ndarray, month: np.ndarray, currencies: list) -> np.ndarray:
+        """Курс для каждой строки: одна выборка из массива по кодам валют и месяцам
+
+        :param currency: Коды валют строк
+        :param month: Порядковые номера месяцев строк
+        :param currencies: Словарь валют кодов
+
+        :return: массив курсов float64
+        """
+        month_codes = np.clip(month - self.first_month, 0, self.rates.shape[1] - 1)
+        return self.code_rates(currencies)[currency, month_codes]
+
+
+@lru_cache(maxsize=8)
+def _load_rates(file_name: str, size: int, mtime_ns: int, default: tuple) -> ExchangeRates:
+    """Чтение таблицы курсов через файл-памятку .rates.npz
+
+    :param file_name: Абсолютный путь таблицы
+    :param size: Размер таблицы
+    :param mtime_ns: Время изменения таблицы
+    :param default: Статические курсы кортежем пар
+
+    :return: ExchangeRates
+    """
+    key = json.dumps([RATES_VERSION, size, mtime_ns, default])
+    memo_name = f'{file_name}.rates.npz'
+    try:
+        with np.load(memo_name) as memo:
+            if str(memo['key']) == key:
+                return ExchangeRates(memo['currencies'].tolist(), int(memo['first_month']), memo['rates'])
+    except (OSError, KeyError, ValueError):
+        pass
+    rates = ExchangeRates.read(file_name, dict(default))
+    try:
+        with open(f'{memo_name}.tmp', 'wb') as file:
+            np.savez(file, key=key, currencies=np.array(rates.currencies), first_month=rates.first_month,
+                     rates=rates.rates)
+        os.replace(f'{memo_name}.tmp', memo_name)
+    except OSError:
+        pass
+    return rates
+
+
+class ExchangeRatesTests(TestCase):
+    def test_monthly_conversion_with_new_currency(self):
+        import tempfile
+        from main import DataSet, Vacancy
+        with tempfile.TemporaryDirectory() as directory:
+            file_name, rates_name = os.path.join(directory, 'vacancies.csv'), os.path.join(directory, 'rates.csv')
+            with open(file_name, 'w', encoding='utf-8') as file:
+                file.write('name,salary_from,salary_to,salary_currency,area_name,published_at\n'
+                           'Программист,100,300,USD,Москва,2020-01-14T11:44:58+0300\n'
+                           'Программист,100,300,USD,Москва,2020-03-14T11:44:58+0300\n'
+                           'Программист,100,300,CNY,Москва,2020-02-14T11:44:58+0300\n'
+                           'Программист,100,300,RUR,Москва,2020-02-14T11:44:58+0300\n')
+            with open(rates_name, 'w', encoding='utf-8') as file:
+                file.write('date,currency,rate\n2020-01,USD,60\n2020-03,USD,70\n2020-01,CNY,9\n2020-02,CNY,10\n')
+            self.assertNotIn('CNY', Vacancy.currency_ratio)
+            dataset = DataSet(file_name, list())
+            dataset.put_columns(use_cache=True, exchange_rates=rates_name)
+            self.assertEqual(dataset.vacancies_columns.salary.tolist(), [12000.0, 14000.0, 2000.0, 200.0])
+            static = DataSet(file_name, list())
+            static.put_columns(use_cache=True)
+            self.assertEqual(static.vacancies_columns.salary.tolist(), [12132.0, 12132.0, 200.0])
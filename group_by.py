@@ -0,0 +1,209 @@
+import datetime
+from argparse import ArgumentParser
+from typing import TYPE_CHECKING
+from unittest import TestCase
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from columnar import VacancyColumns
+
+GROUP_KEYS = ('year', 'quarter', 'month', 'city', 'currency', 'profession')
+FIRST_ROWS_CHUNK = 64 * 1024
+
+
+def month_label(month: int) -> str:
+    """Подпись месяца по порядковому номеру (год * 12 + месяц - 1)
+
+    :param month: Порядковый номер месяца
+
+    :return: строка вида 2022-06
+
+    >>> month_label(2022 * 12 + 5)
+    '2022-06'
+    """
+    return f'{month // 12}-{month % 12 + 1:02d}'
+
+
+def quarter_label(quarter: int) -> str:
+    """Подпись квартала по порядковому номеру (год * 4 + квартал - 1)
+
+    :param quarter: Порядковый номер квартала
+
+    :return: строка вида 2022-Q2
+
+    >>> quarter_label(2022 * 4 + 1)
+    '2022-Q2'
+    """
+    return f'{quarter // 4}-Q{quarter % 4 + 1}'
+
+
+def encode_key(columns: 'VacancyColumns', key: str, profession: str = None) -> tuple:
+    """Столбец кодов ключа группировки: небольшие неотрицательные целые и их подписи
+
+    :param columns: Колоночное хранилище
+    :param key: Ключ из GROUP_KEYS
+    :param profession: Профессия для ключа profession (входит ли она в название)
+
+    :return: кортеж (коды, количество кодов, функция код -> значение ключа)
+    """
+    if key in ('year', 'quarter', 'month'):
+        values = columns.month // {'year': 12, 'quarter': 3, 'month': 1}[key]
+        first = int(values.min()) if len(values) else 0
+        label = {'year': int, 'quarter': quarter_label, 'month': month_label}[key]
+        return values - first, int(values.max()) - first + 1 if len(values) else 0, lambda code: label(code + first)
+    if key == 'city':
+        return columns.area, len(columns.areas), columns.areas.__getitem__
+    if key == 'currency':
+        return columns.currency, len(columns.currencies), columns.currencies.__getitem__
+    if key == 'profession':
+        if profession is None:
+            raise ValueError('Для ключа profession нужна профессия')
+        return columns.profession_mask(profession).view(np.int8), 2, bool
+    raise ValueError(f'Неизвестный ключ группировки: {key}')
+
+
+def first_rows(group: np.ndarray, size: int) -> np.ndarray:
+    """Номер первой строки каждого кода группы без небуферизованного np.minimum.at
+
+    Строки просматриваются блоками растущего размера; np.unique запускается
+    только по строкам ещё не встреченных кодов, которых после первых блоков
+    почти не остаётся.
+
+    :param group: Коды групп строк
+    :param size: Количество кодов
+
+    :return: массив длины size; у кодов без строк - len(group)
+
+    >>> first_rows(np.array([2, 0, 2, 3, 0]), 5).tolist()
+    [1, 5, 0, 3, 5]
+    """
+    first = np.full(size, len(group), dtype=np.int64)
+    seen = np.zeros(size, dtype=bool)
+    start, chunk = 0, FIRST_ROWS_CHUNK
+    while start < len(group):
+        block = group[start:start + chunk]
+        fresh = np.flatnonzero(~seen[block])
+        if len(fresh):
+            codes, index = np.unique(block[fresh], return_index=True)
+            first[codes] = start + fresh[index]
+            seen[codes] = True
+        start, chunk = start + chunk, chunk * 2
+    return first
+
+
+def group_by(columns: 'VacancyColumns', keys: tuple, profession: str = None, mask: np.ndarray = None) -> dict:
+    """Сумма, количество и средняя зарплат по любому сочетанию ключей за один векторный проход
+
+    Коды ключей сводятся в один код группы (смешанная система счисления),
+    суммы и количества считаются через bincount. Группы идут в порядке первого
+    появления в хранилище, как словари InputConnect.count_vacancies.
+
+    :param columns: Колоночное хранилище
+    :param keys: Ключи из GROUP_KEYS: year, quarter, month, city, currency, profession
+    :param profession: Профессия для ключа profession
+    :param mask: Необязательная маска учитываемых строк; группы берутся из всех строк,
+        группы без учтённых строк получают (0, 0, 0)
+
+    :return: словарь {значение ключа или кортеж значений: (сумма, количество, средняя)}
+    """
+    if len(columns) == 0:
+        return dict()
+    group, size, labels = None, 1, list()
+    for key in keys:
+        codes, key_size, label = encode_key(columns, key, profession)
+        group = codes.astype(np.intp) if group is None else group * key_size + codes
+        size *= key_size
+        labels.append((key_size, label))
+    if size > 4 * len(columns):
+        unique_groups, first, group = np.unique(group, return_index=True, return_inverse=True)
+        size = len(unique_groups)
+    else:
+        unique_groups, first = None, first_rows(group, size)
+    counted = group if mask is None else group[mask]
+    sums = np.bincount(counted, weights=columns.salary if mask is None else columns.salary[mask], minlength=size)
+    counts = np.bincount(counted, minlength=size)
+    present = np.flatnonzero(first < len(columns))
+    statistic = dict()
+    for code in present[np.argsort(first[present], kind='stable')]:
+        combined, values = int(code if unique_groups is None else unique_groups[code]), list()
+        for key_size, label in reversed(labels):
+            combined, key_code = divmod(combined, key_size)
+            values.append(label(key_code))
+        count = int(counts[code])
+        statistic[values[0] if len(keys) == 1 else tuple(reversed(values))] = \
+            (float(sums[code]), count, float(sums[code]) / count if count else 0)
+    return statistic
+
+
+def rolling_mean(columns: 'VacancyColumns', window: int = 3, mask: np.ndarray = None) -> dict:
+    """Скользящая средняя зарплата по месяцам: сумма зарплат окна, делённая на их количество
+
+    Месяцы без вакансий внутри периода тоже входят в ряд; первые месяцы
+    считаются по неполному окну.
+
+    :param columns: Колоночное хранилище
+    :param window: Ширина окна в месяцах
+    :param mask: Необязательная маска учитываемых строк (например профессия)
+
+    :return: словарь {месяц 'YYYY-MM': средняя зарплата окна} по возрастанию месяцев
+    """
+    if len(columns) == 0:
+        return dict()
+    codes, size, label = encode_key(columns, 'month')
+    counted = codes if mask is None else codes[mask]
+    sums = np.cumsum(np.bincount(counted, weights=columns.salary if mask is None else columns.salary[mask],
+                                 minlength=size))
+    counts = np.cumsum(np.bincount(counted, minlength=size))
+    window_sums = sums - np.concatenate((np.zeros(window), sums[:-window]))[:size]
+    window_counts = counts - np.concatenate((np.zeros(window, dtype=counts.dtype), counts[:-window]))[:size]
+    means = np.divide(window_sums, window_counts, out=np.zeros(size), where=window_counts > 0)
+    return {label(code): float(means[code]) for code in range(size)}
+
+
+class GroupByTests(TestCase):
+    def setUp(self):
+        from columnar import ColumnsBuilder
+        builder = ColumnsBuilder()
+        for index in range(500):
+            published_at = datetime.datetime(2019 + index % 3, index // 3 % 12 + 1, 1)
+            builder.append(['Аналитик', 'Программист'][index % 3 == 0], float(index * 1000),
+                           ['Москва', 'Омск', 'Пермь'][index * 5 % 3], ['RUR', 'USD'][index % 4 == 0], published_at)
+        self.columns = builder.build()
+
+    def test_group_by_matches_dictionaries(self):
+        columns, expected = self.columns, dict()
+        for row in range(len(columns)):
+            key = (month_label(int(columns.month[row]))[:4] + '-Q' + str(columns.month[row] % 12 // 3 + 1),
+                   columns.areas[columns.area[row]], 'Программист' in columns.names[columns.name[row]])
+            total, count = expected.get(key, (0, 0))
+            expected[key] = (total + columns.salary[row], count + 1)
+        actual = group_by(columns, ('quarter', 'city', 'profession'), 'Программист')
+        self.assertEqual(list(actual), list(expected))
+        self.assertEqual([value[:2] for value in actual.values()], list(expected.values()))
+
+    def test_rolling_mean(self):
+        monthly = group_by(self.columns, ('month',))
+        window = [monthly[month] for month in ('2020-03', '2020-04', '2020-05')]
+        self.assertAlmostEqual(rolling_mean(self.columns, 3)['2020-05'],
+                               sum(total for total, _, _ in window) / sum(count for _, count, _ in window))
+
+
+if __name__ == '__main__':
+    from query import load_columns
+    arguments_parser = ArgumentParser(description='Группировка зарплат вакансий по любым ключам')
+    arguments_parser.add_argument('file', help='файл вакансий или папка набора по годам')
+    arguments_parser.add_argument('--by', nargs='+', choices=GROUP_KEYS, default=['year'], help='ключи группировки')
+    arguments_parser.add_argument('--profession', help='профессия для ключа profession или фильтра --only-profession')
+    arguments_parser.add_argument('--only-profession', action='store_true', help='учитывать только профессию')
+    arguments_parser.add_argument('--rolling', type=int, help='скользящая средняя по месяцам с таким окном')
+    arguments = arguments_parser.parse_args()
+    vacancy_columns = load_columns(arguments.file)
+    row_mask = vacancy_columns.profession_mask(arguments.profession) if arguments.only_profession else None
+    if arguments.rolling:
+        for group_key, mean in rolling_mean(vacancy_columns, arguments.rolling, row_mask).items():
+            print(f'{group_key}  {mean:>12.0f}')
+    else:
+        for group_key, (total, group_count, mean) in group_by(vacancy_columns, tuple(arguments.by),
+                                                              arguments.profession, row_mask).items():
+            print(f'{str(group_key):<40}{group_count:>10}{total:>18.0f}{mean:>12.0f}')
@@ -0,0 +1,237 @@
+import hashlib
+import json
+import mmap
+import os
+from unittest import TestCase
+
+from accumulators import CustomTuple
+from parallel import read_headlines, split_byte_ranges, count_ranges, odd_quotes
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def checkpoint_name(file_name: str, profession: str) -> str:
+    """Файл контрольной точки рядом с исходным файлом, отдельный для каждой профессии
+
+    :param file_name: Название файла
+    :param profession: Наименование профессии
+
+    :return: путь вида vacancies_big.csv.<хэш профессии>.checkpoint.json
+    """
+    return f"{file_name}.{hashlib.sha1(profession.encode('utf-8')).hexdigest()[:12]}.checkpoint.json"
+
+
+def complete_lines_end(file_name: str, start: int = 0) -> int:
+    """Смещение конца последней полной записи после start: недописанный хвост оставляется на следующий запуск
+
+    Перевод строки внутри поля в кавычках (нечётное число кавычек от start,
+    см. parallel.odd_quotes) концом записи не считается.
+
+    :param file_name: Название файла
+    :param start: Начало записи, от которого считаются кавычки
+
+    :return: смещение в байтах
+    """
+    if os.path.getsize(file_name) <= start:
+        return start
+    with open(file_name, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        end = max(data.rfind(b'\n', start) + 1, start)
+        odd = odd_quotes(data, start, end)
+        while odd:
+            previous = max(data.rfind(b'\n', start, end - 1) + 1, start)
+            odd ^= odd_quotes(data, previous, end)
+            end = previous
+    return end
+
+
+def file_state(file_name: str) -> list:
+    """Размер и время изменения файла
+
+    :param file_name: Название файла
+
+    :return: лист [размер, st_mtime_ns]
+    """
+    stat = os.stat(file_name)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def update_digest(digest, file_name: str, start: int, end: int):
+    """Дохэширование байт [start, end) файла блоками по HASH_BLOCK_SIZE
+
+    :param digest: Объект hashlib.sha1 с хэшем байт до start
+    :param file_name: Название файла
+    :param start: Начало хэшируемой части
+    :param end: Конец хэшируемой части
+
+    :return: тот же digest
+    """
+    with open(file_name, 'rb') as file:
+        file.seek(start)
+        while start < end:
+            block = file.read(min(HASH_BLOCK_SIZE, end - start))
+            if not block:
+                break
+            digest.update(block)
+            start += len(block)
+    return digest
+
+
+def prefix_digest(file_name: str, end: int, checkpoint: dict = None) -> str:
+    """sha1 первых end байт файла
+
+    Хэш уже проверенной части из контрольной точки (load_checkpoint) не
+    пересчитывается: дочитываются только байты после её смещения.
+
+    :param file_name: Название файла
+    :param end: Конец хэшируемой части
+    :param checkpoint: Контрольная точка из load_checkpoint или None
+
+    :return: hex строка sha1
+    """
+    if checkpoint is not None and checkpoint['offset'] == end:
+        return checkpoint['prefix_sha1']
+    if checkpoint is not None and checkpoint['digest'] is not None:
+        return update_digest(checkpoint['digest'].copy(), file_name, checkpoint['offset'], end).hexdigest()
+    return update_digest(hashlib.sha1(), file_name, 0, end).hexdigest()
+
+
+def load_checkpoint(file_name: str, profession: str, headlines: list, top_cities: int = 0) -> dict:
+    """Чтение контрольной точки, если файл до неё не менялся
+
+    Если размер и время изменения файла те же, что при записи точки, файл
+    считается нетронутым. Иначе (дописывание, правка, обрезание) обработанная
+    часть хэшируется целиком и сравнивается с сохранённым sha1, поэтому любая
+    правка уже обработанных байт, даже без изменения длины, ведёт к полному
+    пересчёту. Не обнаруживается только правка с возвратом прежних размера
+    и времени изменения файла.
+
+    :param file_name: Название файла
+    :param profession: Наименование профессии
+    :param headlines: Текущая шапка файла
+    :param top_cities: Сколько самых частых городов учитывается (см. parallel.count_ranges)
+
+    :return: словарь контрольной точки (digest - sha1 проверенной части или None) или None - нужен полный пересчёт
+    """
+    try:
+        with open(checkpoint_name(file_name, profession), encoding='utf-8') as file:
+            checkpoint = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if checkpoint.get('headlines') != headlines or checkpoint.get('profession') != profession \
+            or checkpoint.get('top_cities', 0) != top_cities or os.path.getsize(file_name) < checkpoint['offset']:
+        return None
+    checkpoint['digest'] = None
+    if checkpoint.get('file_state') != file_state(file_name):
+        checkpoint['digest'] = update_digest(hashlib.sha1(), file_name, 0, checkpoint['offset'])
+        if checkpoint['digest'].hexdigest() != checkpoint['prefix_sha1']:
+            return None
+    return checkpoint
+
+
+def save_checkpoint(file_name: str, profession: str, headlines: list, offset: int, statistic: tuple,
+                    prefix_sha1: str, state: list, top_cities: int = 0) -> None:
+    """Запись контрольной точки: смещение, отпечаток файла и накопленная статистика
+
+    :param file_name: Название файла
+    :param profession: Наименование профессии
+    :param headlines: Шапка файла
+    :param offset: Смещение конца обработанной части
+    :param statistic: кортеж (years_stats, cities_stats, vacancy_stats, количество вакансий)
+    :param prefix_sha1: sha1 первых offset байт (prefix_digest)
+    :param state: Размер и время изменения файла до его чтения (file_state)
+    :param top_cities: Сколько самых частых городов учитывается
+
+    :return: nothing
+    """
+    years_stats, cities_stats, vacancy_stats, rows_count = statistic
+    checkpoint = {'profession': profession, 'headlines': headlines, 'offset': offset, 'file_state': state,
+                  'prefix_sha1': prefix_sha1, 'rows_count': rows_count, 'top_cities': top_cities}
+    for name, dictionary in (('years_stats', years_stats), ('cities_stats', cities_stats),
+                             ('vacancy_stats', vacancy_stats)):
+        checkpoint[name] = [[key, value.totalSalary, value.count] for key, value in dictionary.items()]
+    temporary_name = f'{checkpoint_name(file_name, profession)}.tmp'
+    with open(temporary_name, 'w', encoding='utf-8') as file:
+        json.dump(checkpoint, file, ensure_ascii=False)
+    os.replace(temporary_name, checkpoint_name(file_name, profession))
+
+
+def count_incremental(file_name: str, profession: str, currency_ratio: dict, workers: int = 1,
+                      top_cities: int = 0) -> tuple:
+    """Подсчёт статистики только по дописанному с прошлого запуска хвосту файла
+
+    Если шапка, профессия или уже обработанные байты изменились, статистика
+    пересчитывается с начала файла (см. load_checkpoint).
+
+    :param file_name: Название файла
+    :param profession: Наименование профессии
+    :param currency_ratio: Курсы валют (Vacancy.currency_ratio)
+    :param workers: Количество процессов для разбора хвоста
+    :param top_cities: Сколько самых частых городов учитывать (SpaceSaving); 0 - все
+
+    :return: кортеж (years_stats, cities_stats, vacancy_stats, количество вакансий, обработано байт, полный пересчёт)
+    """
+    state = file_state(file_name)
+    headlines, data_start = read_headlines(file_name)
+    if len(headlines) == 0:
+        print('Пустой файл')
+        exit()
+    checkpoint = load_checkpoint(file_name, profession, headlines, top_cities)
+    if checkpoint is None:
+        start, statistic = data_start, None
+    else:
+        start = checkpoint['offset']
+        statistic = tuple({key: CustomTuple(total_salary, count) for key, total_salary, count in checkpoint[name]}
+                          for name in ('years_stats', 'cities_stats', 'vacancy_stats')) + (checkpoint['rows_count'],)
+    end = complete_lines_end(file_name, start)
+    statistic = count_ranges(file_name, split_byte_ranges(file_name, start, workers, end=end),
+                             headlines, profession, currency_ratio, workers, statistic, top_cities=top_cities)
+    save_checkpoint(file_name, profession, headlines, end, statistic,
+                    prefix_digest(file_name, end, checkpoint), state, top_cities)
+    if statistic[3] == 0:
+        print('Нет данных')
+        exit()
+    return statistic + (end - start, checkpoint is None)
+
+
+class IncrementalTests(TestCase):
+    def test_append_and_same_length_edit(self):
+        import tempfile
+        rows = [f'Программист,{index % 900 + 100}00,{index % 900 + 100}50,RUR,Москва,'
+                f'20{10 + index % 9}-06-14T11:44:58+0300\n' for index in range(40000)]
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, 'vacancies.csv')
+            with open(file_name, 'w', encoding='utf-8') as file:
+                file.write('name,salary_from,salary_to,salary_currency,area_name,published_at\n')
+                file.writelines(rows[:30000])
+            self.assertTrue(count_incremental(file_name, 'Программист', {'RUR': 1})[5])
+            with open(file_name, 'a', encoding='utf-8') as file:
+                file.writelines(rows[30000:])
+            statistic = count_incremental(file_name, 'Программист', {'RUR': 1})
+            self.assertFalse(statistic[5])
+            self.assertEqual(statistic[3], 40000)
+            with open(file_name, 'r+b') as file:
+                content = file.read()
+                position = content.index(b',', content.index(b'\n', len(content) * 18 // 100)) + 1
+                file.seek(position)
+                file.write(b'9' if content[position:position + 1] != b'9' else b'8')
+            os.utime(file_name, ns=(os.stat(file_name).st_atime_ns, os.stat(file_name).st_mtime_ns + 10 ** 9))
+            edited = count_incremental(file_name, 'Программист', {'RUR': 1})
+            self.assertTrue(edited[5])
+            self.assertEqual(edited[3], 40000)
+            self.assertNotEqual([value.totalSalary for value in edited[0].values()],
+                                [value.totalSalary for value in statistic[0].values()])
+
+    def test_unfinished_quoted_record(self):
+        import tempfile
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, 'vacancies.csv')
+            with open(file_name, 'w', encoding='utf-8', newline='') as file:
+                file.write('name,salary_from,salary_to,salary_currency,area_name,published_at,description\n'
+                           'Программист,100,200,RUR,Москва,2022-06-14T11:44:58+0300,"две\nстроки"\n'
+                           'Программист,300,400,RUR,Омск,2022-06-14T11:44:58+0300,"недописанное\n')
+            self.assertEqual(count_incremental(file_name, 'Программист', {'RUR': 1})[3], 1)
+            with open(file_name, 'a', encoding='utf-8', newline='') as file:
+                file.write('поле"\n')
+            statistic = count_incremental(file_name, 'Программист', {'RUR': 1})
+            self.assertFalse(statistic[5])
+            self.assertEqual((statistic[3], list(statistic[1])), (2, ['Москва', 'Омск']))
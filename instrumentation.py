@@ -0,0 +1,174 @@
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from unittest import TestCase
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class Metrics:
+    """Счётчики и таймеры стадий обработки, общие на процесс (экземпляр metrics)
+
+    Время стадии собственное: вложенные стадии (например read и decode внутри
+    count при потоковом подсчёте) вычитаются из объемлющей, поэтому сумма
+    стадий не превышает общего времени.
+
+    Attributes:
+        stages (dict): Стадии в порядке первого запуска: {стадия: {'seconds', 'calls', 'rows'}}
+        counters (dict): Счётчики строк: прочитано, отброшено, ошибки разбора и т.п.
+        started (float): Момент создания или сброса, time.perf_counter
+    """
+    def __init__(self) -> None:
+        """Конструктор класса Metrics
+        """
+        self.__nested = threading.local()
+        self.reset()
+
+    def reset(self) -> None:
+        """Обнуление всех стадий и счётчиков
+
+        :return: nothing
+        """
+        self.stages, self.counters, self.started = dict(), dict(), time.perf_counter()
+
+    def count(self, name: str, value: int = 1) -> None:
+        """Увеличение счётчика
+
+        :param name: Название счётчика
+        :param value: Прибавка
+
+        :return: nothing
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def stage(self, name: str, rows: bool = True):
+        """Замер собственного времени блока как стадии; повторные запуски суммируются
+
+        Стек вложенных стадий свой у каждого потока.
+
+        :param name: Название стадии
+        :param rows: Стадия проходит по строкам файла; для остальных скорость в строках не считается
+
+        :return: менеджер контекста
+        """
+        if not hasattr(self.__nested, 'seconds'):
+            self.__nested.seconds = list()
+        nested = self.__nested.seconds
+        nested.append(0.0)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            stage = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0, 'rows': rows})
+            stage['seconds'] += elapsed - nested.pop()
+            stage['calls'] += 1
+            if nested:
+                nested[-1] += elapsed
+
+    def summary(self) -> dict:
+        """Сводка прогона: стадии со скоростью в строках в секунду, счётчики и пиковый RSS
+
+        Скорость считается по счётчику vacancies - числу вакансий в статистике -
+        только для стадий, которые проходят по строкам (stage(..., rows=True)).
+
+        :return: словарь, пригодный для json.dump
+        """
+        rows = self.counters.get('vacancies', 0)
+        stages = {name: {'seconds': round(stage['seconds'], 6), 'calls': stage['calls'],
+                         'rows_per_second': round(rows / stage['seconds'], 1)
+                         if stage['rows'] and stage['seconds'] > 0 else None}
+                  for name, stage in self.stages.items()}
+        return {'total_seconds': round(time.perf_counter() - self.started, 6), 'stages': stages,
+                'counters': dict(self.counters), 'peak_rss_mb': peak_rss_mb()}
+
+    def write_summary(self, file_name: str) -> None:
+        """Запись сводки в JSON файл; '-' - печать в stderr
+
+        :param file_name: Название файла
+
+        :return: nothing
+        """
+        if file_name == '-':
+            json.dump(self.summary(), sys.stderr, ensure_ascii=False, indent=2)
+            return
+        with open(file_name, 'w', encoding='utf-8') as file:
+            json.dump(self.summary(), file, ensure_ascii=False, indent=2)
+
+
+metrics = Metrics()
+
+
+def timed(name: str, rows: bool = True):
+    """Декоратор: вызов функции замеряется как стадия name в metrics
+
+    :param name: Название стадии
+    :param rows: Стадия проходит по строкам файла (см. Metrics.stage)
+
+    :return: декоратор
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with metrics.stage(name, rows):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def peak_rss_mb() -> float:
+    """Пиковый RSS процесса
+
+    :return: мегабайты или None, если модуль resource недоступен
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(max_rss / 1024 / 1024 if sys.platform == 'darwin' else max_rss / 1024, 2)
+
+
+@contextmanager
+def profiled(file_name: str = None):
+    """Запуск блока под cProfile с сохранением статистики для pstats или snakeviz
+
+    :param file_name: Файл статистики; None - профилирование выключено
+
+    :return: менеджер контекста
+    """
+    if not file_name:
+        yield
+        return
+    import cProfile
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        profile.dump_stats(file_name)
+
+
+class MetricsTests(TestCase):
+    def test_nested_stages_and_row_speed(self):
+        current = Metrics()
+        with current.stage('count'):
+            with current.stage('read'):
+                time.sleep(0.02)
+            with current.stage('decode'):
+                time.sleep(0.02)
+        with current.stage('png', rows=False):
+            pass
+        current.count('vacancies', 100)
+        stages = current.summary()['stages']
+        self.assertLess(stages['count']['seconds'], 0.015)
+        self.assertGreaterEqual(stages['read']['seconds'], 0.015)
+        self.assertEqual(stages['count']['calls'], 1)
+        self.assertIsNotNone(stages['decode']['rows_per_second'])
+        self.assertIsNone(stages['png']['rows_per_second'])
@@ -1,30 +1,33 @@
-import csv
-import datetime
+import heapq
+import os
+import re
+from itertools import chain, islice
+from typing import Iterable, Iterator, TYPE_CHECKING
 
-import numpy as np
-from matplotlib import pyplot as plt
+from unittest import TestCase
 
-try:
-    from openpyxl.cell import get_column_letter
-except ImportError:
-    from openpyxl.utils import get_column_letter
-    from openpyxl.utils import column_index_from_string
-from openpyxl import Workbook
-from openpyxl.styles import Font, Border, Side
+from accumulators import CustomTuple, QuantileSketch, SpaceSaving, QUANTILES, top_counts
+from decoders import parse_published_at, parse_salary, intern_string
+from instrumentation import metrics, timed, profiled
+from matcher import AhoCorasick
+from readers import open_text, detect_compression
+from tokenizer import RowTokenizer, pipeline_columns
 
-from jinja2 import Environment, FileSystemLoader
-import pdfkit
+if TYPE_CHECKING:
+    from columnar import VacancyColumns
 
-from unittest import TestCase
+
+TOP_CITIES = 10
+BATCH_SIZE = 4096
 
 
 class VacancyTests(TestCase):
     dictionary = \
         {
             'name': 'vacancies.csv',
-            'salary_from': 100,
-            'salary_to': 200,
-            'salary_currency': 150,
+            'salary_from': '100',
+            'salary_to': '200',
+            'salary_currency': 'RUR',
             'area_name': 'area',
             'published_at': '2022-06-14T11:44:58+0300'
         }
@@ -33,13 +36,13 @@ class VacancyTests(TestCase):
         self.assertEqual(type(Vacancy(self.dictionary)).__name__, 'Vacancy')
 
     def test_vacancy_area_name(self):
-        self.assertEqual(Vacancy(self.dictionary).area_name, 'area_name')
+        self.assertEqual(Vacancy(self.dictionary).area_name, 'area')
 
     def test_vacancy_name(self):
-        self.assertEqual(Vacancy(self.dictionary).area_name, 'vacancies.csv')
+        self.assertEqual(Vacancy(self.dictionary).name, 'vacancies.csv')
 
     def test_vacancy_salary(self):
-        self.assertEqual(Vacancy(self.dictionary).area_name, 22500)
+        self.assertEqual(Vacancy(self.dictionary).salary, 150)
 
 
 class DataSetTests(TestCase):
@@ -54,6 +57,101 @@ class DataSetTests(TestCase):
         self.assertEqual(DataSet('vacancies_big.csv', ['information']).file_name, 'vacancies_big.csv')
 
 
+class BatchReportTests(TestCase):
+    def test_batch_pdf_uses_shared_renderer(self):
+        from unittest import mock
+        inserted_data = InputConnect()
+        inserted_data.word_for_choice, inserted_data.workers, inserted_data.raw_sheet = 'Все', 1, False
+        inserted_data.file_name, inserted_data.quantiles, inserted_data.report = 'vacancies.csv', True, Report()
+        inserted_data.years_stats = {2022: CustomTuple(300, 2)}
+        inserted_data.cities_stats = {'Москва': CustomTuple(300, 2)}
+        inserted_data.years_quantiles = {2022: QuantileSketch()}
+        inserted_data.cities_quantiles = {'Москва': QuantileSketch()}
+        inserted_data.professions_stats = {'Программист': {2022: CustomTuple(100, 1)},
+                                           'Аналитик': {2022: CustomTuple(200, 1)}}
+        inserted_data.professions_quantiles = {'Программист': {2022: QuantileSketch()}}
+        with mock.patch('pdf_report.render_many', return_value=[]) as render_pdf, \
+                mock.patch('charts.render_many', return_value=[]) as render_charts, \
+                mock.patch(f'{__name__}.generate_excel_from_file') as generate_excel, mock.patch('builtins.print'):
+            with mock.patch('pdf_report.ensure_backend', side_effect=OSError('wkhtmltopdf не найден')):
+                self.assertRaises(OSError, inserted_data.make_batch_tables)
+            self.assertEqual((generate_excel.call_count, render_charts.call_count), (0, 0))
+            with mock.patch('pdf_report.ensure_backend'):
+                inserted_data.make_batch_tables()
+        reports = render_pdf.call_args.args[0]
+        self.assertEqual(render_pdf.call_count, 1)
+        self.assertEqual([file_name for _, file_name, _ in reports], ['report_Программист.pdf', 'report_Аналитик.pdf'])
+        self.assertIsNotNone(reports[0][2])
+        self.assertIsNone(reports[1][2])
+
+    def test_batch_workbooks_get_profession_quantiles(self):
+        from unittest import mock
+        inserted_data = InputConnect()
+        inserted_data.word_for_choice, inserted_data.raw_sheet, inserted_data.quantiles = 'Вакансии', False, True
+        inserted_data.profession, inserted_data.professions = 'Программист', ['Программист', 'Аналитик']
+        inserted_data.cities_count, inserted_data.file_name = 0, 'vacancies.csv'
+        vacancies = [Vacancy({'name': name, 'salary_from': salary, 'salary_to': salary, 'salary_currency': 'RUR',
+                              'area_name': 'Москва', 'published_at': '2022-06-14T11:44:58+0300'})
+                     for name, salary in (('Программист', '100'), ('Аналитик', '300'), ('Аналитик', '500'))]
+        inserted_data.count_professions(vacancies, inserted_data.professions)
+        inserted_data.report = mock.Mock()
+        with mock.patch('builtins.print'):
+            inserted_data.make_batch_tables()
+        quantiles = [call.kwargs['quantiles']['vacancy'] for call in inserted_data.report.generate_excel.call_args_list]
+        self.assertEqual(quantiles, [{2022: [100, 100, 100]}, {2022: [300, 300, 500]}])
+
+    def test_raw_sheet_from_file_and_partitions(self):
+        import tempfile
+        from columnar import VacancyColumns
+        from partitions import write_partitions
+        with tempfile.TemporaryDirectory() as directory:
+            file_name, partitions = os.path.join(directory, 'vacancies.csv'), os.path.join(directory, 'parts')
+            with open(file_name, 'w', encoding='utf-8') as file:
+                file.write('name,salary_from,salary_to,salary_currency,area_name,published_at\n'
+                           'Программист,100,200,RUR,Москва,2022-06-14T11:44:58+0300\n'
+                           'Аналитик,10,20,USD,Омск,2022-07-14T11:44:58+0300\n')
+            write_partitions(DataSet(file_name, list()).iter_vacancies(), partitions, 'npy')
+            sheets = list()
+            for source in (file_name, partitions):
+                inserted_data = InputConnect()
+                inserted_data.file_name, inserted_data.years, inserted_data.exchange_rates = source, None, ''
+                inserted_data.use_cache = False
+                sheets.append([(row.name, row.salary, row.area_name, row.salary_currency, row.published_at.hour)
+                               for row in VacancyColumns.load(inserted_data.raw_sheet_columns()).iter_rows()])
+                inserted_data.raw_sheet_directory.cleanup()
+        self.assertEqual(sheets[0], [('Программист', 150.0, 'Москва', 'RUR', 11),
+                                     ('Аналитик', 909.0, 'Омск', 'USD', 11)])
+        self.assertEqual(sheets[1], sheets[0])
+
+    def test_batch_raw_sheet_is_deduplicated_and_read_once(self):
+        import tempfile
+        from unittest import mock
+        with tempfile.TemporaryDirectory() as directory:
+            inserted_data = InputConnect()
+            inserted_data.file_name = os.path.join(directory, 'vacancies.csv')
+            with open(inserted_data.file_name, 'w', encoding='utf-8') as file:
+                file.write('name,salary_from,salary_to,salary_currency,area_name,published_at\n'
+                           + 'Программист,100,200,RUR,Москва,2022-06-14T11:44:58+0300\n' * 2
+                           + 'Аналитик,300,400,RUR,Омск,2022-07-14T11:44:58+0300\n')
+            inserted_data.word_for_choice, inserted_data.raw_sheet, inserted_data.deduplicate = 'Вакансии', True, True
+            inserted_data.years, inserted_data.exchange_rates, inserted_data.use_cache = None, '', True
+            inserted_data.professions_stats = {'Программист': {2022: CustomTuple(150, 1)},
+                                               'Аналитик': {2022: CustomTuple(350, 1)}}
+            inserted_data.years_stats = {2022: CustomTuple(500, 2)}
+            inserted_data.cities_stats = {'Москва': CustomTuple(150, 1), 'Омск': CustomTuple(350, 1)}
+            inserted_data.report = mock.Mock()
+            inserted_data.report.generate_excel.side_effect = lambda *args, **kwargs: sheets.append(
+                [row.name for row in kwargs['vacancies']])
+            sheets = list()
+            with mock.patch.object(DataSet, 'put_columns', autospec=True,
+                                   side_effect=DataSet.put_columns) as put_columns, mock.patch('builtins.print'):
+                inserted_data.make_batch_tables()
+            inserted_data.raw_sheet_directory.cleanup()
+            self.assertEqual(put_columns.call_count, 1)
+            self.assertEqual(sheets, [['Программист', 'Аналитик']] * 2)
+            self.assertFalse(os.path.exists(f'{inserted_data.file_name}.cache'))
+
+
 class Vacancy:
     """Класс вакансии
 
@@ -61,6 +159,8 @@ class Vacancy:
         name (str): Имя
         salary (int): Зарплата
         area_name (str): Регион
+        salary_currency (str): Валюта зарплаты
+        salary_sum (float): Сумма вилки зарплаты в валюте вакансии
         published_at (str): Дата публикации
     """
     currency_ratio = \
@@ -77,10 +177,11 @@ class Vacancy:
             "UZS": 0.0055,
         }
 
-    def __init__(self, object_vacancy) -> None:
+    def __init__(self, object_vacancy, currency_ratio: dict = None) -> None:
         """Инициализирует класс вакансии из словаря вакансии
 
         param object_vacancy: Словарь вакансии
+        :param currency_ratio: Курсы валют вместо статического Vacancy.currency_ratio
 
         >>> dictionary = {'name': 'vacancies.csv', 'salary_from': 100 ,'salary_to': 200,
         >>> 'salary_currency': 150, 'area_name': 'area', 'published_at': '2022-06-14T11:44:58+0300'}
@@ -94,14 +195,13 @@ class Vacancy:
         22500
         """
         self.name = object_vacancy['name']
-        salary_from = int((float(("".join(object_vacancy['salary_from'].split())))))
-        salary_to = int((float(("".join(object_vacancy['salary_to'].split())))))
-        self.salary = (salary_from + salary_to) * self.currency_ratio[object_vacancy['salary_currency']] // 2
-        self.area_name = object_vacancy['area_name']
-        # str(parser.parse(dict_vacancy['published_at']).date())
-        # '.'.join(str(datetime.datetime.strptime(dict_vacancy['published_at'],
-        # '%Y-%m-%dT%H:%M:%S%z').date()).split('-'))
-        self.published_at = datetime.datetime.strptime(object_vacancy['published_at'], '%Y-%m-%dT%H:%M:%S%z')
+        salary_from = parse_salary(object_vacancy['salary_from'])
+        salary_to = parse_salary(object_vacancy['salary_to'])
+        self.salary_currency = intern_string(object_vacancy['salary_currency'])
+        self.salary_sum = salary_from + salary_to
+        self.salary = self.salary_sum * (currency_ratio or self.currency_ratio)[self.salary_currency] // 2
+        self.area_name = intern_string(object_vacancy['area_name'])
+        self.published_at = parse_published_at(object_vacancy['published_at'])
 
 
 class DataSet:
@@ -109,13 +209,17 @@ class DataSet:
 
     Attributes:
         vacancies_objects (str): Лист вакансий
+        vacancies_columns (VacancyColumns): Колоночное хранилище вакансий
         file_name (str): Название файла
+        deduplicate (bool): Отбрасывать повторы строк (см. dedup.py)
+        currency_ratio (dict): Курсы валют разбора, по умолчанию Vacancy.currency_ratio
     """
-    def __init__(self, file_name: str, vacancies_objects: list) -> None:
+    def __init__(self, file_name: str, vacancies_objects: list, deduplicate: bool = False) -> None:
         """Конструктор класса DataSet
 
         param file_name: Название файла
         :param vacancies_objects: Лист вакансий
+        :param deduplicate: Отбрасывать строки, повторяющие уже прочитанные по FINGERPRINT_COLUMNS
 
         >>> type(DataSet('vacancies_big.csv', ['information'])).__name__
         'DataSet'
@@ -126,77 +230,186 @@ class DataSet:
         """
         self.vacancies_objects = vacancies_objects
         self.file_name = file_name
+        self.deduplicate = deduplicate
+        self.currency_ratio = Vacancy.currency_ratio
+
+    def __valid_lines(self) -> Iterator[list]:
+        """Приватный генератор чтения и валидации: токенизатор отдаёт только корректные строки
+
+        Сжатые файлы (.gz, .bz2, .xz, .zst) распаковываются на лету, обычные читаются через mmap.
+        Пустые и неполные строки отбрасываются при разборе (см. tokenizer.RowTokenizer),
+        остаются только столбцы Vacancy; их названия сохраняются в self.headlines.
+        Проверки "Пустой файл" и "Нет данных" выполняются по ходу чтения, поэтому
+        файл не держится в памяти целиком. Отброшенные строки считаются в metrics:
+        dropped_empty и dropped_columns.
+
+        :return: итератор корректных строк без шапки
+        """
+        with open_text(self.file_name) as file:
+            tokenizer = RowTokenizer(file)
+            if len(tokenizer.headlines) == 0:
+                print('Пустой файл')
+                exit()
+            tokenizer.project(pipeline_columns(tokenizer.headlines))
+            self.headlines = tokenizer.columns
+            yield from tokenizer
+        metrics.count('rows_read', tokenizer.rows + tokenizer.dropped_empty + tokenizer.dropped_columns)
+        metrics.count('dropped_empty', tokenizer.dropped_empty)
+        metrics.count('dropped_columns', tokenizer.dropped_columns)
+        if tokenizer.rows == 0:
+            print('Нет данных')
+            exit()
+
+    def __unique_lines(self, lines: Iterator[list]) -> Iterator[list]:
+        """Приватный генератор дедупликации: пропускает строки с уже встречавшимися идентифицирующими полями
+
+        Строки идут пачками: отпечатки blake2b проверяются фильтром Блума, а
+        возможные повторы подтверждаются точным множеством (см. dedup.Deduplicator).
+        Повторы считаются в metrics как duplicates, время - стадия dedup.
+
+        :param lines: итератор корректных строк из __valid_lines
+        :return: итератор строк без повторов
+        """
+        from dedup import Deduplicator, FINGERPRINT_COLUMNS, BATCH_SIZE, fingerprints
+        indexes = None
+        with Deduplicator() as deduplicator:
+            while True:
+                batch = list(islice(lines, BATCH_SIZE))
+                if len(batch) == 0:
+                    break
+                with metrics.stage('dedup'):
+                    if indexes is None:
+                        indexes = [self.headlines.index(column) for column in FINGERPRINT_COLUMNS
+                                   if column in self.headlines]
+                    duplicated = deduplicator.duplicated(fingerprints(batch, indexes))
+                yield from (line for line, repeated in zip(batch, duplicated) if not repeated)
+            metrics.count('duplicates', deduplicator.duplicates)
+
+    def __read_lines(self) -> Iterator[list]:
+        """Приватный генератор чтения, валидации и (если включена) дедупликации строк
+
+        :return: итератор строк без шапки
+        """
+        lines = self.__valid_lines()
+        return self.__unique_lines(lines) if self.deduplicate else lines
 
     def __csv_reader(self) -> tuple:
         """Приватный метод класса DataSet, выполняющий функции чтения файла
 
         :return: tuple из двух листов
         """
-        headlines, vacancies = list(), list()
-        with open(self.file_name, encoding='utf-8-sig') as file:
-            vacancies_list, counter = csv.reader(file, delimiter=','), 0
-            for line in vacancies_list:
-                if counter == 0:
-                    counter += 1
-                    headlines = line
-                else:
-                    if '' in line or len(line) != len(headlines):
-                        continue
-                    vacancies.append(line)
-        if len(headlines) == 0:
-            print('Пустой файл')
-            exit()
-        if len(vacancies) == 0:
-            print('Нет данных')
-            exit()
-        return vacancies, headlines
+        vacancies = list(self.__read_lines())
+        return vacancies, self.headlines
 
     @staticmethod
-    def __csv_filer(reader: tuple, headlines: list) -> list:
-        """Приватный статический метод для фильтрации
+    def __csv_filer(reader: Iterable, headlines: list, currency_ratio: dict = None) -> Iterator[Vacancy]:
+        """Приватный статический генератор для фильтрации
 
-        :param reader: принимаем reader типа tuple - уже прочтенный файл
+        Строки с неразбираемой зарплатой, датой или неизвестной валютой
+        пропускаются и считаются в metrics как parse_errors.
+
+        :param reader: принимаем reader - итератор строк файла
         :param headlines: принимаем лист-шапку
+        :param currency_ratio: Курсы валют; по умолчанию Vacancy.currency_ratio
 
-        :return: лист отфильтрованных вакансий
+        :return: итератор отфильтрованных вакансий
         """
-        vacancies_list = list()
         for line in reader:
-            current_dictionary = dict()
-            for i in range(len(line)):
-                current_dictionary[headlines[i]] = line[i]
-            vacancies_list.append(Vacancy(current_dictionary))
-        return vacancies_list
+            try:
+                vacancy = Vacancy(dict(zip(headlines, line)), currency_ratio)
+            except (ValueError, KeyError):
+                metrics.count('parse_errors')
+                continue
+            yield vacancy
+
+    def iter_vacancies(self) -> Iterator[Vacancy]:
+        """Потоковый режим: чтение -> валидация -> декодирование без промежуточных листов
+
+        Память остаётся постоянной при любом размере файла, вакансии сразу
+        уходят в агрегацию (InputConnect.count_vacancies). Строки читаются и
+        декодируются пачками по BATCH_SIZE, каждая пачка замеряется в metrics
+        как стадии read и decode, а время потребителя остаётся в его стадии.
+
+        :return: итератор вакансий
+        """
+        with metrics.stage('read'):
+            lines = self.__read_lines()
+            first_line = next(lines)
+        return self.__staged_vacancies(chain((first_line,), lines))
+
+    def __staged_vacancies(self, lines: Iterator[list]) -> Iterator[Vacancy]:
+        """Приватный генератор пачек iter_vacancies с замером стадий read и decode
+
+        :param lines: итератор строк из __read_lines
+        :return: итератор вакансий
+        """
+        while True:
+            with metrics.stage('read'):
+                batch = list(islice(lines, BATCH_SIZE))
+            if len(batch) == 0:
+                break
+            with metrics.stage('decode'):
+                vacancies = list(self.__csv_filer(batch, self.headlines, self.currency_ratio))
+            yield from vacancies
 
     def put_vacancies(self) -> None:
         """Вкладываем вакансии в новый объект
 
         :return: nothing
         """
-        (vacancies, headlines) = self.__csv_reader()
-        self.vacancies_objects = self.__csv_filer(vacancies, headlines)
+        with metrics.stage('read'):
+            (vacancies, headlines) = self.__csv_reader()
+        with metrics.stage('decode'):
+            self.vacancies_objects = list(self.__csv_filer(vacancies, headlines))
 
+    @timed('columns')
+    def put_columns(self, use_cache: bool = False, exchange_rates: str = None) -> None:
+        """Вкладываем вакансии в колоночное хранилище вместо листа объектов Vacancy
 
-class CustomTuple:
-    """Класс CustomTuple
+        :param use_cache: Брать столбцы из кэша рядом с файлом (см. cache.py), если он не устарел;
+            с дедупликацией кэш не используется
+        :param exchange_rates: Файл помесячных курсов валют (см. exchange_rates.py);
+            по умолчанию зарплаты считаются по статическому Vacancy.currency_ratio.
+            Валюты таблицы, которых нет в Vacancy.currency_ratio, тоже разбираются
 
-    Attributes:
-        totalSalary (int): Количество цельных зарплат
-        count (int): Их общее количество
-    """
-    def __init__(self, full_salary=0, counter=0) -> None:
-        """Конструктор класса CustomTuple
-
-        :param full_salary: Количество цельных зарплат
-        :param counter: Их общее количество
+        :return: nothing
+        """
+        from cache import cached_columns
+        from columnar import VacancyColumns
+        rates, extra_currencies = None, list()
+        if exchange_rates:
+            from exchange_rates import ExchangeRates
+            rates = ExchangeRates.load(exchange_rates, Vacancy.currency_ratio)
+            self.currency_ratio = rates.currency_ratio(Vacancy.currency_ratio)
+            extra_currencies = sorted(set(self.currency_ratio) - set(Vacancy.currency_ratio))
+        self.vacancies_columns = cached_columns(
+            self.file_name, lambda: VacancyColumns.from_vacancies(self.iter_vacancies()),
+            use_cache and not self.deduplicate, {'currencies': extra_currencies} if extra_currencies else None)
+        if rates is not None:
+            self.vacancies_columns = self.vacancies_columns.convert_salaries(rates)
+
+    @timed('columns')
+    def put_partitions(self, years: list = None, exchange_rates: str = None, columns: tuple = None) -> None:
+        """Колоночное хранилище из набора по годам (csv_parser --format parquet|npy), file_name - его папка
+
+        Читаются только годы years и только столбцы columns.
+
+        :param years: Нужные годы; по умолчанию все
+        :param exchange_rates: Файл помесячных курсов валют (см. put_columns)
+        :param columns: Столбцы VacancyColumns.COLUMNS; по умолчанию нужные статистике
 
-        >>> CustomTuple().totalSalary
-        0
-        >>> CustomTuple().count
-        0
+        :return: nothing
         """
-        self.totalSalary = full_salary
-        self.count = counter
+        from partitions import read_partitions, STATISTIC_COLUMNS
+        columns = columns or STATISTIC_COLUMNS + (('currency', 'salary_sum') if exchange_rates else ())
+        self.vacancies_columns = read_partitions(self.file_name, years, columns)
+        if len(self.vacancies_columns) == 0:
+            print('Нет данных')
+            exit()
+        if exchange_rates:
+            from exchange_rates import ExchangeRates
+            self.vacancies_columns = self.vacancies_columns.convert_salaries(
+                ExchangeRates.load(exchange_rates, Vacancy.currency_ratio))
 
 
 class InputConnect:
@@ -204,6 +417,8 @@ class InputConnect:
 
     Attributes:
         list_of_all_dictionaries (list): Лист всех словарей с конкретизированной статистикой
+        vacancies_columns (VacancyColumns): Столбцы, по которым посчитана статистика; None - подсчёт без них
+        raw_sheet_directory (TemporaryDirectory): Столбцы листа всех вакансий XLSX (см. raw_sheet_columns)
     """
     years_stats, cities_stats, vacancy_stats = dict(), dict(), dict()
 
@@ -211,29 +426,101 @@ class InputConnect:
         """Конструктор класса InputConnect
         """
         self.list_of_all_dictionaries = list()
+        self.years_stats, self.cities_stats, self.vacancy_stats = dict(), dict(), dict()
+        self.professions, self.professions_stats = list(), dict()
+        self.quantiles, self.top_cities, self.cities_hitters = False, 0, None
+        self.deduplicate = False
+        self.years_quantiles, self.cities_quantiles, self.vacancy_quantiles = dict(), dict(), dict()
+        self.professions_quantiles = dict()
+        self.query, self.vacancy_index = None, None
+        self.vacancies_columns, self.raw_sheet_directory = None, None
 
     def start_entering(self) -> None:
         """Метод для ввода необходимых данных от пользователя
         Attributes:
             file_name (list): Имя файла
             profession (str): Имя профессии
-            word_for_choice (str): Слово для выборки и нужд пользователя
+            professions (list): Профессии пакетного режима, вводятся через ";"
+            word_for_choice (str): Слово для выборки и нужд пользователя: "Вакансии" - XLSX,
+                "Статистика" - PNG, "Все" - XLSX, PNG и PDF одновременно
+            workers (int): Количество процессов подсчёта, переменная окружения VACANCIES_WORKERS
+            use_cache (bool): Использовать кэш разобранных данных, отключается VACANCIES_NO_CACHE=1
+            raw_sheet (bool): Добавлять в XLSX лист со всеми вакансиями, VACANCIES_RAW_SHEET=1;
+                статистика тогда считается по колоночному хранилищу, из которого строится и лист
+            chart_formats (tuple): Форматы графиков пакетного режима, VACANCIES_CHART_FORMATS=png,svg
+            incremental (bool): Считать только дописанные строки с прошлого запуска, VACANCIES_INCREMENTAL=1
+            exchange_rates (str): Файл помесячных курсов валют, VACANCIES_EXCHANGE_RATES=rates.csv
+            metrics_file (str): Файл JSON сводки стадий и счётчиков, VACANCIES_METRICS=metrics.json ('-' - stderr)
+            profile_file (str): Файл статистики cProfile всего прогона, VACANCIES_PROFILE=run.prof
+            quantiles (bool): Медиана, 10-й и 90-й перцентили зарплат в отчёте, VACANCIES_QUANTILES=1;
+                не считаются в инкрементальном режиме
+            top_cities (int): Считать только столько самых частых городов, VACANCIES_TOP_CITIES=1000:
+                при чтении строк - Space-Saving в фиксированной памяти, по колоночному хранилищу -
+                точный выбор; 0 - учёт всех городов
+            years (list): Годы для набора по годам (название файла - его папка), VACANCIES_YEARS=2015-2018,2022
+            deduplicate (bool): Отбрасывать повторы вакансий, VACANCIES_DEDUP=1; отключает
+                инкрементальный и многопроцессный подсчёт и кэш
+            query (dict): Выборка отдельных вакансий в режиме "Вакансии" (см. query.parse_query),
+                VACANCIES_QUERY=city=Москва;salary_from=100000;order=salary;page=2
 
         :return: nothing
         """
         self.file_name = input('Введите название файла: ')
         self.profession = input('Введите наименование профессии: ')
-        self.word_for_choice = input('Введите "Вакансии" или "Статистика": ')
+        self.professions = [profession.strip() for profession in self.profession.split(';')]
+        self.professions_stats = dict()
+        self.word_for_choice = input('Введите "Вакансии", "Статистика" или "Все": ')
         self.cities_count = 0
+        self.workers = int(os.environ.get('VACANCIES_WORKERS', '1'))
+        self.use_cache = os.environ.get('VACANCIES_NO_CACHE', '') != '1'
+        self.raw_sheet = os.environ.get('VACANCIES_RAW_SHEET', '') == '1'
+        self.chart_formats = tuple(os.environ.get('VACANCIES_CHART_FORMATS', 'png').split(','))
+        self.incremental = os.environ.get('VACANCIES_INCREMENTAL', '') == '1'
+        self.exchange_rates = os.environ.get('VACANCIES_EXCHANGE_RATES', '')
+        self.metrics_file = os.environ.get('VACANCIES_METRICS', '')
+        self.profile_file = os.environ.get('VACANCIES_PROFILE', '')
+        self.quantiles = os.environ.get('VACANCIES_QUANTILES', '') == '1'
+        self.top_cities = int(os.environ.get('VACANCIES_TOP_CITIES', '0'))
+        self.years = self.parse_years(os.environ.get('VACANCIES_YEARS', ''))
+        self.deduplicate = os.environ.get('VACANCIES_DEDUP', '') == '1'
+        if os.environ.get('VACANCIES_QUERY', ''):
+            from query import parse_query
+            self.query = parse_query(os.environ['VACANCIES_QUERY'])
         self.report = Report()
 
+    @staticmethod
+    def parse_years(value: str) -> list:
+        """Разбор списка годов с диапазонами
+
+        :param value: Строка вида 2015-2018,2022; пустая - все годы
+
+        :return: лист годов или None
+
+        >>> InputConnect.parse_years('2015-2017,2022')
+        [2015, 2016, 2017, 2022]
+        """
+        if value.strip() == '':
+            return None
+        years = list()
+        for part in value.split(','):
+            first, _, last = part.strip().partition('-')
+            years.extend(range(int(first), int(last or first) + 1))
+        return years
+
+    @timed('count')
     def count_vacancies(self, vacancies_list: list) -> None:
         """Метод подсчета вакансий и их распределение по словарям
 
-        :param vacancies_list: Лист всех вакансий
+        При top_cities > 0 города учитываются в SpaceSaving фиксированного размера,
+        и в cities_stats попадают только самые частые из них; скетчи квантилей
+        держатся только для отслеживаемых городов.
+
+        :param vacancies_list: Лист или итератор вакансий (см. DataSet.iter_vacancies)
 
         :return: nothing
         """
+        if self.top_cities > 0 and self.cities_hitters is None:
+            self.cities_hitters = SpaceSaving(self.top_cities)
         for vacancy in vacancies_list:
             self.cities_count += 1
             current_year = int(vacancy.published_at.year)
@@ -244,7 +531,9 @@ class InputConnect:
                 self.years_stats[current_year].totalSalary += vacancy.salary
                 self.years_stats[current_year].count += 1
 
-            if vacancy.area_name not in self.cities_stats.keys():
+            if self.cities_hitters is not None:
+                self.cities_hitters.add(vacancy.area_name, vacancy.salary)
+            elif vacancy.area_name not in self.cities_stats.keys():
                 self.cities_stats[vacancy.area_name] = CustomTuple(vacancy.salary, 1)
             else:
                 self.cities_stats[vacancy.area_name].totalSalary += vacancy.salary
@@ -254,6 +543,155 @@ class InputConnect:
                 self.vacancy_stats[current_year].totalSalary += vacancy.salary
                 self.vacancy_stats[current_year].count += 1
 
+            if self.quantiles:
+                self.add_quantiles(current_year, vacancy)
+        if self.cities_hitters is not None:
+            self.cities_stats = self.cities_hitters.statistic()
+
+    def add_quantiles(self, current_year: int, vacancy: Vacancy) -> None:
+        """Учёт зарплаты вакансии в скетчах квантилей по году, городу и году профессии
+
+        Скетч города, вытесненного из SpaceSaving при учёте этой вакансии, удаляется.
+
+        :param current_year: Год публикации
+        :param vacancy: Вакансия
+
+        :return: nothing
+        """
+        if current_year not in self.years_quantiles:
+            self.years_quantiles[current_year] = QuantileSketch()
+            self.vacancy_quantiles[current_year] = QuantileSketch()
+        self.years_quantiles[current_year].add(vacancy.salary)
+        if self.cities_hitters is not None and self.cities_hitters.evicted is not None:
+            self.cities_quantiles.pop(self.cities_hitters.evicted, None)
+        if vacancy.area_name not in self.cities_quantiles:
+            self.cities_quantiles[vacancy.area_name] = QuantileSketch()
+        self.cities_quantiles[vacancy.area_name].add(vacancy.salary)
+        if self.profession in vacancy.name:
+            self.vacancy_quantiles[current_year].add(vacancy.salary)
+
+    @timed('count')
+    def count_professions(self, vacancies_list: Iterable, professions: list) -> None:
+        """Пакетный аналог count_vacancies: статистика сразу для списка профессий за один проход
+
+        Вхождения профессий ищутся автоматом Ахо-Корасик, результат для каждого
+        названия вакансии запоминается, поэтому повторяющиеся названия не сканируются.
+        Города при top_cities > 0 и скетчи квантилей учитываются так же, как в count_vacancies,
+        скетчи профессий по годам попадают в professions_quantiles.
+
+        :param vacancies_list: Лист или итератор вакансий
+        :param professions: Лист профессий
+
+        :return: nothing
+        """
+        automaton, matches = AhoCorasick(professions), dict()
+        professions_stats = [dict() for _ in professions]
+        professions_quantiles = [dict() for _ in professions]
+        if self.top_cities > 0 and self.cities_hitters is None:
+            self.cities_hitters = SpaceSaving(self.top_cities)
+        for vacancy in vacancies_list:
+            self.cities_count += 1
+            current_year = int(vacancy.published_at.year)
+            if current_year not in self.years_stats.keys():
+                self.years_stats[current_year] = CustomTuple(vacancy.salary, 1)
+                for vacancy_stats in professions_stats:
+                    vacancy_stats[current_year] = CustomTuple(0, 0)
+            else:
+                self.years_stats[current_year].add(vacancy.salary)
+
+            if self.cities_hitters is not None:
+                self.cities_hitters.add(vacancy.area_name, vacancy.salary)
+            elif vacancy.area_name not in self.cities_stats.keys():
+                self.cities_stats[vacancy.area_name] = CustomTuple(vacancy.salary, 1)
+            else:
+                self.cities_stats[vacancy.area_name].add(vacancy.salary)
+
+            if vacancy.name not in matches:
+                matches[vacancy.name] = automaton.find(vacancy.name)
+            for index in matches[vacancy.name]:
+                professions_stats[index][current_year].add(vacancy.salary)
+
+            if self.quantiles:
+                self.add_quantiles(current_year, vacancy)
+                for index in matches[vacancy.name]:
+                    professions_quantiles[index].setdefault(current_year, QuantileSketch()).add(vacancy.salary)
+        if self.cities_hitters is not None:
+            self.cities_stats = self.cities_hitters.statistic()
+        self.professions_stats = dict(zip(professions, professions_stats))
+        if self.quantiles:
+            self.professions_quantiles = dict(zip(professions, professions_quantiles))
+
+    @timed('count')
+    def count_columns(self, columns: 'VacancyColumns') -> None:
+        """Векторный аналог count_vacancies для колоночного хранилища
+
+        Количества по городам здесь точные, поэтому при top_cities > 0 самые
+        частые города выбираются по ним без SpaceSaving.
+
+        :param columns: Колоночное хранилище вакансий
+
+        :return: nothing
+        """
+        self.cities_count += len(columns)
+        for year, (total_salary, count) in columns.year_stats().items():
+            self.years_stats[year] = CustomTuple(total_salary, count)
+        for year, (total_salary, count) in columns.profession_stats(self.profession).items():
+            self.vacancy_stats[year] = CustomTuple(total_salary, count)
+        for city, (total_salary, count) in columns.city_stats().items():
+            self.cities_stats[city] = CustomTuple(total_salary, count)
+        if self.top_cities > 0:
+            self.cities_stats = top_counts(self.cities_stats, self.top_cities)
+        if len(self.professions) > 1:
+            self.professions_stats = {
+                profession: {year: CustomTuple(total_salary, count)
+                             for year, (total_salary, count) in vacancy_stats.items()}
+                for profession, vacancy_stats in columns.professions_stats(self.professions).items()}
+        if self.quantiles:
+            self.years_quantiles, self.cities_quantiles = columns.quantile_stats()
+            self.vacancy_quantiles = columns.quantile_stats(columns.profession_mask(self.profession))[0]
+            if self.top_cities > 0:
+                self.cities_quantiles = {city: self.cities_quantiles[city] for city in self.cities_stats}
+            if len(self.professions) > 1:
+                self.professions_quantiles = {
+                    profession: columns.quantile_stats(columns.profession_mask(profession))[0]
+                    for profession in self.professions}
+
+    @timed('count')
+    def count_parallel(self, file_name: str) -> None:
+        """Многопроцессный аналог count_vacancies: файл делится на куски по байтам
+
+        :param file_name: Название файла
+
+        :return: nothing
+        """
+        from parallel import count_parallel
+        statistic = count_parallel(file_name, self.profession, Vacancy.currency_ratio, self.workers, self.quantiles,
+                                   self.top_cities)
+        self.years_stats.update(statistic[0])
+        self.cities_stats.update(statistic[1])
+        self.vacancy_stats.update(statistic[2])
+        self.cities_count += statistic[3]
+        if self.quantiles:
+            self.years_quantiles, self.cities_quantiles, self.vacancy_quantiles = statistic[4:]
+
+    @timed('count')
+    def count_incremental(self, file_name: str) -> None:
+        """Аналог count_vacancies для дописываемых выгрузок: разбирается только новый хвост файла,
+        остальная статистика берётся из контрольной точки (см. incremental.py)
+
+        :param file_name: Название файла
+
+        :return: nothing
+        """
+        from incremental import count_incremental
+        years_stats, cities_stats, vacancy_stats, rows_count, _, _ = \
+            count_incremental(file_name, self.profession, Vacancy.currency_ratio, self.workers, self.top_cities)
+        self.years_stats.update(years_stats)
+        self.cities_stats.update(cities_stats)
+        self.vacancy_stats.update(vacancy_stats)
+        self.cities_count += rows_count
+
+    @timed('equalize', rows=False)
     def equalize_statistic(self) -> None:
         """Метод нормировки статистики в конкретном словаре
 
@@ -264,24 +702,20 @@ class InputConnect:
                 int(self.years_stats[year].totalSalary //
                     self.years_stats[year].count)
 
-        list_for_deleting = list()
-        for city in self.cities_stats.keys():
-            percent_count = round(self.cities_stats[city].count / self.cities_count, 4)
-            if percent_count < 0.01:
-                list_for_deleting.append(city)
-            else:
-                self.cities_stats[city].totalSalary = \
-                    int(self.cities_stats[city].totalSalary //
-                        self.cities_stats[city].count)
-                self.cities_stats[city].count = percent_count
-
-        for city in list_for_deleting:
-            del [self.cities_stats[city]]
-        for year in self.vacancy_stats.keys():
-            if self.vacancy_stats[year].count != 0:
-                self.vacancy_stats[year].totalSalary = \
-                    int(self.vacancy_stats[year].totalSalary //
-                        self.vacancy_stats[year].count)
+        cities_stats = dict()
+        for city, statistic in self.cities_stats.items():
+            percent_count = round(statistic.count / self.cities_count, 4)
+            if percent_count >= 0.01:
+                statistic.totalSalary = int(statistic.totalSalary // statistic.count)
+                statistic.count = percent_count
+                cities_stats[city] = statistic
+        self.cities_stats = cities_stats
+        for vacancy_stats in (self.vacancy_stats, *self.professions_stats.values()):
+            for year in vacancy_stats.keys():
+                if vacancy_stats[year].count != 0:
+                    vacancy_stats[year].totalSalary = \
+                        int(vacancy_stats[year].totalSalary //
+                            vacancy_stats[year].count)
 
     @staticmethod
     def print_first_string(string_for_output: str,
@@ -338,32 +772,192 @@ class InputConnect:
         if flag:
             print('}')
 
-    def make_table(self):
-        """Метод вызова всего необходимого для печати
+    def collect_dictionaries(self, profession: str = None, vacancy_stats: dict = None) -> list:
+        """Сборка словарей статистики в порядке аргументов генераторов Report
 
-        :return: nothing
+        :param profession: Профессия, по умолчанию введённая пользователем
+        :param vacancy_stats: Статистика профессии по годам, по умолчанию self.vacancy_stats
+
+        :return: лист [профессия, шесть словарей статистики]
         """
+        profession = self.profession if profession is None else profession
+        vacancy_stats = self.vacancy_stats if vacancy_stats is None else vacancy_stats
+        self.list_of_all_dictionaries = list()
         self.calc(self.years_stats, "totalSalary")
         self.calc(self.years_stats, "count")
-        self.calc(self.vacancy_stats, "totalSalary")
-        self.calc(self.vacancy_stats, "count")
+        self.calc(vacancy_stats, "totalSalary")
+        self.calc(vacancy_stats, "count")
         # if len(data_vacancies) == 0:
         #    return {x: 0 for x in self.__list_years}
-        cities_sorted = sorted(self.cities_stats, key=lambda x: self.cities_stats[x].totalSalary, reverse=True)
-        del cities_sorted[10:]
-        self.calc(self.cities_stats, "totalSalary")
-        cities_sorted = sorted(self.cities_stats, key=lambda x: self.cities_stats[x].count, reverse=True)
-        del cities_sorted[10:]
-        self.calc(self.cities_stats, "count")
-        self.list_of_all_dictionaries.insert(0, inserted_data.profession)
+        self.calc(self.top_statistic(self.cities_stats, "totalSalary"), "totalSalary")
+        self.calc(self.top_statistic(self.cities_stats, "count"), "count")
+        self.list_of_all_dictionaries.insert(0, profession)
+        return self.list_of_all_dictionaries
+
+    def collect_quantiles(self, vacancy_quantiles: dict = None) -> dict:
+        """Квантили зарплат для отчёта: 10-й перцентиль, медиана и 90-й перцентиль
+
+        :param vacancy_quantiles: Скетчи профессии по годам, по умолчанию self.vacancy_quantiles
+
+        :return: словарь {'years': ..., 'vacancy': ..., 'cities': ...} с листами [p10, p50, p90]
+            или None, если квантили не считались
+        """
+        if not self.quantiles or len(self.years_quantiles) == 0:
+            return None
+        vacancy_quantiles = self.vacancy_quantiles if vacancy_quantiles is None else vacancy_quantiles
+        return {'years': self.quantile_values(self.years_quantiles),
+                'vacancy': self.quantile_values(vacancy_quantiles),
+                'cities': self.quantile_values({city: self.cities_quantiles[city] for city in self.cities_stats})}
+
+    def profession_quantiles(self, profession: str = None, vacancy_stats: dict = None) -> dict:
+        """Квантили отчёта профессии: пакетные из professions_quantiles или квантили self.profession
+
+        :param profession: Профессия пакетного отчёта
+        :param vacancy_stats: Статистика профессии по годам; None - отчёт по self.profession
+
+        :return: словарь collect_quantiles или None, если квантили профессии не считались
+        """
+        if vacancy_stats is None:
+            return self.collect_quantiles()
+        if profession in self.professions_quantiles:
+            return self.collect_quantiles(self.professions_quantiles[profession])
+        return None
+
+    @staticmethod
+    def quantile_values(sketches: dict) -> dict:
+        """Целые значения квантилей QUANTILES каждого скетча
+
+        :param sketches: Словарь {ключ: QuantileSketch}
+
+        :return: словарь {ключ: [p10, p50, p90]}, у пустых скетчей - None
+        """
+        return {key: [None if value is None else int(value) for value in sketch.quantiles(QUANTILES)]
+                for key, sketch in sketches.items()}
+
+    def make_table(self, profession: str = None, vacancy_stats: dict = None, file_suffix: str = ''):
+        """Метод вызова всего необходимого для печати
+
+        :param profession: Профессия, по умолчанию введённая пользователем
+        :param vacancy_stats: Статистика профессии по годам, по умолчанию self.vacancy_stats
+        :param file_suffix: Суффикс имён файлов отчёта
+
+        :return: nothing
+        """
+        self.collect_dictionaries(profession, vacancy_stats)
         print(self.list_of_all_dictionaries, end='\n', sep='\n\n')
         if self.word_for_choice.lower() == 'вакансии':
-            self.report.generate_excel(*self.list_of_all_dictionaries)
+            from columnar import VacancyColumns
+            vacancies = VacancyColumns.load(self.raw_sheet_columns()).iter_rows() if self.raw_sheet else None
+            self.report.generate_excel(*self.list_of_all_dictionaries, file_name=f'report{file_suffix}.xlsx',
+                                       vacancies=vacancies,
+                                       quantiles=self.profession_quantiles(profession, vacancy_stats))
+            if self.query is not None:
+                self.print_vacancies(profession or self.profession)
         elif self.word_for_choice.lower() == 'статистика':
-            self.report.generate_image(*self.list_of_all_dictionaries)
+            self.report.generate_image(*self.list_of_all_dictionaries, file_name=f'graph{file_suffix}.png')
+        elif self.word_for_choice.lower() == 'все':
+            self.report.generate_all(self.list_of_all_dictionaries, file_suffix,
+                                     self.raw_sheet_columns() if self.raw_sheet else None,
+                                     self.profession_quantiles(profession, vacancy_stats))
         else:
             print('Данные введены неправильно')
 
+    def raw_sheet_columns(self) -> str:
+        """Столбцы листа всех вакансий XLSX, сохранённые во временную папку один раз за запуск
+
+        Папку открывают VacancyColumns.load с отображением в память и процессы
+        пула XLSX (см. generate_excel_from_file), поэтому в пакетном режиме файл
+        не перечитывается для каждой профессии. Лист строится из self.vacancies_columns,
+        если статистика посчитана по ним, иначе набор по годам читается целиком
+        с отбором self.years, а файл - через DataSet.put_columns с той же
+        дедупликацией и теми же курсами, что и статистика.
+
+        :return: путь к папке VacancyColumns.save
+        """
+        if self.raw_sheet_directory is None:
+            import tempfile
+            from columnar import VacancyColumns
+            columns = self.vacancies_columns
+            if columns is None:
+                dataset = DataSet(self.file_name, list(), self.deduplicate)
+                if os.path.isdir(self.file_name):
+                    dataset.put_partitions(self.years, self.exchange_rates, VacancyColumns.COLUMNS)
+                else:
+                    dataset.put_columns(self.use_cache, self.exchange_rates)
+                columns = dataset.vacancies_columns
+            self.raw_sheet_directory = tempfile.TemporaryDirectory()
+            columns.save(self.raw_sheet_directory.name)
+        return self.raw_sheet_directory.name
+
+    @timed('query', rows=False)
+    def print_vacancies(self, profession: str) -> None:
+        """Вывод страницы отдельных вакансий по запросу self.query (см. query.VacancyIndex.search)
+
+        Индексы строятся один раз на все профессии по столбцам с теми же кэшем,
+        курсами и дедупликацией, что и статистика. Без фильтра text в запросе
+        названия отбираются по профессии.
+
+        :param profession: Наименование профессии
+
+        :return: nothing
+        """
+        from query import VacancyIndex, load_columns, query_years, format_vacancy
+        if self.vacancy_index is None:
+            years = self.years or query_years(self.query.get('published_from'), self.query.get('published_to'))
+            self.vacancy_index = VacancyIndex(load_columns(self.file_name, years, self.use_cache,
+                                                           self.exchange_rates, self.deduplicate))
+        page = self.vacancy_index.search(**{'text': profession, **self.query})
+        if len(page) == 0:
+            print('Нет данных')
+        for vacancy in self.vacancy_index.rows(page):
+            print(format_vacancy(vacancy))
+
+    def make_batch_tables(self):
+        """Пакетный make_table: отчёт по каждой профессии в свой файл report_<профессия>.xlsx / graph_<профессия>.png
+
+        Графики всех профессий рендерятся параллельно в процессах (см. charts.render_many),
+        в режиме "Все" PDF собираются одним пакетом (см. Report.generate_batch).
+
+        :return: nothing
+        """
+        if self.word_for_choice.lower() == 'все':
+            reports = list()
+            for profession, vacancy_stats in self.professions_stats.items():
+                dictionaries = self.collect_dictionaries(profession, vacancy_stats)
+                print(dictionaries, end='\n', sep='\n\n')
+                reports.append((dictionaries, '_' + re.sub(r'[^\w-]+', '_', profession),
+                                self.profession_quantiles(profession, vacancy_stats)))
+            self.report.generate_batch(reports, self.raw_sheet_columns() if self.raw_sheet else None, self.workers)
+            return
+        if self.word_for_choice.lower() != 'статистика':
+            for profession, vacancy_stats in self.professions_stats.items():
+                self.make_table(profession, vacancy_stats, '_' + re.sub(r'[^\w-]+', '_', profession))
+            return
+        from charts import render_many
+        professions = list()
+        for profession, vacancy_stats in self.professions_stats.items():
+            dictionaries = self.collect_dictionaries(profession, vacancy_stats)
+            print(dictionaries, end='\n', sep='\n\n')
+            professions.append((profession, dictionaries[3], dictionaries[4],
+                                'graph_' + re.sub(r'[^\w-]+', '_', profession)))
+        render_many(dictionaries[1], dictionaries[2], dictionaries[5], dictionaries[6], professions,
+                    self.chart_formats, self.workers)
+
+    @staticmethod
+    def top_statistic(dictionary: dict, value: str, top: int = TOP_CITIES) -> dict:
+        """Первые top ключей по убыванию значения: выбор через кучу без сортировки всего словаря
+
+        При равных значениях раньше идёт ключ, встреченный раньше, как в sorted.
+
+        :param dictionary: Словарь {ключ: CustomTuple}
+        :param value: Поле для сравнения: totalSalary или count
+        :param top: Количество ключей
+
+        :return: словарь из top ключей по убыванию
+        """
+        return {key: dictionary[key]
+                for key in heapq.nlargest(top, dictionary, key=lambda key: getattr(dictionary[key], value))}
+
     def calc(self, dictionary: dict, value: str):
         """Метод вызволения словарей из объектов и добавления их в общий список
 
@@ -378,33 +972,112 @@ class InputConnect:
         self.list_of_all_dictionaries.append(common_vocabulary)
 
 
-def __auto_width(ws):
-    """
-    Внешняя функции выравнивания по ширине Excel-таблички
+def generate_excel_from_file(dictionaries: list, file_name: str, raw_columns: str = None,
+                             quantiles: dict = None) -> str:
+    """Report.generate_excel в процессе пула: итератор вакансий для листа всех строк создаётся на месте
 
-    :param ws: Конкретная ячейка
+    :param dictionaries: Лист [профессия, шесть словарей статистики]
+    :param file_name: Имя файла отчёта
+    :param raw_columns: Папка столбцов для листа со всеми строками (InputConnect.raw_sheet_columns);
+        None - без листа
+    :param quantiles: Квантили зарплат из InputConnect.collect_quantiles
 
-    :return: nothing
+    :return: file_name
     """
-    for column_cells in ws.columns:
-        new_column_length = max(len(str(cell.value)) for cell in column_cells)
-        new_column_letter = (get_column_letter(column_cells[0].column))
-        if new_column_length > 0:
-            ws.column_dimensions[new_column_letter].width = new_column_length * 1.23
+    from columnar import VacancyColumns
+    vacancies = VacancyColumns.load(raw_columns).iter_rows() if raw_columns else None
+    Report().generate_excel(*dictionaries, file_name=file_name, vacancies=vacancies, quantiles=quantiles)
+    return file_name
 
 
 class Report:
     """Библиотека генерации файлов отчёта в виде .pdf .png .xlsx
+
+    Библиотеки каждого формата (openpyxl, matplotlib, jinja2 и pdfkit)
+    импортируются только при генерации отчёта в этом формате.
     """
 
+    @timed('reports', rows=False)
+    def generate_all(self, dictionaries: list, file_suffix: str = '', raw_columns: str = None,
+                     quantiles: dict = None) -> list:
+        """Одновременная генерация report.xlsx, graph.png и report.pdf по одной статистике
+
+        Форматы рендерятся в отдельных процессах: openpyxl и matplotlib держат GIL,
+        поэтому потоки не дали бы выигрыша. PDF встраивает готовый graph.png и
+        запускается, как только график сохранён, параллельно с XLSX. Ошибка одного
+        формата не прерывает остальные и поднимается после их завершения.
+
+        :param dictionaries: Лист [профессия, шесть словарей статистики]
+        :param file_suffix: Суффикс имён файлов отчёта
+        :param raw_columns: Папка столбцов для листа XLSX со всеми строками; None - без листа
+        :param quantiles: Квантили зарплат из InputConnect.collect_quantiles
+
+        :return: лист имён сохранённых файлов
+        """
+        import pdf_report
+        from concurrent.futures import ProcessPoolExecutor
+        pdf_report.ensure_backend()
+        graph_name = f'graph{file_suffix}.png'
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(generate_excel_from_file, dictionaries, f'report{file_suffix}.xlsx',
+                                       raw_columns, quantiles),
+                       executor.submit(self.generate_image, *dictionaries, file_name=graph_name)]
+            if futures[1].exception() is None:
+                futures.append(executor.submit(self.generate_pdf, *dictionaries, file_name=f'report{file_suffix}.pdf',
+                                               graph_name=graph_name, quantiles=quantiles))
+        for future in futures:
+            future.result()
+        return [f'report{file_suffix}.xlsx', graph_name] + ([f'report{file_suffix}.pdf'] if len(futures) == 3 else [])
+
+    @timed('reports', rows=False)
+    def generate_batch(self, reports: list, raw_columns: str = None, workers: int = 1) -> list:
+        """Пакетный generate_all: XLSX, PNG и PDF отчётов многих профессий
+
+        XLSX пишутся в пуле процессов, пока графики всех профессий рисует
+        charts.render_many, а PDF собираются одним пакетом pdf_report.render_many
+        с графиками в памяти вместо отдельного рендера на каждый отчёт.
+
+        :param reports: Лист кортежей (словари статистики, суффикс имён файлов, квантили или None)
+        :param raw_columns: Папка столбцов для листа XLSX со всеми строками; None - без листа
+        :param workers: Количество процессов; 1 - XLSX и графики в текущем процессе
+
+        :return: лист имён сохранённых файлов
+        """
+        import pdf_report
+        from charts import render_many
+        from concurrent.futures import ProcessPoolExecutor
+        if len(reports) == 0:
+            return list()
+        pdf_report.ensure_backend()
+        common_dictionaries = [reports[0][0][index] for index in (1, 2, 5, 6)]
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            excel_files = (executor.map if executor else map)(
+                generate_excel_from_file, [dictionaries for dictionaries, _, _ in reports],
+                [f'report{file_suffix}.xlsx' for _, file_suffix, _ in reports], [raw_columns] * len(reports),
+                [quantiles for _, _, quantiles in reports])
+            graph_files = render_many(*common_dictionaries,
+                                      [(dictionaries[0], dictionaries[3], dictionaries[4], f'graph{file_suffix}')
+                                       for dictionaries, file_suffix, _ in reports], ('png',), workers)
+            pdf_files = pdf_report.render_many([(dictionaries, f'report{file_suffix}.pdf', quantiles)
+                                                for dictionaries, file_suffix, quantiles in reports], workers)
+            return list(excel_files) + graph_files + pdf_files
+        finally:
+            if executor:
+                executor.shutdown()
+
     @staticmethod
+    @timed('pdf', rows=False)
     def generate_pdf(input_name: str,
                      dynamics_slr: dict,
                      dynamics_count_vac: dict,
                      dynamics_slr_name: dict,
                      dynamics_count_vac_name: dict,
                      dynamics_slr_cities: dict,
-                     dynamics_count_vac_cities: dict):
+                     dynamics_count_vac_cities: dict,
+                     file_name: str = 'report.pdf',
+                     graph_name: str = None,
+                     quantiles: dict = None):
         """Метод генерации отчета в виде .pdf совмещающего и графики, и таблицы
 
         :param input_name: Название файла
@@ -414,38 +1087,29 @@ class Report:
         :param dynamics_count_vac_name: Словарь с наименованием и количеством вакансий
         :param dynamics_slr_cities: Словарь заплаты по городам
         :param dynamics_count_vac_cities: Словарь с количеством вакансий по городам
+        :param file_name: Имя файла отчёта
+        :param graph_name: Имя готового файла с графиками; по умолчанию графики рисуются в памяти
+        :param quantiles: Квантили зарплат из InputConnect.collect_quantiles - дополнительные столбцы таблиц
 
 
         :return: nothing
         """
-        headers1, headers2, headers3 = (["Год", "Средняя зарплата", f"Средняя зарплата - {input_name}",
-                                         "Количество вакансий", f"Количество вакансий - {input_name}"],
-                                        ["Город", "Уровень зарплат"], ["Город", "Доля вакансий"])
-        rows1 = list(map(lambda year: [year] + [dictionary[year] for dictionary in
-                                                (dynamics_slr, dynamics_count_vac,
-                                                 dynamics_slr_name, dynamics_count_vac_name)], dynamics_slr.keys()))
-        rows2 = list(map(lambda city: [city, dynamics_slr_cities[city]], dynamics_slr_cities.keys()))
-        rows3 = list(map(lambda city: [city, dynamics_count_vac_cities[city]], dynamics_count_vac_cities.keys()))
-
-        env = Environment(loader=FileSystemLoader('.'))
-        template = env.get_template("pdf_template.html")
-        pdf_template = template.render(graph_name='graph.png',
-                                       vacancy_name=input_name, headers1=headers1, headers2=headers2,
-                                       headers3=headers3,
-                                       rows1=rows1, rows2=rows2, rows3=rows3)
-        config = pdfkit.configuration(wkhtmltopdf=r'C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe')
-        options = {'enable-local-file-access': None}
-        pdfkit.from_string(pdf_template, 'report.pdf', options=options, configuration=config)
+        import pdf_report
+        pdf_report.save_report([input_name, dynamics_slr, dynamics_count_vac, dynamics_slr_name,
+                                dynamics_count_vac_name, dynamics_slr_cities, dynamics_count_vac_cities],
+                               file_name, graph_name, quantiles)
 
     @staticmethod
+    @timed('png', rows=False)
     def generate_image(input_name: str,
                        dynamics_slr: dict,
                        dynamics_count_vac: dict,
                        dynamics_slr_name: dict,
                        dynamics_count_vac_name: dict,
                        dynamics_slr_cities: dict,
-                       dynamics_count_vac_cities: dict):
-        """Метод генерации графиков отчета в .png
+                       dynamics_count_vac_cities: dict,
+                       file_name: str = 'graph.png'):
+        """Метод генерации графиков отчета в .png (или .svg по расширению file_name)
 
         :param input_name: Название файла
         :param dynamics_slr: Словарь с годами и зарплатами
@@ -454,62 +1118,16 @@ class Report:
         :param dynamics_count_vac_name: Словарь с наименованием и количеством вакансий
         :param dynamics_slr_cities: Словарь заплаты по городам
         :param dynamics_count_vac_cities: Словарь с количеством вакансий по городам
+        :param file_name: Имя файла с графиками
 
 
         :return: nothing
         """
-        fig = plt.figure(figsize=(10, 6))
-        plt.rcParams['font.size'] = '8'
-        width = 0.4
-        years = np.arange(len(dynamics_slr.keys()))
-        ax = fig.add_subplot(221)
-        ax.bar(years - width / 2,
-               dynamics_slr.values(),
-               width,
-               label='средняя з/п')
-        ax.bar(years + width / 2,
-               dynamics_slr_name.values(),
-               width,
-               label=f'з/п {input_name}')
-        ax.set_title('Уровень зарплат по годам')
-        ax.set_xticks(years, dynamics_slr.keys(), rotation='vertical')
-        ax.set_xticklabels(dynamics_slr.keys())
-        ax.legend()
-
-        bx = fig.add_subplot(222)
-        bx.bar(years - width / 2,
-               dynamics_count_vac.values(),
-               width,
-               label='Количество вакансий')
-        bx.bar(years + width / 2,
-               dynamics_count_vac_name.values(),
-               width,
-               label=f'Количество вакансий\n{input_name}')
-        bx.set_title('Количество вакансий по годам')
-        bx.set_xticks(years, dynamics_slr.keys(), rotation='vertical')
-        bx.set_xticklabels(dynamics_slr.keys())
-        bx.legend()
-        bx.grid(axis='y')
-
-        dynamics_slr_cities_rev = dict(reversed(list(dynamics_slr_cities.items())[:10]))
-        cities_slr = np.arange(len(dynamics_slr_cities_rev.keys()))
-        cx = fig.add_subplot(223)
-        cx.barh(cities_slr - width / 2, dynamics_slr_cities_rev.values(), width + 0.2)
-        cx.set_title('Уровень зарплат по годам')
-        cx.set_yticks(cities_slr)
-        cx.set_yticklabels(dynamics_slr_cities_rev.keys())
-        cx.grid(axis='x')
-
-        dx = fig.add_subplot(224)
-        dynamics_count_vac_cit_rev = dict(reversed(list(dynamics_count_vac_cities.items())))
-        dx.pie(dynamics_count_vac_cit_rev.values(),
-               labels=dynamics_count_vac_cit_rev.keys())
-        dx.set_title('Доля вакансий по городам')
-        dx.axis('equal')
-        fig.tight_layout()
-
-        fig.savefig('graph.png')
+        from charts import ChartTemplate
+        with ChartTemplate(dynamics_slr, dynamics_count_vac, dynamics_slr_cities, dynamics_count_vac_cities) as chart:
+            chart.render(input_name, dynamics_slr_name, dynamics_count_vac_name, file_name)
 
+    @timed('xlsx', rows=False)
     def generate_excel(self,
                        input_name: str,
                        dynamics_slr: dict,
@@ -517,8 +1135,11 @@ class Report:
                        dynamics_slr_name: dict,
                        dynamics_count_vac_name: dict,
                        dynamics_slr_cities: dict,
-                       dynamics_count_vac_cities: dict):
-        """Генерация XLSX файла отчёта
+                       dynamics_count_vac_cities: dict,
+                       file_name: str = 'report.xlsx',
+                       vacancies: Iterable = None,
+                       quantiles: dict = None):
+        """Генерация XLSX файла отчёта в потоковом write-only режиме openpyxl
 
         :param input_name: Название файла
         :param dynamics_slr: Словарь с годами и зарплатами
@@ -527,64 +1148,60 @@ class Report:
         :param dynamics_count_vac_name: Словарь с наименованием и количеством вакансий
         :param dynamics_slr_cities: Словарь заплаты по городам
         :param dynamics_count_vac_cities: Словарь с количеством вакансий по городам
+        :param file_name: Имя файла отчёта
+        :param vacancies: Необязательный итератор вакансий (DataSet.iter_vacancies) для листа со всеми строками
+        :param quantiles: Квантили зарплат из InputConnect.collect_quantiles - дополнительные столбцы листов
 
         :return: nothing
         """
-        workbook = Workbook()
-        stats_by_year = workbook.worksheets[0]
-        stats_by_year.title = "Cтатистика по годам"
-        stats_by_city = workbook.create_sheet("Cтатистика по городам")
-
-        stats_by_year.append(['Год', 'Средняя зарплата', f"Средняя зарплата - {input_name}",
-                              'Количество вакансий', f"Количество вакансий - {input_name}"])
-        for i, year in enumerate(dynamics_slr.keys(), 2):
-            stats_by_year.cell(row=i, column=1, value=year)
-            for j, dictionary in enumerate((dynamics_slr, dynamics_count_vac,
-                                            dynamics_slr_name, dynamics_count_vac_name), 2):
-                stats_by_year.cell(row=i, column=j, value=dictionary[year])
-
-        stats_by_city.append(['Город', 'Уровень зарплат', '', 'Город', 'Доля вакансий'])
-        for i, city in enumerate(dynamics_slr_cities.keys(), 2):
-            stats_by_city.cell(row=i, column=1, value=city)
-            stats_by_city.cell(
-                row=i, column=2, value=dynamics_slr_cities[city])
-        for i, city in enumerate(dynamics_count_vac_cities.keys(), 2):
-            stats_by_city.cell(row=i, column=4, value=city)
-            stats_by_city.cell(row=i, column=5, value=dynamics_count_vac_cities[city])
-
-        self.workbook(workbook)
-        workbook.save('report.xlsx')
-
-    @staticmethod
-    def workbook(wb):
-        """Нормировка конкретизированного workbook под свои задачи
-
-        :param wb: Конкретная ячейка
-
-        :return: nothing
-        """
-        bold_font = Font(bold=True)
-        thin = Side(border_style="thin", color="000000")
-        outline = Border(top=thin, left=thin, right=thin, bottom=thin)
-        for worksheet in wb.worksheets:
-            for column_cells in worksheet.columns:
-                length = max(len(str(cell.value) if cell.value is not None else "")
-                             for cell in column_cells)
-                worksheet.column_dimensions[column_cells[0]
-                                            .column_letter].width = length + 3
-            for cell in worksheet[1]:
-                cell.font = bold_font
-            for column in tuple(worksheet.columns):
-                if column[1].value is None:
-                    continue
-                for cell in column:
-                    cell.border = outline
-
-
-inserted_data = InputConnect()
-inserted_data.start_entering()
-current_dataset = DataSet(inserted_data.file_name, list())
-current_dataset.put_vacancies()
-inserted_data.count_vacancies(current_dataset.vacancies_objects)
-inserted_data.equalize_statistic()
-inserted_data.make_table()
+        import xlsx_report
+        xlsx_report.save_report(file_name, input_name, dynamics_slr, dynamics_count_vac, dynamics_slr_name,
+                                dynamics_count_vac_name, dynamics_slr_cities, dynamics_count_vac_cities,
+                                vacancies, quantiles)
+
+
+if __name__ == '__main__':
+    inserted_data = InputConnect()
+    inserted_data.start_entering()
+    with profiled(inserted_data.profile_file):
+        partitioned = os.path.isdir(inserted_data.file_name)
+        byte_ranges = not partitioned and not inserted_data.deduplicate and \
+            detect_compression(inserted_data.file_name) is None
+        if partitioned:
+            from columnar import VacancyColumns
+            current_dataset = DataSet(inserted_data.file_name, list())
+            current_dataset.put_partitions(inserted_data.years, inserted_data.exchange_rates,
+                                           VacancyColumns.COLUMNS if inserted_data.raw_sheet else None)
+            inserted_data.vacancies_columns = current_dataset.vacancies_columns
+            inserted_data.count_columns(current_dataset.vacancies_columns)
+        elif inserted_data.exchange_rates or inserted_data.raw_sheet:
+            current_dataset = DataSet(inserted_data.file_name, list(), inserted_data.deduplicate)
+            current_dataset.put_columns(inserted_data.use_cache, inserted_data.exchange_rates)
+            inserted_data.vacancies_columns = current_dataset.vacancies_columns
+            inserted_data.count_columns(current_dataset.vacancies_columns)
+        elif len(inserted_data.professions) > 1 and not inserted_data.use_cache:
+            current_dataset = DataSet(inserted_data.file_name, list(), inserted_data.deduplicate)
+            inserted_data.count_professions(current_dataset.iter_vacancies(), inserted_data.professions)
+        elif inserted_data.incremental and len(inserted_data.professions) == 1 and byte_ranges:
+            inserted_data.count_incremental(inserted_data.file_name)
+        elif inserted_data.workers > 1 and len(inserted_data.professions) == 1 and byte_ranges:
+            inserted_data.count_parallel(inserted_data.file_name)
+        elif inserted_data.use_cache:
+            current_dataset = DataSet(inserted_data.file_name, list(), inserted_data.deduplicate)
+            current_dataset.put_columns(use_cache=True)
+            inserted_data.count_columns(current_dataset.vacancies_columns)
+        else:
+            current_dataset = DataSet(inserted_data.file_name, list(), inserted_data.deduplicate)
+            inserted_data.count_vacancies(current_dataset.iter_vacancies())
+        metrics.count('vacancies', inserted_data.cities_count)
+        if inserted_data.deduplicate:
+            print(f"Удалено повторов: {metrics.counters.get('duplicates', 0)}")
+        inserted_data.equalize_statistic()
+        if len(inserted_data.professions) > 1:
+            inserted_data.make_batch_tables()
+        else:
+            inserted_data.make_table()
+        if inserted_data.raw_sheet_directory is not None:
+            inserted_data.raw_sheet_directory.cleanup()
+    if inserted_data.metrics_file:
+        metrics.write_summary(inserted_data.metrics_file)
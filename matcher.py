@@ -0,0 +1,70 @@
+from collections import deque
+from unittest import TestCase
+
+
+class AhoCorasick:
+    """Автомат Ахо-Корасик для поиска множества подстрок за один проход по строке
+
+    Attributes:
+        patterns (list): Искомые подстроки
+    """
+    def __init__(self, patterns: list) -> None:
+        """Построение бора и суффиксных ссылок
+
+        :param patterns: Искомые подстроки
+
+        >>> AhoCorasick(['he', 'she', 'hers']).find('ushers')
+        {0, 1, 2}
+        """
+        self.patterns = list(patterns)
+        self.__goto, self.__fail, self.__output = [dict()], [0], [set()]
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                if char not in self.__goto[state]:
+                    self.__goto.append(dict())
+                    self.__fail.append(0)
+                    self.__output.append(set())
+                    self.__goto[state][char] = len(self.__goto) - 1
+                state = self.__goto[state][char]
+            self.__output[state].add(index)
+        queue = deque(self.__goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.__goto[state].items():
+                queue.append(next_state)
+                fail = self.__fail[state]
+                while fail and char not in self.__goto[fail]:
+                    fail = self.__fail[fail]
+                self.__fail[next_state] = self.__goto[fail].get(char, 0)
+                self.__output[next_state] |= self.__output[self.__fail[next_state]]
+
+    def find(self, text: str) -> set:
+        """Индексы всех подстрок, встречающихся в тексте
+
+        :param text: Строка для поиска
+
+        :return: множество индексов в self.patterns
+        """
+        found, state = set(self.__output[0]), 0
+        goto, fail, output = self.__goto, self.__fail, self.__output
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found |= output[state]
+        return found
+
+
+class AhoCorasickTests(TestCase):
+    professions = ['Программист', 'Аналитик', 'Python', 'грамм', '']
+
+    def test_matches_in_operator(self):
+        automaton = AhoCorasick(self.professions)
+        for name in ['Программист Python', 'Системный аналитик', 'Аналитик данных', 'Дизайнер', '']:
+            self.assertEqual(automaton.find(name),
+                             {i for i, profession in enumerate(self.professions) if profession in name})
+
+    def test_overlapping_patterns(self):
+        self.assertEqual(AhoCorasick(['aab', 'ab', 'b', 'c']).find('aaab'), {0, 1, 2})
@@ -0,0 +1,289 @@
+import csv
+import io
+import mmap
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from unittest import TestCase
+
+from accumulators import CustomTuple, QuantileSketch, SpaceSaving, merge_statistic, top_counts
+from decoders import parse_published_at, parse_salary, intern_string
+from instrumentation import metrics
+from tokenizer import RowTokenizer, PIPELINE_COLUMNS, pipeline_columns
+
+CHUNK_SIZE = 64 * 1024 * 1024
+SCAN_BLOCK = 1024 * 1024
+STRAY_QUOTE = re.compile(rb'"(?<=[^,\r\n"]")(?=[^,\r\n"])')
+
+
+def read_headlines(file_name: str) -> tuple:
+    """Чтение шапки csv файла
+
+    :param file_name: Название файла
+
+    :return: кортеж (лист-шапка, смещение первой строки данных в байтах)
+    """
+    with open(file_name, 'rb') as file:
+        first_line = file.readline()
+        offset = file.tell()
+    headlines = next(csv.reader([first_line.decode('utf-8-sig')]), list())
+    return headlines, offset
+
+
+def odd_quotes(data, start: int, end: int) -> bool:
+    """Нечётно ли число кавычек csv в байтах [start, end), то есть end внутри поля в кавычках
+
+    Кавычка между двумя обычными символами поля без кавычек для csv.reader
+    просто символ и не считается. start и end - начала строк.
+
+    :param data: Байты файла (mmap)
+    :param start: Начало части
+    :param end: Конец части
+
+    :return: bool
+    """
+    quotes = sum(data[position:min(position + SCAN_BLOCK, end)].count(b'"')
+                 for position in range(start, end, SCAN_BLOCK))
+    if quotes:
+        quotes -= sum(1 for _ in STRAY_QUOTE.finditer(data, start, end))
+    return quotes % 2 == 1
+
+
+def split_byte_ranges(file_name: str, start: int, parts: int, chunk_size: int = CHUNK_SIZE,
+                      end: int = None) -> list:
+    """Разбиение файла на диапазоны байт, выровненные по концу записи csv
+
+    Граница ставится на перевод строки, перед которым чётное число кавычек
+    от начала диапазона, поэтому многострочные поля в кавычках не режутся.
+
+    :param file_name: Название файла
+    :param start: Смещение начала данных (после шапки)
+    :param parts: Минимальное количество диапазонов
+    :param chunk_size: Максимальный размер одного диапазона
+    :param end: Конец данных (выровненный по записи), по умолчанию конец файла
+
+    :return: лист кортежей (начало, конец)
+    """
+    size = os.path.getsize(file_name) if end is None else end
+    if size <= start:
+        return list()
+    parts = max(parts, -(-(size - start) // chunk_size))
+    step = -(-(size - start) // parts)
+    ranges = list()
+    with open(file_name, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        while start < size:
+            newline = data.find(b'\n', min(start + step, size), size)
+            end = size if newline == -1 else newline + 1
+            odd = odd_quotes(data, start, end)
+            while odd and end < size:
+                newline = data.find(b'\n', end, size)
+                odd ^= odd_quotes(data, end, size if newline == -1 else newline + 1)
+                end = size if newline == -1 else newline + 1
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def count_range(task: tuple) -> tuple:
+    """Разбор и подсчёт статистики одного диапазона файла (выполняется в процессе пула)
+
+    При top_cities > 0 города диапазона учитываются в SpaceSaving, а скетчи
+    квантилей держатся только для отслеживаемых им городов.
+
+    :param task: кортеж (файл, начало, конец, шапка, профессия, курсы валют, собирать квантили, top_cities)
+
+    :return: кортеж из статистики (years_stats, cities_stats, vacancy_stats, количество вакансий
+        и, если нужны квантили, ещё три словаря скетчей по годам, городам и годам профессии)
+        и словаря счётчиков metrics: rows_read, dropped_empty, dropped_columns, parse_errors
+    """
+    file_name, start, end, headlines, profession, currency_ratio, quantiles, top_cities = task
+    with open(file_name, 'rb') as file:
+        file.seek(start)
+        text = file.read(end - start).decode('utf-8')
+    tokenizer = RowTokenizer(io.StringIO(text, newline=''), pipeline_columns(headlines), headlines)
+    name, salary_from, salary_to, salary_currency, area_name, published_at = \
+        (tokenizer.columns.index(column) for column in PIPELINE_COLUMNS)
+    years_stats, cities_stats, vacancy_stats, rows_count, parse_errors = dict(), dict(), dict(), 0, 0
+    years_quantiles, cities_quantiles, vacancy_quantiles = dict(), dict(), dict()
+    cities_hitters = SpaceSaving(top_cities) if top_cities > 0 else None
+    for line in tokenizer:
+        try:
+            salary = (parse_salary(line[salary_from]) + parse_salary(line[salary_to])) * \
+                currency_ratio[line[salary_currency]] // 2
+            current_year = parse_published_at(line[published_at]).year
+        except (ValueError, KeyError):
+            parse_errors += 1
+            continue
+        rows_count += 1
+        if current_year not in years_stats:
+            years_stats[current_year] = CustomTuple(salary, 1)
+            vacancy_stats[current_year] = CustomTuple(0, 0)
+        else:
+            years_stats[current_year].add(salary)
+        city = intern_string(line[area_name])
+        if cities_hitters is not None:
+            cities_hitters.add(city, salary)
+        elif city not in cities_stats:
+            cities_stats[city] = CustomTuple(salary, 1)
+        else:
+            cities_stats[city].add(salary)
+        if profession in line[name]:
+            vacancy_stats[current_year].add(salary)
+        if quantiles:
+            if current_year not in years_quantiles:
+                years_quantiles[current_year], vacancy_quantiles[current_year] = QuantileSketch(), QuantileSketch()
+            years_quantiles[current_year].add(salary)
+            if cities_hitters is not None and cities_hitters.evicted is not None:
+                cities_quantiles.pop(cities_hitters.evicted, None)
+            if city not in cities_quantiles:
+                cities_quantiles[city] = QuantileSketch()
+            cities_quantiles[city].add(salary)
+            if profession in line[name]:
+                vacancy_quantiles[current_year].add(salary)
+    if cities_hitters is not None:
+        cities_stats = cities_hitters.statistic()
+    counters = {'rows_read': tokenizer.rows + tokenizer.dropped_empty + tokenizer.dropped_columns,
+                'dropped_empty': tokenizer.dropped_empty, 'dropped_columns': tokenizer.dropped_columns,
+                'parse_errors': parse_errors}
+    if quantiles:
+        return (years_stats, cities_stats, vacancy_stats, rows_count,
+                years_quantiles, cities_quantiles, vacancy_quantiles), counters
+    return (years_stats, cities_stats, vacancy_stats, rows_count), counters
+
+
+def count_ranges(file_name: str, ranges: list, headlines: list, profession: str, currency_ratio: dict,
+                 workers: int = 1, statistic: tuple = None, quantiles: bool = False, top_cities: int = 0) -> tuple:
+    """Подсчёт и слияние статистики диапазонов файла по порядку
+
+    Счётчики прочитанных, отброшенных и неразобранных строк диапазонов
+    суммируются в metrics, как при последовательном чтении DataSet. При
+    top_cities > 0 после каждого слияния остаются только top_cities самых
+    частых городов (слияние сводок SpaceSaving), их же скетчи квантилей.
+
+    :param file_name: Название файла
+    :param ranges: Лист диапазонов (начало, конец) из split_byte_ranges
+    :param headlines: Лист-шапка
+    :param profession: Наименование профессии
+    :param currency_ratio: Курсы валют (Vacancy.currency_ratio)
+    :param workers: Количество процессов; 1 - без пула
+    :param statistic: Уже посчитанная статистика, к которой добавляются диапазоны
+    :param quantiles: Собирать скетчи квантилей (см. count_range)
+    :param top_cities: Сколько самых частых городов учитывать; 0 - все
+
+    :return: кортеж (years_stats, cities_stats, vacancy_stats, количество вакансий[, три словаря скетчей])
+    """
+    statistic = list(statistic or (dict(), dict(), dict(), 0) + ((dict(), dict(), dict()) if quantiles else ()))
+    tasks = [(file_name, start, end, headlines, profession, currency_ratio, quantiles, top_cities)
+             for start, end in ranges]
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 and len(tasks) > 1 else None
+    counters = dict()
+    try:
+        for partial, partial_counters in (executor.map if executor else map)(count_range, tasks):
+            for index, partial_statistic in enumerate(partial):
+                if index == 3:
+                    statistic[index] += partial_statistic
+                else:
+                    merge_statistic(statistic[index], partial_statistic)
+            if top_cities > 0 and len(statistic[1]) > top_cities:
+                statistic[1] = top_counts(statistic[1], top_cities)
+                if quantiles:
+                    statistic[5] = {city: statistic[5][city] for city in statistic[1] if city in statistic[5]}
+            for name, value in partial_counters.items():
+                counters[name] = counters.get(name, 0) + value
+    finally:
+        if executor:
+            executor.shutdown()
+    for name, value in counters.items():
+        metrics.count(name, value)
+    return tuple(statistic)
+
+
+def count_parallel(file_name: str, profession: str, currency_ratio: dict, workers: int = None,
+                   quantiles: bool = False, top_cities: int = 0) -> tuple:
+    """Параллельный подсчёт статистики по кускам файла в пуле процессов
+
+    Частичные словари сливаются в порядке кусков, поэтому порядок ключей
+    и значения совпадают с последовательным InputConnect.count_vacancies.
+
+    :param file_name: Название файла
+    :param profession: Наименование профессии
+    :param currency_ratio: Курсы валют (Vacancy.currency_ratio)
+    :param workers: Количество процессов, по умолчанию os.cpu_count()
+    :param quantiles: Собирать скетчи квантилей зарплат
+    :param top_cities: Сколько самых частых городов учитывать (SpaceSaving); 0 - все
+
+    :return: кортеж (years_stats, cities_stats, vacancy_stats, количество вакансий[, три словаря скетчей])
+    """
+    workers = workers or os.cpu_count() or 1
+    headlines, offset = read_headlines(file_name)
+    if len(headlines) == 0:
+        print('Пустой файл')
+        exit()
+    statistic = count_ranges(file_name, split_byte_ranges(file_name, offset, workers), headlines, profession,
+                             currency_ratio, workers, quantiles=quantiles, top_cities=top_cities)
+    if statistic[3] == 0:
+        print('Нет данных')
+        exit()
+    return statistic
+
+
+class ParallelTests(TestCase):
+    def test_rejected_rows_are_counted(self):
+        import tempfile
+        rows = ('Программист,100,200,RUR,Москва,2022-06-14T11:44:58+0300\n'
+                'Программист,,200,RUR,Москва,2022-06-14T11:44:58+0300\n'
+                'Программист,100,200\n'
+                'Программист,100,200,XXX,Москва,2022-06-14T11:44:58+0300\n')
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, 'vacancies.csv')
+            with open(file_name, 'w', encoding='utf-8') as file:
+                file.write('name,salary_from,salary_to,salary_currency,area_name,published_at\n' + rows * 50)
+            headlines, offset = read_headlines(file_name)
+            metrics.reset()
+            statistic = count_ranges(file_name, split_byte_ranges(file_name, offset, 4), headlines, 'Программист',
+                                     {'RUR': 1})
+        self.assertEqual(statistic[3], 50)
+        self.assertEqual(metrics.counters, {'rows_read': 200, 'dropped_empty': 50, 'dropped_columns': 50,
+                                            'parse_errors': 50})
+
+    def test_top_cities_keep_heavy_hitters(self):
+        import tempfile
+        cities = ['Москва'] * 6 + ['Омск'] * 3
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, 'vacancies.csv')
+            with open(file_name, 'w', encoding='utf-8') as file:
+                file.write('name,salary_from,salary_to,salary_currency,area_name,published_at\n')
+                for index in range(3000):
+                    city = cities[index % 10] if index % 10 < 9 else f'Город{index}'
+                    file.write(f'Программист,100,200,RUR,{city},2022-06-14T11:44:58+0300\n')
+            headlines, offset = read_headlines(file_name)
+            statistic = count_ranges(file_name, split_byte_ranges(file_name, offset, 4, chunk_size=4096),
+                                     headlines, 'Программист', {'RUR': 1}, quantiles=True, top_cities=3)
+        self.assertLessEqual(len(statistic[1]), 3)
+        self.assertEqual(list(statistic[1])[:2], ['Москва', 'Омск'])
+        self.assertEqual(statistic[1]['Москва'].count, 1800)
+        self.assertLessEqual(set(statistic[5]), set(statistic[1]))
+
+    def test_quoted_fields_across_ranges(self):
+        import tempfile
+        rows = ('"Программист, Python",100,200,RUR,Москва,2022-06-14T11:44:58+0300,"две\nстроки ""с, кавычками"""\n'
+                'Программист,100,200,RUR,"Санкт-\nПетербург",2021-06-14T11:44:58+0300,"a\n\nb"\n'
+                'Кавычка"внутри,300,400,RUR,Омск,2020-06-14T11:44:58+0300,c\n')
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, 'vacancies.csv')
+            with open(file_name, 'w', encoding='utf-8', newline='') as file:
+                file.write('name,salary_from,salary_to,salary_currency,area_name,published_at,description\n')
+                file.write(rows * 40)
+            headlines, offset = read_headlines(file_name)
+            ranges = split_byte_ranges(file_name, offset, 4, chunk_size=97)
+            metrics.reset()
+            statistic = count_ranges(file_name, ranges, headlines, 'Программист', {'RUR': 1})
+            self.assertEqual(metrics.counters, {'rows_read': 120, 'dropped_empty': 0, 'dropped_columns': 0,
+                                                'parse_errors': 0})
+            expected = count_ranges(file_name, [(offset, os.path.getsize(file_name))], headlines, 'Программист',
+                                    {'RUR': 1})
+        self.assertGreater(len(ranges), 10)
+        self.assertEqual(statistic[3], 120)
+        for index in range(3):
+            self.assertEqual({key: (value.totalSalary, value.count) for key, value in statistic[index].items()},
+                             {key: (value.totalSalary, value.count) for key, value in expected[index].items()})
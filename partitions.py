@@ -0,0 +1,293 @@
+import json
+import os
+import shutil
+from unittest import TestCase
+
+import numpy as np
+
+from columnar import ColumnsBuilder, VacancyColumns
+
+DATASET_FILE = '_dataset.json'
+PARTITIONS_VERSION = 3
+BUFFER_ROWS = 1_000_000
+CATEGORIES = {'area': 'areas', 'currency': 'currencies', 'name': 'names'}
+STATISTIC_COLUMNS = ('salary', 'month', 'area', 'name')
+
+
+def parquet_available() -> bool:
+    """Есть ли pyarrow для записи и чтения Parquet
+
+    :return: bool
+    """
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def is_partitioned(path: str) -> bool:
+    """Является ли путь папкой набора, записанного write_partitions
+
+    :param path: Путь к файлу или папке
+
+    :return: bool
+    """
+    return os.path.isfile(os.path.join(path, DATASET_FILE))
+
+
+def partition_directory(directory: str, year: int) -> str:
+    """Папка одного года в стиле Hive: year=2019
+
+    :param directory: Папка набора
+    :param year: Год
+
+    :return: путь к папке года
+    """
+    return os.path.join(directory, f'year={year}')
+
+
+def part_path(directory: str, year: int, part: int, file_format: str) -> str:
+    """Путь одной части года: part-N.parquet или папка part-N в формате VacancyColumns.save
+
+    :param directory: Папка набора
+    :param year: Год
+    :param part: Номер части
+    :param file_format: 'parquet' или 'npy'
+
+    :return: путь к файлу или папке части
+    """
+    name = f'part-{part}.parquet' if file_format == 'parquet' else f'part-{part}'
+    return os.path.join(partition_directory(directory, year), name)
+
+
+def write_partitions(vacancies, output_directory: str, file_format: str = None, buffer_rows: int = BUFFER_ROWS) -> dict:
+    """Запись вакансий в набор, разбитый по годам, с типизированными столбцами и словарным кодированием
+
+    Каждый год хранится отдельно частями: в Parquet (part-N.parquet, столбцы-словари
+    Arrow) или, без pyarrow, в формате VacancyColumns.save (папки part-N). Строки
+    копятся по годам, и когда всего накоплено buffer_rows строк, самый большой год
+    сбрасывается очередной частью, поэтому память не зависит от размера файла.
+
+    Набор пишется во временную папку рядом с output_directory и подменяет её
+    только в конце. Заменяется только прежний набор (is_partitioned) или пустая
+    папка; любой другой существующий путь не трогается.
+
+    :param vacancies: Итератор вакансий (DataSet.iter_vacancies)
+    :param output_directory: Папка набора
+    :param file_format: 'parquet' или 'npy'; по умолчанию parquet, если установлен pyarrow
+    :param buffer_rows: Сколько строк всех годов держать в памяти до сброса части
+
+    :return: словарь количества строк по годам
+    """
+    file_format = file_format or ('parquet' if parquet_available() else 'npy')
+    if file_format not in ('parquet', 'npy'):
+        raise ValueError(f'Неизвестный формат набора: {file_format}')
+    output_directory = os.path.abspath(output_directory)
+    if os.path.exists(output_directory) and not is_partitioned(output_directory) and \
+            not (os.path.isdir(output_directory) and len(os.listdir(output_directory)) == 0):
+        raise FileExistsError(f'{output_directory} уже существует и не является набором по годам')
+    temporary_directory = f'{output_directory}.tmp{os.getpid()}'
+    os.makedirs(temporary_directory)
+    try:
+        builders, rows_count, parts, buffered = dict(), dict(), dict(), 0
+        for vacancy in vacancies:
+            year = vacancy.published_at.year
+            if year not in builders:
+                builders[year] = ColumnsBuilder()
+            builders[year].append(vacancy.name, vacancy.salary, vacancy.area_name, vacancy.salary_currency,
+                                  vacancy.published_at, vacancy.salary_sum)
+            buffered += 1
+            if buffered >= buffer_rows:
+                largest = max(builders, key=lambda key: len(builders[key]))
+                buffered -= _write_part(builders.pop(largest), temporary_directory, largest, file_format,
+                                        rows_count, parts)
+        for year in list(builders):
+            _write_part(builders.pop(year), temporary_directory, year, file_format, rows_count, parts)
+        with open(os.path.join(temporary_directory, DATASET_FILE), 'w', encoding='utf-8') as file:
+            json.dump({'version': PARTITIONS_VERSION, 'format': file_format,
+                       'partitions': {str(year): rows_count[year] for year in sorted(rows_count)},
+                       'parts': {str(year): parts[year] for year in sorted(parts)}}, file)
+        if os.path.isdir(output_directory):
+            old_directory = f'{output_directory}.old{os.getpid()}'
+            os.replace(output_directory, old_directory)
+            os.replace(temporary_directory, output_directory)
+            shutil.rmtree(old_directory)
+        else:
+            os.replace(temporary_directory, output_directory)
+    except BaseException:
+        shutil.rmtree(temporary_directory, ignore_errors=True)
+        raise
+    return {year: rows_count[year] for year in sorted(rows_count)}
+
+
+def _write_part(builder: ColumnsBuilder, directory: str, year: int, file_format: str,
+                rows_count: dict, parts: dict) -> int:
+    """Запись накопленных строк года очередной частью набора
+
+    :param builder: Построитель с накопленными строками года
+    :param directory: Папка набора
+    :param year: Год
+    :param file_format: 'parquet' или 'npy'
+    :param rows_count: Словарь количества строк по годам, дополняется
+    :param parts: Словарь количества частей по годам, дополняется
+
+    :return: количество записанных строк
+    """
+    columns = builder.build()
+    path = part_path(directory, year, parts.get(year, 0), file_format)
+    if file_format == 'parquet':
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_parquet(columns, path)
+    else:
+        columns.save(path)
+    parts[year] = parts.get(year, 0) + 1
+    rows_count[year] = rows_count.get(year, 0) + len(columns)
+    return len(columns)
+
+
+def read_partitions(directory: str, years: list = None, columns: tuple = None,
+                    mmap_mode: str = 'r') -> VacancyColumns:
+    """Чтение набора write_partitions с отбором годов и столбцов
+
+    Папки годов не из years не открываются вовсе, а из файлов читаются только
+    столбцы columns; остальные столбцы результата равны None. Коды категорий
+    разных частей сводятся к общим словарям, годы идут по возрастанию.
+
+    :param directory: Папка набора
+    :param years: Нужные годы; по умолчанию все
+    :param columns: Нужные столбцы из VacancyColumns.COLUMNS; по умолчанию все
+    :param mmap_mode: Режим np.load для формата npy
+
+    :return: VacancyColumns
+    """
+    with open(os.path.join(directory, DATASET_FILE), encoding='utf-8') as file:
+        dataset = json.load(file)
+    if dataset.get('version') != PARTITIONS_VERSION:
+        raise ValueError(f'Набор {directory} записан другой версией, перезапишите его: csv_parser.py --format columnar')
+    columns = tuple(columns or VacancyColumns.COLUMNS)
+    unknown_columns = set(columns) - set(VacancyColumns.COLUMNS)
+    if unknown_columns:
+        raise ValueError(f'Неизвестные столбцы: {", ".join(sorted(unknown_columns))}')
+    selected = sorted(int(year) for year in dataset['partitions'] if years is None or int(year) in years)
+    read = _read_parquet if dataset['format'] == 'parquet' else _read_npy
+    parts = [read(part_path(directory, year, part, dataset['format']), columns, mmap_mode)
+             for year in selected for part in range(dataset['parts'][str(year)])]
+    categories = {name: dict() for name in CATEGORIES.values()}
+    merged = {column: list() for column in columns}
+    for arrays, part_categories in parts:
+        for column in columns:
+            array = arrays[column]
+            if column in CATEGORIES:
+                mapping = [categories[CATEGORIES[column]].setdefault(value, len(categories[CATEGORIES[column]]))
+                           for value in part_categories[CATEGORIES[column]]]
+                array = np.asarray(mapping, dtype=array.dtype)[array] if len(mapping) else array
+            merged[column].append(array)
+    arrays = {column: (merged[column][0] if len(merged[column]) == 1 else np.concatenate(merged[column]))
+              if merged[column] else np.zeros(0, dtype=_empty_dtype(column)) for column in columns}
+    return VacancyColumns(*(arrays.get(column) for column in VacancyColumns.COLUMNS),
+                          *(list(categories[name]) for name in ('areas', 'currencies', 'names')))
+
+
+def _empty_dtype(column: str):
+    """Тип пустого столбца, если не выбран ни один год
+
+    :param column: Название столбца
+
+    :return: тип NumPy
+    """
+    return {'salary': np.float64, 'salary_sum': np.float64, 'month': np.int32, 'published': np.int64,
+            'area': np.int32, 'currency': np.int16, 'name': np.int32}[column]
+
+
+def _read_npy(path: str, columns: tuple, mmap_mode: str) -> tuple:
+    """Чтение выбранных столбцов части года в формате VacancyColumns.save
+
+    :param path: Папка части
+    :param columns: Нужные столбцы
+    :param mmap_mode: Режим np.load
+
+    :return: кортеж ({столбец: массив}, {словарь категорий: лист})
+    """
+    arrays = {column: np.load(os.path.join(path, f'{column}.npy'), mmap_mode=mmap_mode) for column in columns}
+    with open(os.path.join(path, 'categories.json'), encoding='utf-8') as file:
+        return arrays, json.load(file)
+
+
+def _write_parquet(columns: VacancyColumns, file_name: str) -> None:
+    """Запись части года в Parquet со словарными столбцами
+
+    :param columns: Хранилище части
+    :param file_name: Файл .parquet
+
+    :return: nothing
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    fields = dict()
+    for column in VacancyColumns.COLUMNS:
+        array = getattr(columns, column)
+        if column in CATEGORIES:
+            dictionary = pa.array(getattr(columns, CATEGORIES[column]), type=pa.string())
+            fields[column] = pa.DictionaryArray.from_arrays(pa.array(array), dictionary)
+        else:
+            fields[column] = pa.array(array)
+    pq.write_table(pa.table(fields), file_name)
+
+
+def _read_parquet(path: str, columns: tuple, mmap_mode: str) -> tuple:
+    """Чтение выбранных столбцов части года из Parquet
+
+    :param path: Файл части
+    :param columns: Нужные столбцы
+    :param mmap_mode: Не используется: Parquet читается через отображение файла pyarrow
+
+    :return: кортеж ({столбец: массив}, {словарь категорий: лист})
+    """
+    import pyarrow.parquet as pq
+    table = pq.read_table(path, columns=list(columns), memory_map=True)
+    table = table.unify_dictionaries().combine_chunks()
+    arrays, categories = dict(), {name: list() for name in CATEGORIES.values()}
+    for column in columns:
+        chunked = table.column(column)
+        if column in CATEGORIES and chunked.num_chunks:
+            array = chunked.chunk(0)
+            arrays[column] = array.indices.to_numpy(zero_copy_only=False).astype(_empty_dtype(column), copy=False)
+            categories[CATEGORIES[column]] = array.dictionary.to_pylist()
+        elif column in CATEGORIES:
+            arrays[column] = np.zeros(0, dtype=_empty_dtype(column))
+        else:
+            arrays[column] = chunked.to_numpy()
+    return arrays, categories
+
+
+class PartitionsTests(TestCase):
+    def test_parts_and_safe_replace(self):
+        import tempfile
+        from main import DataSet
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, 'vacancies.csv')
+            with open(file_name, 'w', encoding='utf-8') as file:
+                file.write('name,salary_from,salary_to,salary_currency,area_name,published_at\n')
+                for index in range(500):
+                    file.write(f'Программист{index % 7},{index + 100},{index + 200},RUR,Город{index % 13},'
+                               f'20{10 + index % 3}-06-14T11:44:58+0300\n')
+            output = os.path.join(directory, 'keep')
+            os.makedirs(output)
+            with open(os.path.join(output, 'important.txt'), 'w') as file:
+                file.write('x')
+            with self.assertRaises(FileExistsError):
+                write_partitions(DataSet(file_name, list()).iter_vacancies(), output, 'npy')
+            self.assertTrue(os.path.isfile(os.path.join(output, 'important.txt')))
+            output = os.path.join(directory, 'dataset')
+            whole = write_partitions(DataSet(file_name, list()).iter_vacancies(), output, 'npy')
+            expected = read_partitions(output, mmap_mode=None)
+            chunked = write_partitions(DataSet(file_name, list()).iter_vacancies(), output, 'npy', buffer_rows=40)
+            actual = read_partitions(output, mmap_mode=None)
+            self.assertEqual(chunked, whole)
+            self.assertEqual(sorted(os.listdir(directory)), ['dataset', 'keep', 'vacancies.csv'])
+            self.assertGreater(len(os.listdir(partition_directory(output, 2010))), 1)
+            for column in VacancyColumns.COLUMNS:
+                self.assertTrue(np.array_equal(getattr(actual, column), getattr(expected, column)))
+            for name in CATEGORIES.values():
+                self.assertEqual(sorted(getattr(actual, name)), sorted(getattr(expected, name)))
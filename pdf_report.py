@@ -0,0 +1,268 @@
+import base64
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from unittest import TestCase
+
+from jinja2 import Environment, FileSystemLoader
+
+from accumulators import QUANTILES_HEADLINES
+from charts import ChartTemplate
+
+TEMPLATE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+PDF_OPTIONS = {'enable-local-file-access': None, 'encoding': 'UTF-8', 'quiet': None}
+PDF_ARGUMENTS = ('--enable-local-file-access', '--encoding', 'UTF-8', '--quiet')
+
+
+@lru_cache(maxsize=None)
+def pdf_template():
+    """Скомпилированный шаблон pdf_template.html, один на процесс
+
+    :return: jinja2.Template
+    """
+    return Environment(loader=FileSystemLoader(TEMPLATE_DIRECTORY)).get_template('pdf_template.html')
+
+
+def wkhtmltopdf_executable() -> str:
+    """wkhtmltopdf из переменной WKHTMLTOPDF или из PATH
+
+    :return: путь к программе
+    """
+    executable = os.environ.get('WKHTMLTOPDF') or shutil.which('wkhtmltopdf')
+    if executable is None:
+        raise OSError('wkhtmltopdf не найден: установите его или укажите путь в переменной WKHTMLTOPDF')
+    return executable
+
+
+@lru_cache(maxsize=None)
+def wkhtmltopdf_configuration():
+    """Настройки pdfkit с wkhtmltopdf_executable
+
+    :return: pdfkit.configuration
+    """
+    import pdfkit
+    return pdfkit.configuration(wkhtmltopdf=wkhtmltopdf_executable())
+
+
+def ensure_backend() -> None:
+    """Проверка, что PDF есть чем собрать (weasyprint или wkhtmltopdf), до генерации остальных форматов
+
+    :return: nothing
+    """
+    if not weasyprint_available():
+        wkhtmltopdf_executable()
+
+
+def weasyprint_available() -> bool:
+    """Есть ли weasyprint: он рендерит PDF внутри процесса без запуска wkhtmltopdf
+
+    :return: bool
+    """
+    try:
+        import weasyprint  # noqa: F401
+    except (ImportError, OSError):
+        return False
+    return True
+
+
+def chart_data_uri(dictionaries: list, chart: ChartTemplate = None) -> str:
+    """Графики отчёта в виде data URI PNG, без промежуточного graph.png на диске
+
+    :param dictionaries: Лист [профессия, шесть словарей статистики]
+    :param chart: Готовый шаблон графиков с теми же общими словарями
+
+    :return: строка data:image/png;base64,...
+    """
+    input_name, dynamics_slr, dynamics_count_vac, dynamics_slr_name, dynamics_count_vac_name, \
+        dynamics_slr_cities, dynamics_count_vac_cities = dictionaries
+    image = io.BytesIO()
+    if chart is None:
+        with ChartTemplate(dynamics_slr, dynamics_count_vac, dynamics_slr_cities, dynamics_count_vac_cities) as chart:
+            chart.render(input_name, dynamics_slr_name, dynamics_count_vac_name, image, 'png')
+    else:
+        chart.render(input_name, dynamics_slr_name, dynamics_count_vac_name, image, 'png')
+    return 'data:image/png;base64,' + base64.b64encode(image.getvalue()).decode('ascii')
+
+
+def render_html(dictionaries: list, graph_src: str, quantiles: dict = None) -> str:
+    """HTML отчёта по шаблону
+
+    :param dictionaries: Лист [профессия, шесть словарей статистики]
+    :param graph_src: Адрес картинки с графиками (data URI или file://)
+    :param quantiles: Квантили зарплат (InputConnect.collect_quantiles) - дополнительные столбцы таблиц
+
+    :return: строка HTML
+    """
+    input_name, dynamics_slr, dynamics_count_vac, dynamics_slr_name, dynamics_count_vac_name, \
+        dynamics_slr_cities, dynamics_count_vac_cities = dictionaries
+    headers1, headers2, headers3 = (["Год", "Средняя зарплата", f"Средняя зарплата - {input_name}",
+                                     "Количество вакансий", f"Количество вакансий - {input_name}"],
+                                    ["Город", "Уровень зарплат"], ["Город", "Доля вакансий"])
+    rows1 = list(map(lambda year: [year] + [dictionary[year] for dictionary in
+                                            (dynamics_slr, dynamics_count_vac,
+                                             dynamics_slr_name, dynamics_count_vac_name)], dynamics_slr.keys()))
+    rows2 = list(map(lambda city: [city, dynamics_slr_cities[city]], dynamics_slr_cities.keys()))
+    rows3 = list(map(lambda city: [city, dynamics_count_vac_cities[city]], dynamics_count_vac_cities.keys()))
+    if quantiles is not None:
+        headers1 += list(QUANTILES_HEADLINES) + [f'{headline} - {input_name}' for headline in QUANTILES_HEADLINES]
+        headers2 += list(QUANTILES_HEADLINES)
+        for row in rows1:
+            row += quantiles['years'].get(row[0], [None] * 3) + quantiles['vacancy'].get(row[0], [None] * 3)
+        for row in rows2:
+            row += quantiles['cities'].get(row[0], [None] * 3)
+    return pdf_template().render(graph_src=graph_src, vacancy_name=input_name,
+                                 headers1=headers1, headers2=headers2, headers3=headers3,
+                                 rows1=rows1, rows2=rows2, rows3=rows3)
+
+
+def write_pdf(html: str, file_name: str) -> str:
+    """Преобразование HTML в PDF: weasyprint в процессе или wkhtmltopdf
+
+    :param html: Строка HTML
+    :param file_name: Имя PDF файла
+
+    :return: file_name
+    """
+    if weasyprint_available():
+        import weasyprint
+        weasyprint.HTML(string=html, base_url=TEMPLATE_DIRECTORY).write_pdf(file_name)
+    else:
+        import pdfkit
+        pdfkit.from_string(html, file_name, options=PDF_OPTIONS, configuration=wkhtmltopdf_configuration())
+    return file_name
+
+
+def write_pdfs(pages: list, file_names: list) -> list:
+    """Преобразование многих HTML в PDF одним процессом wkhtmltopdf
+
+    Страницы пишутся во временную папку, а wkhtmltopdf с --read-args-from-stdin
+    выполняет по преобразованию на каждую строку stdin, запускаясь один раз.
+
+    :param pages: Строки HTML
+    :param file_names: Имена PDF файлов
+
+    :return: file_names
+    """
+    def quote(argument: str) -> str:
+        return '"' + argument.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+    executable = wkhtmltopdf_executable()
+    with tempfile.TemporaryDirectory() as directory:
+        lines = list()
+        for index, page in enumerate(pages):
+            html_name, pdf_name = os.path.join(directory, f'{index}.html'), os.path.join(directory, f'{index}.pdf')
+            with open(html_name, 'w', encoding='utf-8') as file:
+                file.write(page)
+            lines.append(' '.join(quote(argument) for argument in PDF_ARGUMENTS + (html_name, pdf_name)))
+        result = subprocess.run([executable, '--read-args-from-stdin'], input='\n'.join(lines) + '\n',
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            raise OSError(f'wkhtmltopdf завершился с кодом {result.returncode}: {result.stderr.strip()}')
+        for index, file_name in enumerate(file_names):
+            shutil.move(os.path.join(directory, f'{index}.pdf'), file_name)
+    return file_names
+
+
+def save_report(dictionaries: list, file_name: str = 'report.pdf', graph_name: str = None,
+                quantiles: dict = None) -> str:
+    """Сборка одного PDF отчёта
+
+    :param dictionaries: Лист [профессия, шесть словарей статистики]
+    :param file_name: Имя PDF файла
+    :param graph_name: Готовая картинка графиков; по умолчанию графики рисуются в памяти
+    :param quantiles: Квантили зарплат (InputConnect.collect_quantiles)
+
+    :return: file_name
+    """
+    if graph_name is None:
+        graph_src = chart_data_uri(dictionaries)
+    else:
+        graph_src = 'file://' + os.path.abspath(graph_name)
+    return write_pdf(render_html(dictionaries, graph_src, quantiles), file_name)
+
+
+def render_many(reports: list, workers: int = None) -> list:
+    """Пакетная сборка PDF отчётов многих профессий
+
+    С weasyprint отчёты рендерятся в пуле процессов, где шаблон, шрифты и
+    библиотека загружаются один раз на процесс. Без него графики и HTML
+    готовятся в пуле процессов, а все PDF собирает один запуск wkhtmltopdf (write_pdfs).
+
+    :param reports: Лист кортежей (словари статистики, имя PDF файла, квантили или None)
+    :param workers: Количество процессов, по умолчанию os.cpu_count()
+
+    :return: лист имён PDF файлов
+    """
+    workers = min(workers or os.cpu_count() or 1, max(len(reports), 1))
+    if weasyprint_available():
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(_save_page, reports))
+    wkhtmltopdf_executable()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pages = list(executor.map(_render_page, [dictionaries for dictionaries, _, _ in reports],
+                                  [quantiles for _, _, quantiles in reports]))
+    return write_pdfs(pages, [file_name for _, file_name, _ in reports])
+
+
+_page_chart, _page_key = None, None
+
+
+def _render_page(dictionaries: list, quantiles: dict = None) -> str:
+    """HTML отчёта со встроенными графиками (выполняется в процессе пула)
+
+    Шаблон графиков переиспользуется процессом, пока общие словари не меняются.
+
+    :param dictionaries: Лист [профессия, шесть словарей статистики]
+    :param quantiles: Квантили зарплат (InputConnect.collect_quantiles)
+
+    :return: строка HTML
+    """
+    global _page_chart, _page_key
+    key = (dictionaries[1], dictionaries[2], dictionaries[5], dictionaries[6])
+    if _page_key != key:
+        if _page_chart is not None:
+            _page_chart.close()
+        _page_chart, _page_key = ChartTemplate(*key), key
+    return render_html(dictionaries, chart_data_uri(dictionaries, _page_chart), quantiles)
+
+
+def _save_page(task: tuple) -> str:
+    """Сборка одного PDF отчёта в процессе пула с weasyprint
+
+    :param task: кортеж (словари статистики, имя PDF файла, квантили или None)
+
+    :return: имя PDF файла
+    """
+    dictionaries, file_name, quantiles = task
+    return write_pdf(_render_page(dictionaries, quantiles), file_name)
+
+
+class PdfReportTests(TestCase):
+    def test_one_wkhtmltopdf_process_for_many_pages(self):
+        import sys
+        from unittest import mock
+        with tempfile.TemporaryDirectory() as directory:
+            executable, log = os.path.join(directory, 'wkhtmltopdf'), os.path.join(directory, 'runs.log')
+            with open(executable, 'w') as file:
+                file.write(f'''#!{sys.executable}
+import shlex, sys
+with open({log!r}, 'a') as log:
+    log.write(' '.join(sys.argv[1:]) + '\\n')
+for line in sys.stdin:
+    arguments = shlex.split(line)
+    html = open(arguments[-2], encoding='utf-8').read()
+    open(arguments[-1], 'w', encoding='utf-8').write('PDF ' + html)
+''')
+            os.chmod(executable, 0o755)
+            names = [os.path.join(directory, f'report "{index}".pdf') for index in range(3)]
+            with mock.patch.dict(os.environ, {'WKHTMLTOPDF': executable}):
+                self.assertEqual(write_pdfs([f'<p>{index}</p>' for index in range(3)], names), names)
+            with open(log) as file:
+                self.assertEqual(file.read(), '--read-args-from-stdin\n')
+            for index, name in enumerate(names):
+                with open(name, encoding='utf-8') as file:
+                    self.assertEqual(file.read(), f'PDF <p>{index}</p>')
@@ -0,0 +1,411 @@
+import datetime
+import os
+import random
+import re
+from argparse import ArgumentParser
+from unittest import TestCase
+
+import numpy as np
+
+from columnar import ColumnsBuilder, VacancyColumns, EXPORT_TIMEZONE
+
+TOKEN = re.compile(r'\w+')
+SCAN_RATIO = 8
+ORDER_KEYS = ('published', 'salary')
+
+
+class VacancyIndex:
+    """Индексы колоночного хранилища для выборки отдельных вакансий
+
+    Индексы строятся один раз: строки, упорядоченные по дате публикации и по
+    зарплате (для диапазонов через двоичный поиск), инвертированные списки строк
+    по региону и по названию, и словарь слов названий. Запрос не сортирует
+    хранилище: он либо идёт по готовому порядку до первых offset + limit
+    подходящих строк, либо, если какой-то фильтр оставляет мало строк,
+    сортирует только их.
+
+    Attributes:
+        columns (VacancyColumns): Хранилище вакансий
+        by_published (np.ndarray): Номера строк по возрастанию даты публикации
+        by_salary (np.ndarray): Номера строк по возрастанию зарплаты
+    """
+    def __init__(self, columns: VacancyColumns) -> None:
+        """Построение индексов
+
+        :param columns: Хранилище со всеми столбцами (в том числе published)
+        """
+        self.columns = columns
+        self.by_published = self.__argsort(columns.published)
+        self.__published = columns.published[self.by_published]
+        self.by_salary = self.__argsort(columns.salary)
+        self.__salary = columns.salary[self.by_salary]
+        self.__city_rows, self.__city_offsets = self.__inverted(columns.area, len(columns.areas))
+        self.__name_rows, self.__name_offsets = self.__inverted(columns.name, len(columns.names))
+        self.__city_codes = {city: code for code, city in enumerate(columns.areas)}
+        self.__lower_names = [name.lower() for name in columns.names]
+        tokens = dict()
+        for code, name in enumerate(self.__lower_names):
+            for token in set(TOKEN.findall(name)):
+                tokens.setdefault(token, list()).append(code)
+        self.__tokens = tokens
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    def matching_names(self, text: str) -> np.ndarray:
+        """Коды названий, содержащих текст без учёта регистра
+
+        Каждое слово текста - подстрока какого-то слова подходящего названия,
+        поэтому кандидаты берутся из словаря слов, а подстрока проверяется
+        только на них.
+
+        :param text: Искомый текст
+
+        :return: отсортированный массив кодов названий
+        """
+        needle = text.lower()
+        candidates = None
+        for word in set(TOKEN.findall(needle)):
+            codes = {code for token, token_codes in self.__tokens.items() if word in token for code in token_codes}
+            candidates = codes if candidates is None else candidates & codes
+        if candidates is None:
+            candidates = range(len(self.__lower_names))
+        return np.array(sorted(code for code in candidates if needle in self.__lower_names[code]), dtype=np.int64)
+
+    def search(self, published_from: datetime.datetime = None, published_to: datetime.datetime = None,
+               city: str = None, salary_from: float = None, salary_to: float = None, text: str = None,
+               order_by: str = 'published', descending: bool = True, offset: int = 0, limit: int = 20) -> np.ndarray:
+        """Страница номеров строк, подходящих под все фильтры, в порядке order_by
+
+        При равных ключах строки идут в порядке файла (при descending - в обратном).
+
+        :param published_from: Начало периода публикации, включительно
+        :param published_to: Конец периода публикации, не включительно
+        :param city: Регион
+        :param salary_from: Нижняя граница зарплаты в рублях, включительно
+        :param salary_to: Верхняя граница зарплаты в рублях, включительно
+        :param text: Подстрока названия без учёта регистра
+        :param order_by: 'published' или 'salary'
+        :param descending: По убыванию ключа
+        :param offset: Сколько первых подходящих строк пропустить
+        :param limit: Размер страницы
+
+        :return: массив номеров строк (не длиннее limit)
+        """
+        if order_by not in ORDER_KEYS:
+            raise ValueError(f'Неизвестный порядок: {order_by}')
+        published_range = self.__range(self.__published, timestamp(published_from), timestamp(published_to), 'left')
+        salary_range = self.__range(self.__salary, salary_from, salary_to, 'right')
+        bounds, candidates = list(), list()
+        for column, (start, end), sorted_values, order, active in (
+                (self.columns.published, published_range, self.__published, self.by_published,
+                 published_from is not None or published_to is not None),
+                (self.columns.salary, salary_range, self.__salary, self.by_salary,
+                 salary_from is not None or salary_to is not None)):
+            if not active:
+                continue
+            if start == end:
+                return np.zeros(0, dtype=np.int64)
+            bounds.append((column, sorted_values[start], sorted_values[end - 1]))
+            if column is not getattr(self.columns, order_by):
+                candidates.append(order[start:end])
+        masks = list()
+        if city is not None:
+            code = self.__city_codes.get(city)
+            if code is None:
+                return np.zeros(0, dtype=np.int64)
+            city_mask = np.zeros(len(self.columns.areas), dtype=bool)
+            city_mask[code] = True
+            masks.append((self.columns.area, city_mask))
+            candidates.append(self.__city_rows[self.__city_offsets[code]:self.__city_offsets[code + 1]])
+        if text:
+            codes = self.matching_names(text)
+            name_mask = np.zeros(len(self.columns.names), dtype=bool)
+            name_mask[codes] = True
+            masks.append((self.columns.name, name_mask))
+            candidates.append(_Rows(self.__name_rows, self.__name_offsets, codes))
+        start, end = published_range if order_by == 'published' else salary_range
+        ordered = (self.by_published if order_by == 'published' else self.by_salary)[start:end]
+
+        def matches(rows: np.ndarray) -> np.ndarray:
+            keep = np.ones(len(rows), dtype=bool)
+            for column, low, high in bounds:
+                values = column[rows]
+                keep &= (values >= low) & (values <= high)
+            for column, mask in masks:
+                keep &= mask[column[rows]]
+            return rows[keep]
+
+        need = offset + limit
+        smallest = min(candidates, key=len, default=None)
+        if smallest is not None and len(smallest) * SCAN_RATIO < len(ordered):
+            rows = matches(np.sort(np.asarray(smallest)))
+            key = (self.columns.published if order_by == 'published' else self.columns.salary)[rows]
+            order = np.argsort(key, kind='stable')
+            return rows[order[::-1] if descending else order][offset:need]
+        if descending:
+            ordered = ordered[::-1]
+        found, found_count, position, chunk = list(), 0, 0, max(need * 2, 1024)
+        while position < len(ordered) and found_count < need:
+            found.append(matches(ordered[position:position + chunk]))
+            found_count += len(found[-1])
+            position, chunk = position + chunk, chunk * 2
+        return np.concatenate(found)[offset:need] if found else np.zeros(0, dtype=np.int64)
+
+    def rows(self, indices: np.ndarray) -> list:
+        """Вакансии по номерам строк
+
+        :param indices: Номера строк (результат search)
+
+        :return: лист словарей name, salary, area_name, published_at
+        """
+        columns = self.columns
+        return [{'name': columns.names[columns.name[row]], 'salary': float(columns.salary[row]),
+                 'area_name': columns.areas[columns.area[row]],
+                 'published_at': datetime.datetime.fromtimestamp(int(columns.published[row]), EXPORT_TIMEZONE)}
+                for row in indices]
+
+    @staticmethod
+    def __argsort(values: np.ndarray) -> np.ndarray:
+        """Номера строк по возрастанию значения, равные - в порядке файла
+
+        :param values: Столбец
+
+        :return: массив номеров строк int32 (int64 для огромных хранилищ)
+        """
+        order = np.argsort(values, kind='stable')
+        return order.astype(np.int32) if len(values) < 2 ** 31 else order
+
+    @staticmethod
+    def __inverted(codes: np.ndarray, size: int) -> tuple:
+        """Инвертированный индекс: строки каждого кода подряд, границы кода - в смещениях
+
+        :param codes: Столбец кодов
+        :param size: Количество кодов
+
+        :return: кортеж (номера строк, смещения длины size + 1)
+        """
+        offsets = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=size), out=offsets[1:])
+        return VacancyIndex.__argsort(codes), offsets
+
+    @staticmethod
+    def __range(sorted_values: np.ndarray, low, high, high_side: str) -> tuple:
+        """Границы диапазона значений в отсортированном столбце двоичным поиском
+
+        :param sorted_values: Отсортированный столбец
+        :param low: Нижняя граница включительно или None
+        :param high: Верхняя граница или None
+        :param high_side: 'left' - верхняя граница не включается, 'right' - включается
+
+        :return: кортеж (начало, конец)
+        """
+        start = 0 if low is None else int(np.searchsorted(sorted_values, low, 'left'))
+        end = len(sorted_values) if high is None else int(np.searchsorted(sorted_values, high, high_side))
+        return start, max(start, end)
+
+
+class _Rows:
+    """Строки нескольких кодов инвертированного индекса: длина известна без сборки массива
+    """
+    def __init__(self, rows: np.ndarray, offsets: np.ndarray, codes: np.ndarray) -> None:
+        self.__rows, self.__offsets, self.__codes = rows, offsets, codes
+
+    def __len__(self) -> int:
+        return int((self.__offsets[self.__codes + 1] - self.__offsets[self.__codes]).sum())
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        parts = [self.__rows[self.__offsets[code]:self.__offsets[code + 1]] for code in self.__codes]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+
+def timestamp(moment: datetime.datetime):
+    """Секунды Unix; дата без часового пояса считается временем выгрузки (+03:00)
+
+    :param moment: Момент времени или None
+
+    :return: int или None
+
+    >>> timestamp(datetime.datetime(2022, 1, 1))
+    1640984400
+    """
+    if moment is None:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=EXPORT_TIMEZONE)
+    return int(moment.timestamp())
+
+
+def parse_query(value: str) -> dict:
+    """Разбор запроса вакансий вида city=Москва;text=python;from=2020-01-01;order=salary;page=2
+
+    Ключи: from, to, city, salary_from, salary_to, text, order, ascending, page, page_size.
+
+    :param value: Строка запроса; пустая - запроса нет
+
+    :return: словарь аргументов VacancyIndex.search или None
+
+    >>> parse_query('city=Москва;salary_from=100000;order=salary;ascending=1;page=3;page_size=10')
+    {'city': 'Москва', 'salary_from': 100000.0, 'order_by': 'salary', 'descending': False, 'offset': 20, 'limit': 10}
+    """
+    if value.strip() == '':
+        return None
+    converters = {'from': ('published_from', datetime.datetime.fromisoformat),
+                  'to': ('published_to', datetime.datetime.fromisoformat),
+                  'city': ('city', str), 'salary_from': ('salary_from', float), 'salary_to': ('salary_to', float),
+                  'text': ('text', str), 'order': ('order_by', str), 'ascending': ('descending', lambda x: x != '1')}
+    query, page, page_size = dict(), 1, 20
+    for part in value.split(';'):
+        key, _, text = part.partition('=')
+        key, text = key.strip(), text.strip()
+        if key == 'page':
+            page = int(text)
+        elif key == 'page_size':
+            page_size = int(text)
+        elif key in converters:
+            query[converters[key][0]] = converters[key][1](text)
+        else:
+            raise ValueError(f'Неизвестный ключ запроса: {key}')
+    if query.get('order_by', 'published') not in ORDER_KEYS:
+        raise ValueError(f"Неизвестный порядок: {query['order_by']}")
+    query['offset'], query['limit'] = (page - 1) * page_size, page_size
+    return query
+
+
+def query_years(published_from: datetime.datetime = None, published_to: datetime.datetime = None) -> list:
+    """Годы набора по годам, которые может затронуть период публикации
+
+    :param published_from: Начало периода или None
+    :param published_to: Конец периода или None
+
+    :return: лист годов или None - все годы
+
+    >>> query_years(datetime.datetime(2020, 5, 1), datetime.datetime(2022, 1, 1))
+    [2020, 2021, 2022]
+    """
+    if published_from is None and published_to is None:
+        return None
+    return list(range(published_from.year if published_from else 1900,
+                      (published_to.year if published_to else 2100) + 1))
+
+
+def format_vacancy(vacancy: dict) -> str:
+    """Строка вакансии для вывода в консоль
+
+    :param vacancy: Словарь из VacancyIndex.rows
+
+    :return: str
+    """
+    return (f"{vacancy['published_at']:%Y-%m-%d %H:%M}  {vacancy['salary']:>12,.0f}  "
+            f"{vacancy['area_name']:<20}{vacancy['name']}")
+
+
+def load_columns(file_name: str, years: list = None, use_cache: bool = True, exchange_rates: str = None,
+                 deduplicate: bool = False) -> VacancyColumns:
+    """Все столбцы для индекса: набор по годам (папка) или файл через DataSet.put_columns
+
+    Настройки разбора те же, что у подсчёта статистики в main.py, поэтому
+    выборка видит те же вакансии и зарплаты, что и отчёт.
+
+    :param file_name: Файл вакансий или папка набора csv_parser.py --format columnar
+    :param years: Годы набора по годам; по умолчанию все
+    :param use_cache: Брать столбцы файла из кэша (см. cache.py); с дедупликацией кэш не используется
+    :param exchange_rates: Файл помесячных курсов валют (см. exchange_rates.py)
+    :param deduplicate: Отбрасывать повторы строк файла (см. dedup.py)
+
+    :return: VacancyColumns
+    """
+    from main import DataSet, Vacancy
+    if os.path.isdir(file_name):
+        from partitions import read_partitions
+        columns = read_partitions(file_name, years)
+        if exchange_rates:
+            from exchange_rates import ExchangeRates
+            columns = columns.convert_salaries(ExchangeRates.load(exchange_rates, Vacancy.currency_ratio))
+        return columns
+    dataset = DataSet(file_name, list(), deduplicate)
+    dataset.put_columns(use_cache, exchange_rates)
+    return dataset.vacancies_columns
+
+
+class QueryTests(TestCase):
+    def setUp(self):
+        generator = random.Random(0)
+        builder = ColumnsBuilder()
+        names = ['Программист Python', 'Python-разработчик', 'Аналитик данных', 'Менеджер', 'Java программист']
+        for _ in range(3000):
+            published_at = datetime.datetime(2015, 1, 1, tzinfo=EXPORT_TIMEZONE) + \
+                datetime.timedelta(seconds=generator.randrange(8 * 365 * 24 * 3600))
+            builder.append(generator.choice(names), generator.randrange(10, 60) * 1000.0,
+                           generator.choice(['Москва', 'Казань', 'Омск', 'Пермь']), 'RUR', published_at)
+        self.index = VacancyIndex(builder.build())
+
+    def brute_force(self, published_from=None, published_to=None, city=None, salary_from=None, salary_to=None,
+                    text=None, order_by='published', descending=True, offset=0, limit=20):
+        columns = self.index.columns
+        rows = [row for row in range(len(columns))
+                if (published_from is None or columns.published[row] >= timestamp(published_from))
+                and (published_to is None or columns.published[row] < timestamp(published_to))
+                and (city is None or columns.areas[columns.area[row]] == city)
+                and (salary_from is None or columns.salary[row] >= salary_from)
+                and (salary_to is None or columns.salary[row] <= salary_to)
+                and (text is None or text.lower() in columns.names[columns.name[row]].lower())]
+        key = getattr(columns, order_by)
+        rows.sort(key=lambda row: key[row])
+        return (rows[::-1] if descending else rows)[offset:offset + limit]
+
+    def test_search_matches_brute_force(self):
+        queries = [dict(),
+                   dict(city='Омск', order_by='salary', descending=False, offset=5),
+                   dict(published_from=datetime.datetime(2018, 3, 1), published_to=datetime.datetime(2018, 4, 1)),
+                   dict(published_from=datetime.datetime(2019, 1, 1), order_by='salary', limit=50),
+                   dict(salary_from=20000, salary_to=25000, text='python', offset=3),
+                   dict(text='рАЗработ', city='Казань', order_by='salary'),
+                   dict(text='thon програм', descending=False),
+                   dict(published_from=datetime.datetime(2018, 3, 1), published_to=datetime.datetime(2018, 4, 1),
+                        city='Омск', order_by='salary', descending=False),
+                   dict(salary_from=59000, salary_to=1000, city='Пермь'),
+                   dict(city='Тула')]
+        for query in queries:
+            self.assertEqual(self.index.search(**query).tolist(), self.brute_force(**query), query)
+
+    def test_load_columns_settings(self):
+        import tempfile
+        with tempfile.TemporaryDirectory() as directory:
+            file_name, rates = os.path.join(directory, 'vacancies.csv'), os.path.join(directory, 'rates.csv')
+            with open(file_name, 'w', encoding='utf-8') as file:
+                file.write('name,salary_from,salary_to,salary_currency,area_name,published_at\n'
+                           + 'Программист,100,200,USD,Москва,2022-06-14T11:44:58+0300\n' * 2)
+            with open(rates, 'w', encoding='utf-8') as file:
+                file.write('date,currency,rate\n2022-06,USD,70\n')
+            columns = load_columns(file_name, use_cache=False, exchange_rates=rates, deduplicate=True)
+            self.assertEqual(columns.salary.tolist(), [10500.0])
+            self.assertFalse(os.path.exists(f'{file_name}.cache'))
+
+
+if __name__ == '__main__':
+    arguments_parser = ArgumentParser(description='Выборка отдельных вакансий с фильтрами, сортировкой и страницами')
+    arguments_parser.add_argument('file', help='файл вакансий или папка набора по годам')
+    arguments_parser.add_argument('--from', dest='published_from', type=datetime.datetime.fromisoformat,
+                                  help='начало периода публикации, например 2020-01-01')
+    arguments_parser.add_argument('--to', dest='published_to', type=datetime.datetime.fromisoformat,
+                                  help='конец периода публикации, не включительно')
+    arguments_parser.add_argument('--city', help='регион')
+    arguments_parser.add_argument('--salary-from', type=float, help='зарплата от, рублей')
+    arguments_parser.add_argument('--salary-to', type=float, help='зарплата до, рублей')
+    arguments_parser.add_argument('--text', help='подстрока названия')
+    arguments_parser.add_argument('--order', choices=ORDER_KEYS, default='published', help='ключ сортировки')
+    arguments_parser.add_argument('--ascending', action='store_true', help='по возрастанию')
+    arguments_parser.add_argument('--page', type=int, default=1, help='номер страницы')
+    arguments_parser.add_argument('--page-size', type=int, default=20, help='вакансий на странице')
+    arguments = arguments_parser.parse_args()
+    vacancy_index = VacancyIndex(load_columns(arguments.file,
+                                              query_years(arguments.published_from, arguments.published_to)))
+    page = vacancy_index.search(arguments.published_from, arguments.published_to, arguments.city,
+                                arguments.salary_from, arguments.salary_to, arguments.text, arguments.order,
+                                not arguments.ascending, (arguments.page - 1) * arguments.page_size,
+                                arguments.page_size)
+    if len(page) == 0:
+        print('Нет данных')
+    for vacancy in vacancy_index.rows(page):
+        print(format_vacancy(vacancy))
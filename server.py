@@ -0,0 +1,269 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+from argparse import ArgumentParser
+from collections import OrderedDict
+from unittest import TestCase, mock
+from urllib.parse import urlsplit, parse_qs
+
+from cache import file_fingerprint
+from main import DataSet, InputConnect, Report
+
+DICTIONARIES_NAMES = ('dynamics_slr', 'dynamics_count_vac', 'dynamics_slr_name', 'dynamics_count_vac_name',
+                      'dynamics_slr_cities', 'dynamics_count_vac_cities')
+OUTPUT_TYPES = \
+    {
+        'xlsx': ('generate_excel', 'report.xlsx',
+                 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+        'png': ('generate_image', 'graph.png', 'image/png'),
+        'pdf': ('generate_pdf', 'report.pdf', 'application/pdf'),
+    }
+
+
+class DatasetPool:
+    """Пул разобранных датасетов, которые остаются в памяти между запросами
+
+    Attributes:
+        max_datasets (int): Максимальное количество датасетов в памяти (LRU)
+    """
+    def __init__(self, max_datasets: int = 4) -> None:
+        """Конструктор класса DatasetPool
+
+        :param max_datasets: Максимальное количество датасетов в памяти
+        """
+        self.max_datasets = max_datasets
+        self.__datasets, self.__statistics, self.__fingerprints = OrderedDict(), dict(), dict()
+
+    async def columns(self, file_name: str):
+        """Столбцы датасета: из памяти или загрузка в потоке исполнителя
+
+        Одновременные запросы одного файла ждут одну и ту же загрузку. Если
+        отпечаток файла (cache.file_fingerprint) изменился с загрузки, датасет
+        и его статистика загружаются заново.
+
+        :param file_name: Название файла
+
+        :return: VacancyColumns
+        """
+        fingerprint = file_fingerprint(file_name)
+        if file_name in self.__datasets and self.__fingerprints.get(file_name) != fingerprint:
+            self.__forget(file_name)
+        if file_name not in self.__datasets:
+            self.__fingerprints[file_name] = fingerprint
+            self.__datasets[file_name] = asyncio.get_running_loop().run_in_executor(
+                None, self.__load, file_name)
+            while len(self.__datasets) > self.max_datasets:
+                self.__forget(next(iter(self.__datasets)))
+        self.__datasets.move_to_end(file_name)
+        future = self.__datasets[file_name]
+        try:
+            return await asyncio.shield(future)
+        except BaseException:
+            if self.__datasets.get(file_name) is future:
+                self.__forget(file_name)
+            raise
+
+    def __forget(self, file_name: str) -> None:
+        """Удаление датасета и его статистики из пула
+
+        :param file_name: Название файла
+
+        :return: nothing
+        """
+        self.__datasets.pop(file_name, None)
+        self.__fingerprints.pop(file_name, None)
+        self.__statistics = {key: value for key, value in self.__statistics.items() if key[0] != file_name}
+
+    async def statistics(self, file_name: str, profession: str) -> list:
+        """Словари статистики для профессии; одинаковые запросы считаются один раз
+
+        :param file_name: Название файла
+        :param profession: Наименование профессии
+
+        :return: лист [профессия, шесть словарей статистики]
+        """
+        columns = await self.columns(file_name)
+        key = (file_name, profession)
+        if key not in self.__statistics:
+            self.__statistics[key] = asyncio.get_running_loop().run_in_executor(
+                None, self.__count, columns, profession)
+        future = self.__statistics[key]
+        try:
+            return await asyncio.shield(future)
+        except BaseException:
+            if self.__statistics.get(key) is future:
+                del self.__statistics[key]
+            raise
+
+    @staticmethod
+    def __load(file_name: str):
+        """Разбор файла (или чтение его кэша) в колоночное хранилище
+
+        :param file_name: Название файла
+
+        :return: VacancyColumns
+        """
+        dataset = DataSet(file_name, list())
+        dataset.put_columns(use_cache=True)
+        return dataset.vacancies_columns
+
+    @staticmethod
+    def __count(columns, profession: str) -> list:
+        """Подсчёт и нормировка статистики как в main.py
+
+        :param columns: Колоночное хранилище
+        :param profession: Наименование профессии
+
+        :return: лист [профессия, шесть словарей статистики]
+        """
+        inserted_data = InputConnect()
+        inserted_data.profession, inserted_data.cities_count = profession, 0
+        inserted_data.count_columns(columns)
+        inserted_data.equalize_statistic()
+        return inserted_data.collect_dictionaries()
+
+
+class ReportServer:
+    """Локальный HTTP сервер статистики: GET /stats?file=...&profession=...&output=json|xlsx|png|pdf
+
+    Attributes:
+        pool (DatasetPool): Пул загруженных датасетов
+    """
+    report_lock = threading.Lock()
+
+    def __init__(self, pool: DatasetPool) -> None:
+        """Конструктор класса ReportServer
+
+        :param pool: Пул загруженных датасетов
+        """
+        self.pool = pool
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Обработка одного HTTP запроса
+
+        :param reader: Поток чтения соединения
+        :param writer: Поток записи соединения
+
+        :return: nothing
+        """
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            status, content_type, body = await self.respond(request_line)
+        except Exception as error:
+            status, content_type, body = '500 Internal Server Error', 'text/plain; charset=utf-8', \
+                str(error).encode('utf-8')
+        writer.write(f'HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n'
+                     f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode('latin-1') + body)
+        await writer.drain()
+        writer.close()
+
+    async def respond(self, request_line: list) -> tuple:
+        """Ответ на запрос статистики
+
+        :param request_line: Метод, путь и версия HTTP
+
+        :return: кортеж (статус, тип содержимого, тело ответа)
+        """
+        if len(request_line) < 2 or request_line[0] != 'GET' or urlsplit(request_line[1]).path != '/stats':
+            return '404 Not Found', 'text/plain; charset=utf-8', 'GET /stats'.encode('utf-8')
+        query = {key: values[0] for key, values in parse_qs(urlsplit(request_line[1]).query).items()}
+        output = query.get('output', 'json')
+        if 'file' not in query or (output != 'json' and output not in OUTPUT_TYPES):
+            return '400 Bad Request', 'text/plain; charset=utf-8', \
+                'Нужны параметры file, profession и output=json|xlsx|png|pdf'.encode('utf-8')
+        try:
+            dictionaries = await self.pool.statistics(query['file'], query.get('profession', ''))
+        except (OSError, SystemExit) as error:
+            return '400 Bad Request', 'text/plain; charset=utf-8', f'Файл не прочитан: {error}'.encode('utf-8')
+        if output == 'json':
+            body = {'profession': dictionaries[0]}
+            body.update(zip(DICTIONARIES_NAMES, dictionaries[1:]))
+            return '200 OK', 'application/json; charset=utf-8', \
+                json.dumps(body, ensure_ascii=False).encode('utf-8')
+        method, file_name, content_type = OUTPUT_TYPES[output]
+        body = await asyncio.get_running_loop().run_in_executor(
+            None, self.render, method, file_name, dictionaries)
+        return '200 OK', content_type, body
+
+    def render(self, method: str, file_name: str, dictionaries: list) -> bytes:
+        """Генерация файла отчёта во временной папке
+
+        Генераторы Report (pyplot) не потокобезопасны, поэтому выполняются по одному.
+
+        :param method: Имя метода Report
+        :param file_name: Имя файла отчёта
+        :param dictionaries: Лист [профессия, шесть словарей статистики]
+
+        :return: содержимое файла
+        """
+        with self.report_lock, tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, file_name)
+            getattr(Report(), method)(*dictionaries, file_name=path)
+            with open(path, 'rb') as file:
+                return file.read()
+
+
+async def serve(pool: DatasetPool, host: str, port: int, unix_socket: str = None, preload: list = ()) -> None:
+    """Запуск сервера и предварительная загрузка датасетов
+
+    :param pool: Пул датасетов
+    :param host: Адрес
+    :param port: Порт
+    :param unix_socket: Путь к Unix сокету вместо TCP порта
+    :param preload: Файлы, которые загружаются сразу при старте
+
+    :return: nothing
+    """
+    report_server = ReportServer(pool)
+    if unix_socket:
+        server = await asyncio.start_unix_server(report_server.handle, path=unix_socket)
+    else:
+        server = await asyncio.start_server(report_server.handle, host, port)
+    await asyncio.gather(*(pool.columns(file_name) for file_name in preload))
+    async with server:
+        await server.serve_forever()
+
+
+class ServerTests(TestCase):
+    def test_parallel_reports_parse_file_once(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, 'vacancies.csv')
+            with open(file_name, 'w', encoding='utf-8') as file:
+                file.write('name,salary_from,salary_to,salary_currency,area_name,published_at\n'
+                           'Программист,100,200,RUR,Москва,2022-06-14T11:44:58+0300\n')
+            report_server = ReportServer(DatasetPool())
+
+            async def requests(*outputs) -> list:
+                return await asyncio.gather(*(report_server.respond(
+                    ['GET', f'/stats?file={file_name}&profession=Программист&output={output}', 'HTTP/1.1'])
+                    for output in outputs))
+
+            with mock.patch.object(DataSet, 'put_columns', autospec=True,
+                                   side_effect=DataSet.put_columns) as put_columns:
+                (json_status, _, body), (xlsx_status, _, workbook) = asyncio.run(requests('json', 'xlsx'))
+                self.assertEqual((json_status, xlsx_status), ('200 OK', '200 OK'))
+                self.assertEqual(put_columns.call_count, 1)
+                self.assertEqual(json.loads(body)['dynamics_count_vac'], {'2022': 1})
+                self.assertTrue(workbook.startswith(b'PK'))
+                with open(file_name, 'a', encoding='utf-8') as file:
+                    file.write('Аналитик,300,400,RUR,Омск,2022-07-14T11:44:58+0300\n')
+                (_, _, body), = asyncio.run(requests('json'))
+                self.assertEqual(put_columns.call_count, 2)
+                self.assertEqual(json.loads(body)['dynamics_count_vac'], {'2022': 2})
+
+
+if __name__ == '__main__':
+    arguments_parser = ArgumentParser(description='Локальный сервер статистики вакансий')
+    arguments_parser.add_argument('--host', default='127.0.0.1')
+    arguments_parser.add_argument('--port', type=int, default=8080)
+    arguments_parser.add_argument('--unix-socket', help='путь к Unix сокету вместо TCP порта')
+    arguments_parser.add_argument('--max-datasets', type=int, default=4,
+                                  help='максимальное количество датасетов в памяти')
+    arguments_parser.add_argument('--preload', nargs='*', default=list(), help='файлы для загрузки при старте')
+    arguments = arguments_parser.parse_args()
+    asyncio.run(serve(DatasetPool(arguments.max_datasets), arguments.host, arguments.port,
+                      arguments.unix_socket, arguments.preload))
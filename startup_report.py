@@ -0,0 +1,57 @@
+import json
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+
+
+def import_time(module: str) -> dict:
+    """Замер холодного импорта модуля в отдельном процессе через python -X importtime
+
+    :param module: Имя модуля, например main или matplotlib.pyplot
+
+    :return: словарь с общим временем и временем каждого импортированного пакета в микросекундах
+    """
+    started = time.perf_counter()
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                             capture_output=True, text=True, check=True)
+    wall_time = int((time.perf_counter() - started) * 1_000_000)
+    packages = dict()
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, cumulative, package = line[len('import time:'):].split('|')
+        packages[package.strip()] = {'self_us': int(self_time), 'cumulative_us': int(cumulative),
+                                     'level': (len(package) - len(package.lstrip()) - 1) // 2}
+    top_level = [values['cumulative_us'] for values in packages.values() if values['level'] == 0]
+    return {'module': module, 'wall_us': wall_time, 'imports_us': sum(top_level), 'packages': packages}
+
+
+def print_report(report: dict, top: int = 15) -> None:
+    """Печать самых тяжёлых импортов
+
+    :param report: Результат import_time
+    :param top: Количество строк
+
+    :return: nothing
+    """
+    print(f"{report['module']}: процесс {report['wall_us'] / 1000:.1f} мс, "
+          f"импорты {report['imports_us'] / 1000:.1f} мс")
+    heaviest = sorted(report['packages'].items(), key=lambda item: item[1]['cumulative_us'], reverse=True)
+    for package, values in heaviest[:top]:
+        print(f"    {values['cumulative_us'] / 1000:9.1f} мс  {package}")
+
+
+if __name__ == '__main__':
+    arguments_parser = ArgumentParser(description='Отчёт о времени холодного старта')
+    arguments_parser.add_argument('modules', nargs='*', default=['main'],
+                                  help='модули для замера, например main openpyxl matplotlib.pyplot')
+    arguments_parser.add_argument('--top', type=int, default=15, help='количество самых тяжёлых импортов')
+    arguments_parser.add_argument('--json', help='файл для сохранения отчёта в JSON')
+    arguments = arguments_parser.parse_args()
+    reports = [import_time(module) for module in arguments.modules]
+    for current_report in reports:
+        print_report(current_report, arguments.top)
+    if arguments.json:
+        with open(arguments.json, 'w', encoding='utf-8') as file:
+            json.dump(reports, file, ensure_ascii=False, indent=2)
@@ -0,0 +1,179 @@
+from itertools import chain, islice
+from typing import Iterable
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Border, Side
+from openpyxl.utils import get_column_letter
+
+from accumulators import QUANTILES_HEADLINES
+
+MAX_SHEET_ROWS = 1048576
+WIDTH_SAMPLE_ROWS = 1000
+VACANCIES_HEADLINES = ['Название', 'Зарплата', 'Регион', 'Валюта', 'Дата публикации']
+
+
+class XlsxStyles:
+    """Общие для всех ячеек стили отчёта: создаются один раз на книгу
+
+    Attributes:
+        bold_font (Font): Жирный шрифт шапки
+        outline (Border): Тонкая рамка
+    """
+    def __init__(self) -> None:
+        """Конструктор класса XlsxStyles
+        """
+        self.bold_font = Font(bold=True)
+        thin = Side(border_style="thin", color="000000")
+        self.outline = Border(top=thin, left=thin, right=thin, bottom=thin)
+
+
+def column_widths(rows: Iterable) -> list:
+    """Ширины столбцов по длине самых длинных значений (+3, как в Report.workbook)
+
+    :param rows: Строки листа
+
+    :return: лист ширин
+    """
+    widths = list()
+    for row in rows:
+        for index, value in enumerate(row):
+            length = len(str(value)) if value is not None else 0
+            if index == len(widths):
+                widths.append(length)
+            elif length > widths[index]:
+                widths[index] = length
+    return [width + 3 for width in widths]
+
+
+def write_sheet(workbook: Workbook, title: str, rows: Iterable, styles: XlsxStyles,
+                sample_rows: int = WIDTH_SAMPLE_ROWS) -> int:
+    """Потоковая запись листа в write-only книгу
+
+    В write-only режиме ширины столбцов задаются до первой строки, поэтому
+    они считаются по первым sample_rows строкам, которые затем сразу пишутся.
+    Рамка ставится на столбцы, где во второй строке есть значение, шапка - жирная.
+
+    :param workbook: Книга в режиме write_only
+    :param title: Название листа
+    :param rows: Итератор строк, первая - шапка
+    :param styles: Общие стили
+    :param sample_rows: Количество строк для расчёта ширины
+
+    :return: количество записанных строк без шапки
+    """
+    rows = iter(rows)
+    sample = list(islice(rows, sample_rows))
+    worksheet = workbook.create_sheet(title)
+    for index, width in enumerate(column_widths(sample), 1):
+        worksheet.column_dimensions[get_column_letter(index)].width = width
+    bordered = [value is not None for value in sample[1]] if len(sample) > 1 else list()
+    rows_count = -1
+    for rows_count, row in enumerate(chain(sample, rows)):
+        cells = list()
+        for index, value in enumerate(row):
+            cell = WriteOnlyCell(worksheet, value=value)
+            if rows_count == 0:
+                cell.font = styles.bold_font
+            if index < len(bordered) and bordered[index]:
+                cell.border = styles.outline
+            cells.append(cell)
+        worksheet.append(cells)
+    return max(rows_count, 0)
+
+
+def year_rows(input_name: str, dynamics_slr: dict, dynamics_count_vac: dict,
+              dynamics_slr_name: dict, dynamics_count_vac_name: dict, quantiles: dict = None) -> list:
+    """Строки листа статистики по годам
+
+    :param input_name: Название профессии
+    :param dynamics_slr: Словарь с годами и зарплатами
+    :param dynamics_count_vac: Словарь с годами и количеством
+    :param dynamics_slr_name: Словарь с наименованием и зарплатой
+    :param dynamics_count_vac_name: Словарь с наименованием и количеством вакансий
+    :param quantiles: Квантили зарплат (InputConnect.collect_quantiles) - столбцы справа
+
+    :return: лист строк с шапкой
+    """
+    rows = [['Год', 'Средняя зарплата', f"Средняя зарплата - {input_name}",
+             'Количество вакансий', f"Количество вакансий - {input_name}"]] + \
+        [[year] + [dictionary[year] for dictionary in (dynamics_slr, dynamics_count_vac,
+                                                       dynamics_slr_name, dynamics_count_vac_name)]
+         for year in dynamics_slr.keys()]
+    if quantiles is not None:
+        rows[0] += list(QUANTILES_HEADLINES) + [f'{headline} - {input_name}' for headline in QUANTILES_HEADLINES]
+        for row in rows[1:]:
+            row += quantiles['years'].get(row[0], [None] * 3) + quantiles['vacancy'].get(row[0], [None] * 3)
+    return rows
+
+
+def city_rows(dynamics_slr_cities: dict, dynamics_count_vac_cities: dict, quantiles: dict = None) -> list:
+    """Строки листа статистики по городам: две таблицы через пустой столбец
+
+    :param dynamics_slr_cities: Словарь заплаты по городам
+    :param dynamics_count_vac_cities: Словарь с количеством вакансий по городам
+    :param quantiles: Квантили зарплат (InputConnect.collect_quantiles) - столбцы после уровня зарплат
+
+    :return: лист строк с шапкой
+    """
+    quantile_headlines = list(QUANTILES_HEADLINES) if quantiles is not None else list()
+    rows = [['Город', 'Уровень зарплат'] + quantile_headlines + ['', 'Город', 'Доля вакансий']]
+    salary_items, count_items = list(dynamics_slr_cities.items()), list(dynamics_count_vac_cities.items())
+    for index in range(max(len(salary_items), len(count_items))):
+        salary_city, salary = salary_items[index] if index < len(salary_items) else (None, None)
+        count_city, count = count_items[index] if index < len(count_items) else (None, None)
+        city_quantiles = quantiles['cities'].get(salary_city, [None] * 3) if quantiles is not None else list()
+        rows.append([salary_city, salary] + city_quantiles + [None, count_city, count])
+    return rows
+
+
+def vacancies_rows(vacancies: Iterable) -> Iterable:
+    """Строки листа вакансий из итератора Vacancy без накопления в памяти
+
+    :param vacancies: Итератор вакансий (DataSet.iter_vacancies)
+
+    :return: итератор строк без шапки
+    """
+    for vacancy in vacancies:
+        yield [vacancy.name, vacancy.salary, vacancy.area_name, vacancy.salary_currency,
+               vacancy.published_at.replace(tzinfo=None)]
+
+
+def save_report(file_name: str, input_name: str, dynamics_slr: dict, dynamics_count_vac: dict,
+                dynamics_slr_name: dict, dynamics_count_vac_name: dict, dynamics_slr_cities: dict,
+                dynamics_count_vac_cities: dict, vacancies: Iterable = None, quantiles: dict = None) -> None:
+    """Сборка и сохранение XLSX отчёта в write-only режиме
+
+    Лист вакансий делится на листы "Вакансии", "Вакансии 2", ... по лимиту строк Excel.
+
+    :param file_name: Имя файла отчёта
+    :param input_name: Название профессии
+    :param dynamics_slr: Словарь с годами и зарплатами
+    :param dynamics_count_vac: Словарь с годами и количеством
+    :param dynamics_slr_name: Словарь с наименованием и зарплатой
+    :param dynamics_count_vac_name: Словарь с наименованием и количеством вакансий
+    :param dynamics_slr_cities: Словарь заплаты по городам
+    :param dynamics_count_vac_cities: Словарь с количеством вакансий по городам
+    :param vacancies: Необязательный итератор вакансий для листа со всеми строками
+    :param quantiles: Квантили зарплат (InputConnect.collect_quantiles)
+
+    :return: nothing
+    """
+    workbook, styles = Workbook(write_only=True), XlsxStyles()
+    write_sheet(workbook, "Cтатистика по годам",
+                year_rows(input_name, dynamics_slr, dynamics_count_vac, dynamics_slr_name, dynamics_count_vac_name,
+                          quantiles), styles)
+    write_sheet(workbook, "Cтатистика по городам",
+                city_rows(dynamics_slr_cities, dynamics_count_vac_cities, quantiles), styles)
+    if vacancies is not None:
+        rows, sheet_number = vacancies_rows(vacancies), 1
+        while True:
+            sheet_rows = islice(rows, MAX_SHEET_ROWS - 1)
+            first_row = next(sheet_rows, None)
+            if first_row is None and sheet_number > 1:
+                break
+            title = 'Вакансии' if sheet_number == 1 else f'Вакансии {sheet_number}'
+            body = chain((first_row,), sheet_rows) if first_row is not None else ()
+            write_sheet(workbook, title, chain((VACANCIES_HEADLINES,), body), styles)
+            sheet_number += 1
+    workbook.save(file_name)